@@ -0,0 +1,365 @@
+"""Бенчмарк конвейера установки на поддельном winget.
+
+Кладёт в PATH скрипт winget с настраиваемой задержкой, долей ошибок и выводом,
+прогоняет is_installed, winget_exists и install_packages на N пакетах и печатает
+время, число процессов winget и перцентили задержек по фазам.
+
+    python benchmarks/bench_install.py --sizes 10,100,1000 --json bench.json
+"""
+
+import argparse
+import json
+import os
+import stat
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import installer_core as core
+
+# Поддельный winget: bash, чтобы запуск процесса стоил миллисекунды.
+# Каждый вызов дописывает подкоманду в FAKE_WINGET_LOG
+FAKE_WINGET = r'''#!/usr/bin/env bash
+cmd="$1"
+echo "$cmd" >> "${FAKE_WINGET_LOG:-/dev/null}"
+
+latency_var="FAKE_WINGET_LATENCY_${cmd^^}"
+latency="${!latency_var:-0}"
+if [ "$latency" != "0" ]; then
+    sleep "$latency"
+fi
+
+pkg_id=""
+download_dir=""
+import_file=""
+while [ $# -gt 0 ]; do
+    if [ "$1" = "--id" ]; then
+        pkg_id="$2"
+    elif [ "$1" = "--download-directory" ]; then
+        download_dir="$2"
+    elif [ "$1" = "--import-file" ]; then
+        import_file="$2"
+    fi
+    shift
+done
+
+fail_pct="${FAKE_WINGET_FAIL_PCT:-0}"
+case "$cmd" in
+    list)
+        if [ -n "$pkg_id" ]; then
+            grep -qi " $pkg_id " "$FAKE_WINGET_INSTALLED_FILE"
+            exit $?
+        fi
+        cat "$FAKE_WINGET_INSTALLED_FILE"
+        ;;
+    show)
+        if [ $((RANDOM % 100)) -lt "$fail_pct" ]; then
+            echo "No package found matching input criteria."
+            exit 1
+        fi
+        echo "Found Package [$pkg_id]"
+        echo "Version: 1.0.0"
+        ;;
+    install)
+        if [ $((RANDOM % 100)) -lt "$fail_pct" ]; then
+            echo "Installer failed with exit code: 1603" >&2
+            exit 1
+        fi
+        # Вывод как у настоящего winget: прогресс-бар загрузки перерисовывается через \r
+        steps="${FAKE_WINGET_PROGRESS_STEPS:-0}"
+        if [ "$steps" -gt 0 ]; then
+            echo "Downloading https://example.invalid/$pkg_id.exe"
+            for i in $(seq 1 "$steps"); do
+                printf '\r  ██████▒▒▒▒  %d.0 MB / %d.0 MB' "$i" "$steps"
+            done
+            echo
+            echo "Successfully verified installer hash"
+            echo "Starting package install..."
+        fi
+        echo "Successfully installed"
+        ;;
+    download)
+        # Фиктивный установщик (пишет в журнал вызовов "cached") и манифест с его хэшем
+        installer="$download_dir/${pkg_id}_1.0.0_nullsoft.exe"
+        printf '#!/usr/bin/env bash\necho cached >> "${FAKE_WINGET_LOG:-/dev/null}"\n' > "$installer"
+        chmod +x "$installer"
+        sha=$(sha256sum "$installer" | cut -d' ' -f1)
+        cat > "$download_dir/${pkg_id}_1.0.0_nullsoft.yaml" <<EOF
+PackageIdentifier: $pkg_id
+PackageVersion: 1.0.0
+Installers:
+- InstallerType: nullsoft
+  InstallerSha256: $sha
+ManifestType: singleton
+EOF
+        ;;
+    import)
+        # Пакеты ставятся по очереди в одном процессе, задержка установки - на каждый
+        failed=0
+        for id in $(grep -o '"PackageIdentifier": *"[^"]*"' "$import_file" | sed 's/.*"\([^"]*\)"$/\1/'); do
+            if grep -qi " $id " "$FAKE_WINGET_INSTALLED_FILE"; then
+                echo "Package is already installed: $id"
+                continue
+            fi
+            if [ $((RANDOM % 100)) -lt "$fail_pct" ]; then
+                echo "Package not found for import: $id"
+                continue
+            fi
+            echo "Found $id [$id] Version 1.0.0"
+            if [ "${FAKE_WINGET_LATENCY_INSTALL:-0}" != "0" ]; then
+                sleep "$FAKE_WINGET_LATENCY_INSTALL"
+            fi
+            if [ $((RANDOM % 100)) -lt "$fail_pct" ]; then
+                echo "Installer failed with exit code: 1603"
+                failed=1
+                continue
+            fi
+            steps="${FAKE_WINGET_PROGRESS_STEPS:-0}"
+            for i in $(seq 1 "$steps"); do
+                printf '\r  ██████▒▒▒▒  %d.0 MB / %d.0 MB' "$i" "$steps"
+            done
+            [ "$steps" -gt 0 ] && echo
+            echo "Successfully installed"
+        done
+        exit $failed
+        ;;
+esac
+exit 0
+'''
+
+
+def write_fake_winget(directory):
+    """Создаёт исполняемый поддельный winget в directory"""
+    path = os.path.join(directory, "winget")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(FAKE_WINGET)
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return path
+
+
+def write_installed_table(path, packages):
+    """Таблица `winget list` с уже установленными пакетами"""
+    lines = [
+        f"{'Name':<40} {'Id':<40} {'Version':<12} Source",
+        "-" * 100,
+    ]
+    for pkg in packages:
+        lines.append(f"{pkg.name:<40} {pkg.id:<40} {'1.0.0':<12} winget")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def make_catalog(size):
+    """Синтетический каталог из size пакетов"""
+    groups = ["Игры", "Разработка", "Базовый софт"]
+    return core.validate_packages_list([
+        {"name": f"Bench App {i}", "id": f"Bench.App{i}", "group": groups[i % len(groups)]}
+        for i in range(size)
+    ])
+
+
+def reset_core_state(work_dir):
+    """Сбрасывает индексы и кэш ядра между прогонами"""
+    if core.cache_conn is not None:
+        core.flush_cache_touches()
+        core.cache_conn.close()
+    core.cache_conn = None
+    core.CACHE_FILE = os.path.join(work_dir, f"cache-{time.monotonic_ns()}.db")
+    core.cache_hits = 0
+    core.cache_misses = 0
+    core.installed_index = {}
+    core.installed_truncated = []
+    core.installed_index_loaded = False
+    core.needs_reboot = False
+    core.valorant_installed = False
+    core.JOURNAL_FILE = os.path.join(work_dir, "journal.jsonl")
+    core.PREFETCH_DIR = os.path.join(work_dir, f"installers-{time.monotonic_ns()}")
+
+
+def percentiles(samples):
+    if not samples:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0}
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99)}
+
+
+def count_calls(log_path):
+    """Число запусков winget по подкомандам с начала файла журнала"""
+    counts = {}
+    try:
+        with open(log_path, encoding="utf-8") as f:
+            for line in f:
+                cmd = line.strip()
+                counts[cmd] = counts.get(cmd, 0) + 1
+    except FileNotFoundError:
+        pass
+    return counts
+
+
+def timed_phase(name, log_path, func, items):
+    """Прогоняет func по items, замеряя каждый вызов"""
+    open(log_path, "w").close()
+    samples = []
+    started = time.perf_counter()
+    for item in items:
+        t = time.perf_counter()
+        func(item)
+        samples.append(time.perf_counter() - t)
+    return {
+        "phase": name,
+        "wall_ms": (time.perf_counter() - started) * 1000,
+        "calls": count_calls(log_path),
+        **percentiles(samples),
+    }
+
+
+def run_size(size, args, work_dir, log_path):
+    catalog = make_catalog(size)
+    installed = catalog[: size * args.installed_pct // 100]
+    write_installed_table(os.environ["FAKE_WINGET_INSTALLED_FILE"], installed)
+    ids = [pkg.id for pkg in catalog]
+    results = []
+
+    # Определение установленных: индекс из одного `winget list`
+    reset_core_state(work_dir)
+
+    def detect(pkg_id):
+        if not core.installed_index_loaded:
+            core.refresh_installed_index()
+        core.is_installed(pkg_id)
+
+    results.append(timed_phase("is_installed (индекс)", log_path, detect, ids))
+
+    # Определение без индекса: процесс на пакет (прежнее поведение)
+    reset_core_state(work_dir)
+    results.append(timed_phase("is_installed (по пакету)", log_path, core.is_installed, ids))
+
+    # Доступность в каталоге: холодный и прогретый кэш
+    results.append(timed_phase("winget_exists (холодный кэш)", log_path, core.winget_exists, ids))
+    results.append(timed_phase("winget_exists (тёплый кэш)", log_path, core.winget_exists, ids))
+
+    # Полный конвейер установки
+    reset_core_state(work_dir)
+    open(log_path, "w").close()
+    package_done = {}
+    package_started = {}
+
+    def on_status(text):
+        now = time.perf_counter()
+        name = text.split(": ", 1)[-1].split(" — ")[0].removesuffix(" (из кэша)")
+        # В пакетном режиме проверок нет - пакет начинается со строки "Установка"
+        if text.startswith(("Проверка", "Установка:")):
+            package_started.setdefault(name, now)
+        else:
+            package_done[name] = now
+
+    def timed_install(phase, install=None):
+        package_done.clear()
+        package_started.clear()
+        started = time.perf_counter()
+        if install is None:
+            core.install_packages(catalog, on_status=on_status, workers=args.workers)
+        else:
+            install(catalog, on_status=on_status)
+        wall = time.perf_counter() - started
+        latencies = [package_done[name] - package_started[name]
+                     for name in package_done if name in package_started]
+        results.append({
+            "phase": phase,
+            "wall_ms": wall * 1000,
+            "calls": count_calls(log_path),
+            **percentiles(latencies),
+        })
+
+    timed_install("install_packages")
+
+    # Один winget import на весь список
+    reset_core_state(work_dir)
+    open(log_path, "w").close()
+    timed_install("install_packages_bulk (import)", core.install_packages_bulk)
+
+    # Предзагрузка в кэш установщиков и установка из него (без winget install)
+    reset_core_state(work_dir)
+    core.refresh_installed_index()
+    open(log_path, "w").close()
+    started = time.perf_counter()
+    for future in core.prefetch_packages(catalog, speculative=False):
+        future.result()
+    results.append({
+        "phase": "prefetch (winget download)",
+        "wall_ms": (time.perf_counter() - started) * 1000,
+        "calls": count_calls(log_path),
+        **percentiles([]),
+    })
+    open(log_path, "w").close()
+    timed_install("install_packages (из кэша)")
+
+    for row in results:
+        row["packages"] = size
+    return results
+
+
+def print_table(rows):
+    header = f"{'N':>5}  {'фаза':<30} {'время, мс':>10} {'процессов':>10} {'p50':>8} {'p95':>8} {'p99':>8}"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        calls = sum(row["calls"].values())
+        print(f"{row['packages']:>5}  {row['phase']:<30} {row['wall_ms']:>10.0f} {calls:>10} "
+              f"{row['p50']:>8.1f} {row['p95']:>8.1f} {row['p99']:>8.1f}")
+
+
+def parse_latency(text):
+    """'list=0.05,show=0.02' -> {'LIST': '0.05', 'SHOW': '0.02'}"""
+    latency = {}
+    for part in filter(None, text.split(",")):
+        cmd, _, value = part.partition("=")
+        latency[cmd.strip().upper()] = value.strip()
+    return latency
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк конвейера установки на поддельном winget")
+    parser.add_argument("--sizes", default="10,100,1000", help="Размеры каталога через запятую")
+    parser.add_argument("--latency", default="list=0.02,show=0.005,install=0.005",
+                        help="Задержка подкоманд winget в секундах")
+    parser.add_argument("--fail-pct", type=int, default=5, help="Доля ошибок show/install, %%")
+    parser.add_argument("--installed-pct", type=int, default=30, help="Доля уже установленных пакетов, %%")
+    parser.add_argument("--workers", type=int, default=core.INSTALL_WORKERS, help="Размер пула проверок")
+    parser.add_argument("--json", metavar="FILE", help="Сохранить результаты в JSON")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="winget-bench-") as work_dir:
+        write_fake_winget(work_dir)
+        log_path = os.path.join(work_dir, "calls.log")
+        os.environ["PATH"] = work_dir + os.pathsep + os.environ.get("PATH", "")
+        os.environ["FAKE_WINGET_LOG"] = log_path
+        os.environ["FAKE_WINGET_FAIL_PCT"] = str(args.fail_pct)
+        os.environ["FAKE_WINGET_INSTALLED_FILE"] = os.path.join(work_dir, "installed.txt")
+        for cmd, value in parse_latency(args.latency).items():
+            os.environ[f"FAKE_WINGET_LATENCY_{cmd}"] = value
+
+        rows = []
+        for size in (int(s) for s in args.sizes.split(",") if s.strip()):
+            rows.extend(run_size(size, args, work_dir, log_path))
+
+        if core.cache_conn is not None:
+            core.flush_cache_touches()
+            core.cache_conn.close()
+            core.cache_conn = None
+
+    print_table(rows)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
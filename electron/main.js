@@ -3,6 +3,7 @@ const path = require('path');
 const { spawn } = require('child_process');
 const fs = require('fs');
 const os = require('os');
+const { parseWingetList, matchesTruncatedId, parseNetAdapters, selectActiveAdapter } = require('./parsers');
 
 let mainWindow;
 
@@ -122,8 +123,14 @@ ipcMain.handle('check-winget', async () => {
 });
 
 ipcMain.handle('get-installed-packages', async () => {
-    // Возвращаем пустой массив, как в Python версии
-    return [];
+    // Список id установленных программ одним вызовом winget list
+    try {
+        const index = await getInstalledIndex();
+        return Array.from(index.keys());
+    } catch (error) {
+        console.warn('Не удалось получить список установленных программ:', error);
+        return [];
+    }
 });
 
 ipcMain.handle('check-package-exists', async (event, packageId) => {
@@ -200,57 +207,7 @@ ipcMain.handle('install-package', async (event, packageId, packageName) => {
 });
 
 ipcMain.handle('get-active-interface', async () => {
-    return new Promise((resolve) => {
-        // Аналог функции из Python версии
-        const ipconfig = spawn('ipconfig', [], {
-            stdio: 'pipe',
-            shell: true,
-            encoding: 'cp866' // Для корректной работы с кириллицей в Windows
-        });
-
-        let output = '';
-        let resolved = false;
-
-        // Таймаут для предотвращения зависания
-        const timeout = setTimeout(() => {
-            if (!resolved) {
-                ipconfig.kill();
-                resolve(null);
-                resolved = true;
-            }
-        }, 10000); // 10 секунд таймаут
-
-        ipconfig.stdout.on('data', (data) => {
-            output += data.toString();
-        });
-
-        ipconfig.on('close', () => {
-            if (resolved) return;
-            clearTimeout(timeout);
-            resolved = true;
-
-            const lines = output.split('\n');
-            let currentAdapter = null;
-
-            for (const line of lines) {
-                if (line.includes('Адаптер') || line.includes('Adapter')) {
-                    currentAdapter = line.split(':')[0].replace('Адаптер', '').replace('Adapter', '').trim();
-                } else if (currentAdapter && (line.includes('IPv4') || line.includes('IP Address'))) {
-                    resolve(currentAdapter);
-                    return;
-                }
-            }
-            resolve(null);
-        });
-
-        ipconfig.on('error', () => {
-            if (!resolved) {
-                clearTimeout(timeout);
-                resolved = true;
-                resolve(null);
-            }
-        });
-    });
+    return await getActiveInterface();
 });
 
 ipcMain.handle('check-dns', async () => {
@@ -327,6 +284,7 @@ ipcMain.handle('set-dns', async () => {
             console.warn(`Не удалось установить вторичный DNS, но первичный DNS настроен: ${error.message}`);
         }
 
+        invalidateNetAdapters();
         return { success: true, message: `DNS успешно настроен для интерфейса "${interface}"` };
 
     } catch (error) {
@@ -361,6 +319,7 @@ ipcMain.handle('rollback-dns', async () => {
         }
 
         await runNetshCommand(['interface', 'ip', 'set', 'dns', `name="${interface}"`, 'dhcp']);
+        invalidateNetAdapters();
 
         return { success: true, message: `DNS сброшен в автоматический режим для интерфейса "${interface}"` };
     } catch (error) {
@@ -368,13 +327,44 @@ ipcMain.handle('rollback-dns', async () => {
     }
 });
 
-async function getActiveInterface() {
+// Адаптеры и их IP-конфигурация одним запросом PowerShell (не зависит от языка Windows)
+const NET_ADAPTERS_SCRIPT = [
+    '[Console]::OutputEncoding = [Text.Encoding]::UTF8;',
+    '$config = @{}; Get-NetIPConfiguration -ErrorAction SilentlyContinue |',
+    'ForEach-Object { $config[$_.InterfaceIndex] = $_ };',
+    '$adapters = @(Get-NetAdapter -ErrorAction SilentlyContinue | ForEach-Object {',
+    '$c = $config[$_.ifIndex]; [pscustomobject]@{',
+    'Name = $_.Name; InterfaceDescription = $_.InterfaceDescription; ifIndex = $_.ifIndex;',
+    'Status = [string]$_.Status; Virtual = [bool]$_.Virtual;',
+    'IPv4 = @($c.IPv4Address.IPAddress); Gateways = @($c.IPv4DefaultGateway.NextHop);',
+    'DnsServers = @(($c.DNSServer | Where-Object AddressFamily -eq 2).ServerAddresses) } });',
+    'ConvertTo-Json -InputObject $adapters -Depth 3 -Compress'
+].join(' ');
+
+// Кэш адаптеров: сбрасывается, когда меняется набор адресов из os.networkInterfaces()
+// (проверка без запуска процессов), и после изменения DNS
+let netAdaptersCache = null;
+
+function networkFingerprint() {
+    const interfaces = os.networkInterfaces();
+    return Object.keys(interfaces).sort().map((name) =>
+        `${name}=${interfaces[name].map((address) => address.address).sort().join(',')}`
+    ).join(';');
+}
+
+function invalidateNetAdapters() {
+    netAdaptersCache = null;
+}
+
+function getNetAdapters() {
+    const fingerprint = networkFingerprint();
+    if (netAdaptersCache && netAdaptersCache.fingerprint === fingerprint) {
+        return Promise.resolve(netAdaptersCache.adapters);
+    }
+
     return new Promise((resolve) => {
-        // Используем netsh interface ipv4 show interfaces - простой и надежный способ
-        const netsh = spawn('netsh', ['interface', 'ipv4', 'show', 'interfaces'], {
-            stdio: 'pipe',
-            shell: true,
-            encoding: 'cp866' // Для корректного чтения русских символов
+        const powershell = spawn('powershell', ['-NoProfile', '-NonInteractive', '-Command', NET_ADAPTERS_SCRIPT], {
+            stdio: 'pipe'
         });
 
         let output = '';
@@ -383,83 +373,53 @@ async function getActiveInterface() {
         // Таймаут для предотвращения зависания
         const timeout = setTimeout(() => {
             if (!resolved) {
-                netsh.kill();
-                resolve(null);
+                powershell.kill();
+                resolve([]);
                 resolved = true;
             }
-        }, 10000); // 10 секунд таймаут
+        }, 30000); // 30 секунд таймаут
 
-        netsh.stdout.on('data', (data) => {
-            output += data.toString();
+        powershell.stdout.on('data', (data) => {
+            output += data.toString('utf8');
         });
 
-        netsh.on('close', (code) => {
+        powershell.on('close', (code) => {
             if (resolved) return;
             clearTimeout(timeout);
             resolved = true;
 
             if (code !== 0) {
-                console.error('netsh ipv4 show interfaces command failed with code:', code);
-                resolve(null);
+                console.error('Get-NetAdapter failed with code:', code);
+                resolve([]);
                 return;
             }
-
-            const lines = output.split('\n');
-            let activeInterface = null;
-
-            console.log('Parsing netsh ipv4 interfaces output...');
-
-            // Пропускаем заголовок
-            for (let i = 0; i < lines.length; i++) {
-                const line = lines[i].trim();
-
-                // Пропускаем заголовок и разделители
-                if (line.includes('Инд') ||
-                    line.includes('Idx') ||
-                    line.includes('---') ||
-                    line === '') {
-                    continue;
-                }
-
-                // Парсим строку: "4          25        1500  connected     Ethernet"
-                const parts = line.split(/\s+/);
-                if (parts.length >= 5) {
-                    const index = parseInt(parts[0]); // Индекс интерфейса
-                    const status = parts[3]; // connected/disconnected
-                    const interfaceName = parts.slice(4).join(' ').trim(); // Название интерфейса
-
-                    console.log(`Interface: "${interfaceName}" - Index: ${index}, Status: ${status}`);
-
-                    // Пропускаем loopback интерфейсы (индекс 1 или имя содержит "Loopback")
-                    if (index === 1 || interfaceName.toLowerCase().includes('loopback')) {
-                        console.log(`Skipping loopback interface: "${interfaceName}"`);
-                        continue;
-                    }
-
-                    // Ищем подключенный интерфейс
-                    if (status === 'connected') {
-                        activeInterface = interfaceName;
-                        console.log(`Found active interface: "${activeInterface}"`);
-                        break; // Берем первый найденный активный интерфейс
-                    }
-                }
+            try {
+                const adapters = parseNetAdapters(output);
+                netAdaptersCache = { fingerprint, adapters };
+                resolve(adapters);
+            } catch (error) {
+                console.error('Failed to parse Get-NetAdapter output:', error);
+                resolve([]);
             }
-
-            console.log(`Selected active interface: "${activeInterface || 'none'}"`);
-            resolve(activeInterface);
         });
 
-        netsh.on('error', (error) => {
-            console.error('netsh command error:', error);
+        powershell.on('error', (error) => {
+            console.error('powershell error:', error);
             if (!resolved) {
                 clearTimeout(timeout);
                 resolved = true;
-                resolve(null);
+                resolve([]);
             }
         });
     });
 }
 
+async function getActiveInterface() {
+    const adapter = selectActiveAdapter(await getNetAdapters());
+    console.log(`Selected active interface: "${adapter ? adapter.name : 'none'}"`);
+    return adapter ? adapter.name : null;
+}
+
 function runNetshCommand(args) {
     return new Promise((resolve, reject) => {
         const netsh = spawn('netsh', args, {
@@ -647,10 +607,40 @@ ipcMain.handle('reboot-system', async () => {
 });
 
 // Проверка статуса установки нескольких программ
+// Один вызов `winget list` на всю пачку вместо процесса на каждую программу
 ipcMain.handle('check-multiple-programs-status', async (event, programIds) => {
     const results = {};
 
+    let installedIndex = null;
+    let indexError = null;
+    try {
+        installedIndex = await getInstalledIndex();
+    } catch (error) {
+        indexError = error.message;
+    }
+
     for (const programId of programIds) {
+        // winget обрезал длинный ID ("…") - такую программу проверяем отдельно
+        if (installedIndex && !installedIndex.has(programId.toLowerCase()) &&
+            matchesTruncatedId(installedIndex, programId)) {
+            results[programId] = {
+                installed: await checkPackageInstalled(programId),
+                error: null
+            };
+            continue;
+        }
+
+        if (installedIndex) {
+            const version = installedIndex.get(programId.toLowerCase());
+            results[programId] = {
+                installed: version !== undefined,
+                version: version || null,
+                error: null
+            };
+            continue;
+        }
+
+        // Индекс недоступен - проверяем программу отдельно
         try {
             const isInstalled = await checkPackageInstalled(programId);
             results[programId] = {
@@ -660,7 +650,7 @@ ipcMain.handle('check-multiple-programs-status', async (event, programIds) => {
         } catch (error) {
             results[programId] = {
                 installed: false,
-                error: error.message
+                error: error.message || indexError
             };
         }
     }
@@ -668,6 +658,52 @@ ipcMain.handle('check-multiple-programs-status', async (event, programIds) => {
     return results;
 });
 
+// Получение индекса установленных программ одним вызовом winget
+function getInstalledIndex() {
+    return new Promise((resolve, reject) => {
+        const winget = spawn('winget', ['list', '--accept-source-agreements'], {
+            stdio: 'pipe',
+            shell: true
+        });
+
+        let output = '';
+        let resolved = false;
+
+        // Таймаут для предотвращения зависания
+        const timeout = setTimeout(() => {
+            if (!resolved) {
+                winget.kill();
+                reject(new Error('Таймаут получения списка установленных программ'));
+                resolved = true;
+            }
+        }, 60000); // 60 секунд таймаут
+
+        winget.stdout.on('data', (data) => {
+            output += data.toString();
+        });
+
+        winget.on('close', (code) => {
+            if (resolved) return;
+            clearTimeout(timeout);
+            resolved = true;
+
+            if (code === 0) {
+                resolve(parseWingetList(output));
+            } else {
+                reject(new Error(`winget list завершился с кодом ${code}`));
+            }
+        });
+
+        winget.on('error', (error) => {
+            if (!resolved) {
+                clearTimeout(timeout);
+                resolved = true;
+                reject(error);
+            }
+        });
+    });
+}
+
 // Вспомогательная функция для проверки установки (дублирование для удобства)
 async function checkPackageInstalled(packageId) {
     return new Promise((resolve) => {
@@ -0,0 +1,159 @@
+// Разбор вывода winget и PowerShell без зависимостей от Electron (проверяется тестами в test/)
+
+// Признаки обрезанного значения в таблице winget
+const TRUNCATION_MARKS = ['…', '...'];
+
+// Символы шириной в две колонки консоли (иероглифы, хангыль, полноширинные формы)
+const WIDE_CHAR = /[ᄀ-ᅟ⺀-〾ぁ-㏿㐀-䶿一-鿿ꀀ-꓏가-힣豈-﫿︰-﹏＀-｠￠-￦\u{20000}-\u{3FFFD}]/u;
+const COMBINING_CHAR = /\p{M}/u;
+
+function charWidth(char) {
+    if (COMBINING_CHAR.test(char)) {
+        return 0;
+    }
+    return WIDE_CHAR.test(char) ? 2 : 1;
+}
+
+function displayWidth(text) {
+    let width = 0;
+    for (const char of text) {
+        width += charWidth(char);
+    }
+    return width;
+}
+
+// Срез строки по колонкам консоли: winget выравнивает таблицу по ширине символов
+function displaySlice(line, start, end) {
+    let column = 0;
+    let result = '';
+    for (const char of line) {
+        if (end !== undefined && column >= end) {
+            break;
+        }
+        if (column >= start) {
+            result += char;
+        }
+        column += charWidth(char);
+    }
+    return result;
+}
+
+// Начало обрезанного ID ("Contoso.LongName…" -> "contoso.longname") или null
+function truncatedIdPrefix(id) {
+    for (const mark of TRUNCATION_MARKS) {
+        if (id.endsWith(mark)) {
+            return id.slice(0, -mark.length).toLowerCase();
+        }
+    }
+    return null;
+}
+
+// Разбор табличного вывода `winget list` в Map id (в нижнем регистре) -> версия.
+// Обрезанные winget ID сохраняются как есть (с "…")
+function parseWingetList(output) {
+    const lines = output.split(/\r?\n|\r/);
+    const index = new Map();
+
+    // Таблица начинается после строки из дефисов, заголовок - строкой выше
+    // (одиночный "-" - это кадр спиннера winget, а не разделитель)
+    const sepIndex = lines.findIndex(line => /^-{4,}$/.test(line.trim()));
+    if (sepIndex <= 0) {
+        return index;
+    }
+
+    // Начала колонок: позиции, где после пробела начинается слово
+    const header = Array.from(lines[sepIndex - 1]);
+    const starts = [];
+    let column = 0;
+    for (let i = 0; i < header.length; i++) {
+        if (header[i] !== ' ' && (i === 0 || header[i - 1] === ' ')) {
+            starts.push(column);
+        }
+        column += charWidth(header[i]);
+    }
+    if (starts.length < 3) {
+        return index;
+    }
+
+    for (const line of lines.slice(sepIndex + 1)) {
+        if (displayWidth(line) <= starts[1] || !line.trim()) {
+            continue;
+        }
+        const id = displaySlice(line, starts[1], starts[2]).trim();
+        const version = displaySlice(line, starts[2], starts.length > 3 ? starts[3] : undefined).trim();
+        if (!id || id.includes(' ')) {
+            continue;
+        }
+        index.set(id.toLowerCase(), version);
+    }
+
+    return index;
+}
+
+// Совпадает ли ID с началом обрезанной записи индекса (тогда нужна отдельная проверка)
+function matchesTruncatedId(index, id) {
+    const lowered = id.toLowerCase();
+    for (const key of index.keys()) {
+        const prefix = truncatedIdPrefix(key);
+        if (prefix && lowered.startsWith(prefix)) {
+            return true;
+        }
+    }
+    return false;
+}
+
+function jsonList(value) {
+    if (value === null || value === undefined) {
+        return [];
+    }
+    return (Array.isArray(value) ? value : [value]).filter((item) => item !== null && item !== '').map(String);
+}
+
+// Разбор вывода NET_ADAPTERS_SCRIPT (main.js) в список адаптеров
+function parseNetAdapters(output) {
+    const text = output.trim();
+    if (!text) {
+        return [];
+    }
+    let data = JSON.parse(text);
+    // Старые PowerShell разворачивают массив из одного элемента в объект
+    if (!Array.isArray(data)) {
+        data = [data];
+    }
+    return data.filter((item) => item && item.Name).map((item) => ({
+        name: String(item.Name),
+        description: String(item.InterfaceDescription || ''),
+        index: parseInt(item.ifIndex, 10) || 0,
+        status: String(item.Status || ''),
+        virtual: Boolean(item.Virtual),
+        ipv4: jsonList(item.IPv4),
+        gateways: jsonList(item.Gateways),
+        dnsServers: jsonList(item.DnsServers)
+    }));
+}
+
+// Подключённый адаптер с IPv4 (не APIPA): со шлюзом, затем физический, затем меньший индекс
+function selectActiveAdapter(adapters) {
+    const candidates = adapters.filter((adapter) =>
+        adapter.status.toLowerCase() === 'up' &&
+        !adapter.description.toLowerCase().includes('loopback') &&
+        adapter.ipv4.some((address) => !address.startsWith('169.254.'))
+    );
+    candidates.sort((a, b) =>
+        (a.gateways.length ? 0 : 1) - (b.gateways.length ? 0 : 1) ||
+        Number(a.virtual) - Number(b.virtual) ||
+        a.index - b.index
+    );
+    return candidates[0] || null;
+}
+
+module.exports = {
+    parseWingetList,
+    truncatedIdPrefix,
+    matchesTruncatedId,
+    displaySlice,
+    displayWidth,
+    jsonList,
+    parseNetAdapters,
+    selectActiveAdapter
+};
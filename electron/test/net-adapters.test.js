@@ -0,0 +1,56 @@
+// Разбор вывода Get-NetAdapter на записанных фикстурах (общие с Python-тестами: tests/fixtures)
+const test = require('node:test');
+const assert = require('node:assert');
+const fs = require('fs');
+const path = require('path');
+
+const { parseNetAdapters, selectActiveAdapter } = require('../parsers');
+
+const FIXTURES = path.join(__dirname, '..', '..', 'tests', 'fixtures');
+
+function readFixture(...parts) {
+    return fs.readFileSync(path.join(FIXTURES, ...parts), 'utf8');
+}
+
+test('Get-NetAdapter: один адаптер - объект вместо массива', () => {
+    const adapters = parseNetAdapters(readFixture('net_adapters', 'single.json'));
+    assert.deepStrictEqual(adapters, [{
+        name: 'Ethernet',
+        description: 'Intel(R) Ethernet Connection (7) I219-V',
+        index: 12,
+        status: 'Up',
+        virtual: false,
+        ipv4: ['192.168.1.23'],
+        gateways: ['192.168.1.1'],
+        dnsServers: ['192.168.1.1']
+    }]);
+    assert.strictEqual(selectActiveAdapter(adapters), adapters[0]);
+});
+
+test('Get-NetAdapter: отключённые и виртуальные адаптеры', () => {
+    const adapters = parseNetAdapters(readFixture('net_adapters', 'multiple.json'));
+    assert.deepStrictEqual(adapters.map((adapter) => adapter.name), [
+        'Wi-Fi', 'vEthernet (Default Switch)', 'Ethernet 2', 'Ethernet', 'Bluetooth Network Connection'
+    ]);
+    assert.deepStrictEqual(adapters[4].ipv4, []);
+
+    const active = selectActiveAdapter(adapters);
+    assert.strictEqual(active.name, 'Ethernet');
+    assert.deepStrictEqual(active.dnsServers, ['1.1.1.1', '8.8.8.8']);
+
+    const remaining = adapters.filter((adapter) => adapter.name !== 'Ethernet');
+    assert.strictEqual(selectActiveAdapter(remaining).name, 'vEthernet (Default Switch)');
+});
+
+test('Get-NetAdapter: пустой вывод', () => {
+    for (const output of [readFixture('net_adapters', 'empty.txt'), '', '[]']) {
+        assert.deepStrictEqual(parseNetAdapters(output), []);
+    }
+    assert.strictEqual(selectActiveAdapter([]), null);
+});
+
+test('Get-NetAdapter: BOM и ошибка вместо JSON', () => {
+    const adapters = parseNetAdapters('\ufeff' + readFixture('net_adapters', 'single.json'));
+    assert.strictEqual(adapters[0].name, 'Ethernet');
+    assert.throws(() => parseNetAdapters('Get-NetAdapter : not recognized'), SyntaxError);
+});
@@ -0,0 +1,63 @@
+// Разбор вывода winget на записанных фикстурах (общие с Python-тестами: tests/fixtures)
+const test = require('node:test');
+const assert = require('node:assert');
+const fs = require('fs');
+const path = require('path');
+
+const { parseWingetList, truncatedIdPrefix, matchesTruncatedId } = require('../parsers');
+
+const FIXTURES = path.join(__dirname, '..', '..', 'tests', 'fixtures');
+
+function readFixture(...parts) {
+    return fs.readFileSync(path.join(FIXTURES, ...parts), 'utf8');
+}
+
+test('winget list: английская таблица', () => {
+    const index = parseWingetList(readFixture('winget_list', 'en_truncated.txt'));
+    assert.strictEqual(index.get('git.git'), '2.43.0');
+    assert.strictEqual(index.get('google.chrome'), '122.0.6261.112');
+    assert.strictEqual(index.get('microsoft.vcredist.2015+.x64'), '14.38.33135.0');
+    assert.strictEqual(index.get('{f132af7f-7bca-4ede-8a7c-958108fe7dbc}'), '6.0.9235.1');
+    assert.ok(![...index.keys()].some((key) => key.includes(' ')));
+});
+
+test('winget list: локализованный заголовок', () => {
+    const index = parseWingetList(readFixture('winget_list', 'ru_localized.txt'));
+    assert.deepStrictEqual(Object.fromEntries(index), {
+        'git.git': '2.43.0',
+        'yandex.browser': '24.1.5.709',
+        'discord.discord': '1.0.9032',
+        'microsoft.mrt': '5.121'
+    });
+});
+
+test('winget list: без колонки Available и без версии', () => {
+    const index = parseWingetList(readFixture('winget_list', 'no_available.txt'));
+    assert.strictEqual(index.get('notepad++.notepad++'), '8.6.4');
+    assert.strictEqual(index.get('python.python.3.12'), '3.12.2');
+    assert.strictEqual(index.get('arp\\machine\\x64\\legacyapp'), '');
+});
+
+test('winget list: широкие колонки и иероглифы в названиях', () => {
+    const index = parseWingetList(readFixture('winget_list', 'wide_columns.txt'));
+    assert.deepStrictEqual(Object.fromEntries(index), {
+        'tencent.wechat': '3.9.9.43',
+        'netease.cloudmusic': '2.10.12',
+        '7zip.7zip': '23.01',
+        'telegram.telegramdesktop': '4.15.2'
+    });
+});
+
+test('winget list: нет таблицы', () => {
+    assert.strictEqual(parseWingetList('No installed package found matching input criteria.\r\n').size, 0);
+    assert.strictEqual(parseWingetList('').size, 0);
+});
+
+test('winget list: обрезанный ID требует отдельной проверки', () => {
+    const index = parseWingetList(readFixture('winget_list', 'en_truncated.txt'));
+    assert.strictEqual(index.get('microsoft.visualstudio.2022.buildtool…'), '17.9.2');
+    assert.strictEqual(truncatedIdPrefix('Contoso.App...'), 'contoso.app');
+    assert.strictEqual(truncatedIdPrefix('Git.Git'), null);
+    assert.ok(matchesTruncatedId(index, 'Microsoft.VisualStudio.2022.BuildTools'));
+    assert.ok(!matchesTruncatedId(index, 'Mozilla.Firefox'));
+});
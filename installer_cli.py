@@ -0,0 +1,177 @@
+"""Консольный режим установщика: пакетная установка без Tk"""
+
+import argparse
+import json
+import shutil
+import sys
+
+import installer_core as core
+import installer_trace as trace
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="software_installer",
+        description="Установка программ через winget без графического интерфейса"
+    )
+    parser.add_argument("--install", nargs="+", metavar="ID", default=[],
+                        help="ID пакетов winget для установки")
+    parser.add_argument("--profile", action="append", default=[],
+                        help="Установить все программы категории (например, \"Разработка\")")
+    parser.add_argument("--list", action="store_true",
+                        help="Показать каталог программ и выйти")
+    parser.add_argument("--remote", action="store_true",
+                        help="Обновить каталог с GitHub (для --profile загружаются только нужные шарды)")
+    parser.add_argument("--build-shards", metavar="DIR",
+                        help="Разложить локальный каталог по шардам в DIR и выйти")
+    parser.add_argument("--json", action="store_true",
+                        help="Вывод результата в формате JSON")
+    parser.add_argument("--workers", type=int, default=None,
+                        help=f"Количество параллельных проверок (по умолчанию {core.INSTALL_WORKERS})")
+    parser.add_argument("--bulk", action="store_true",
+                        help="Установить всё одним вызовом winget import вместо list/show/install на каждый пакет")
+    parser.add_argument("--export-import", metavar="FILE",
+                        help="Сохранить выбранные программы как файл для winget import и выйти")
+    parser.add_argument("--prefetch", action="store_true",
+                        help="Только загрузить установщики выбранных программ в кэш (без установки)")
+    parser.add_argument("--cache-dir", metavar="DIR",
+                        help=f"Папка кэша установщиков (по умолчанию {core.PREFETCH_DIR}), может быть общей для нескольких машин")
+    parser.add_argument("--serve", action="store_true",
+                        help="Раздавать каталог и кэш установщиков другим машинам (зеркало)")
+    parser.add_argument("--port", type=int, default=None,
+                        help="Порт зеркала (по умолчанию 8765)")
+    parser.add_argument("--bind", default="0.0.0.0",
+                        help="Адрес, на котором слушает зеркало")
+    parser.add_argument("--resume", action="store_true",
+                        help="Продолжить прерванную установку по журналу")
+    parser.add_argument("--resume-after-reboot", action="store_true",
+                        help="Если установку прервёт перезагрузка, продолжить её при следующем входе")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="Сохранить трассировку процессов: .jsonl - построчно, иначе Chrome trace (chrome://tracing)")
+    return parser.parse_args(argv)
+
+
+def collect_packages(catalog, ids, profiles):
+    """Пакеты для установки: из профилей и по ID (неизвестные ID ставятся как есть)"""
+    selected = []
+    seen = set()
+
+    for profile in profiles:
+        for pkg in core.select_profile(catalog, profile):
+            if pkg.id.lower() not in seen:
+                seen.add(pkg.id.lower())
+                selected.append(pkg)
+
+    for pkg_id in ids:
+        if pkg_id.lower() in seen:
+            continue
+        seen.add(pkg_id.lower())
+        pkg = core.get_package(pkg_id) if catalog is core.PACKAGES else None
+        selected.append(pkg or core.make_package({"name": pkg_id, "id": pkg_id, "group": ""}))
+
+    return selected
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.cache_dir:
+        core.PREFETCH_DIR = args.cache_dir
+    catalog = core.load_catalog()
+
+    if args.build_shards:
+        index = core.build_catalog_shards(catalog, args.build_shards)
+        print(f"Шардов: {len(index['shards'])}, пакетов: {index['total']} -> {args.build_shards}")
+        return 0
+
+    if args.remote:
+        groups = set(args.profile) if args.profile and not args.install and not args.list else None
+        remote_packages = core.load_remote_packages(groups)
+        if remote_packages:
+            core.PACKAGES = remote_packages
+            catalog = remote_packages
+
+    if args.serve:
+        import installer_mirror
+        return installer_mirror.run_mirror(catalog, args.bind, args.port or installer_mirror.MIRROR_PORT)
+
+    if args.list:
+        if args.json:
+            print(json.dumps([core.package_to_dict(pkg) for pkg in catalog], ensure_ascii=False, indent=2))
+        else:
+            for pkg in catalog:
+                print(f"{pkg.id:<40} {pkg.group:<15} {pkg.name}")
+        return 0
+
+    journal = None
+    if args.resume:
+        journal = core.load_unfinished_journal()
+        if journal is None:
+            print("Незавершённой установки нет")
+            return 0
+        selected = journal["packages"]
+    else:
+        selected = collect_packages(catalog, args.install, args.profile)
+    if not selected:
+        print("Ничего не выбрано: укажите --install или --profile", file=sys.stderr)
+        return 2
+
+    if args.export_import:
+        core.write_import_manifest(selected, args.export_import)
+        print(f"Файл импорта сохранён: {args.export_import} ({len(selected)} программ)")
+        return 0
+
+    if not shutil.which("winget"):
+        print("winget не найден", file=sys.stderr)
+        return 1
+
+    on_status = None if args.json else print
+    if args.prefetch:
+        core.PREFETCH_ENABLED = True
+        futures = core.prefetch_packages(selected, speculative=False, skip_installed=False)
+        entries = [future.result() for future in futures]
+        for pkg, entry in zip(selected, entries):
+            if on_status:
+                print(f"{pkg.id:<40} {entry['version'] if entry else 'не загружен'}")
+        return 0 if all(entries) else 1
+
+    if journal is not None:
+        if on_status:
+            print(f"Продолжение установки: осталось {len(journal['remaining'])} из {len(selected)}")
+        results = core.resume_install(journal, on_status=on_status, workers=args.workers,
+                                      resume_after_reboot=args.resume_after_reboot, bulk=args.bulk)
+    elif args.bulk:
+        results = core.install_packages_bulk(selected, on_status=on_status,
+                                             resume_after_reboot=args.resume_after_reboot)
+    else:
+        results = core.install_packages(selected, on_status=on_status, workers=args.workers,
+                                        resume_after_reboot=args.resume_after_reboot)
+
+    if args.trace:
+        trace.export_trace(args.trace)
+
+    failed = [pkg_id for pkg_id, (status, _) in results.items()
+              if status not in (core.STATUS_INSTALLED, core.STATUS_ALREADY_INSTALLED)]
+
+    if args.json:
+        print(json.dumps({
+            "results": [
+                {"id": pkg.id, "name": pkg.name,
+                 "status": results[pkg.id][0], "message": results[pkg.id][1]}
+                for pkg in selected
+            ],
+            "needs_reboot": core.needs_reboot
+        }, ensure_ascii=False, indent=2))
+    else:
+        if args.trace:
+            print(trace.summary_table())
+            print(f"Трассировка сохранена: {args.trace}")
+        if core.needs_reboot:
+            print("Установка завершена. Требуется перезагрузка.")
+        else:
+            print("Установка завершена")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,2979 @@
+"""Ядро установщика без GUI: каталог, winget, DNS и планирование установки"""
+
+import subprocess
+import os
+import platform
+import re
+import logging
+import logging.handlers
+import json
+import urllib.request
+import urllib.error
+import urllib.parse
+import http.client
+import threading
+import time
+import ctypes
+import ipaddress
+import sys
+import hashlib
+import unicodedata
+import sqlite3
+import gzip
+import shutil
+import queue
+import atexit
+import tempfile
+from collections import namedtuple, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import installer_trace as trace
+
+# ===================== ЛОГ =====================
+
+# Лог пишется фоновым потоком QueueListener: рабочие потоки и Tk только кладут запись в очередь
+LOG_FILE = "installer.log"
+LOG_MAX_BYTES = 1024 * 1024          # размер сегмента до ротации
+LOG_BACKUP_COUNT = 5                 # старые сегменты сжимаются в installer.log.N.gz
+LOG_FORMAT = "%(asctime)s | %(levelname)s | %(message)s"
+# Необязательный JSONL-журнал (уровень, пакет, фаза, длительность), пусто - выключен
+LOG_JSONL_FILE = os.environ.get("INSTALLER_LOG_JSONL", "")
+# Последние записи в памяти - для окна журнала в GUI
+LOG_BUFFER_SIZE = 500
+
+recent_logs = deque(maxlen=LOG_BUFFER_SIZE)
+
+def log_segment_name(name):
+    """Имя сжатого сегмента после ротации"""
+    return name + ".gz"
+
+def compress_log_segment(source, dest):
+    """Ротация: старый сегмент сжимается gzip и удаляется"""
+    with open(source, "rb") as f_in, gzip.open(dest, "wb") as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+def remember_log_record(record):
+    """Фильтр обработчика файла: копия строки лога в кольцевой буфер"""
+    recent_logs.append(f"{time.strftime('%H:%M:%S', time.localtime(record.created))} | "
+                       f"{record.levelname} | {record.getMessage()}")
+    return True
+
+def add_json_line(record):
+    """Фильтр JSONL-обработчика: готовит строку записи"""
+    record.json_line = json.dumps({
+        "time": record.created,
+        "level": record.levelname,
+        "message": record.getMessage(),
+        "pkg_id": getattr(record, "pkg_id", None),
+        "phase": getattr(record, "phase", None),
+        "duration": getattr(record, "duration", None),
+    }, ensure_ascii=False)
+    return True
+
+def setup_logging():
+    """Очередь логов + фоновый поток записи с ротацией и необязательным JSONL"""
+    file_handler = logging.handlers.RotatingFileHandler(
+        LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8", delay=True
+    )
+    file_handler.namer = log_segment_name
+    file_handler.rotator = compress_log_segment
+    file_handler.setLevel(logging.INFO)
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    file_handler.addFilter(remember_log_record)
+    handlers = [file_handler]
+
+    if LOG_JSONL_FILE:
+        jsonl_handler = logging.handlers.RotatingFileHandler(
+            LOG_JSONL_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8", delay=True
+        )
+        jsonl_handler.namer = log_segment_name
+        jsonl_handler.rotator = compress_log_segment
+        jsonl_handler.setLevel(logging.DEBUG)
+        jsonl_handler.setFormatter(logging.Formatter("%(json_line)s"))
+        jsonl_handler.addFilter(add_json_line)
+        handlers.append(jsonl_handler)
+
+    log_queue = queue.SimpleQueue()
+    root_logger = logging.getLogger()
+    root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    # DEBUG нужен только JSONL-журналу (интервалы трассировки)
+    root_logger.setLevel(logging.DEBUG if LOG_JSONL_FILE else logging.INFO)
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    # Дописываем очередь при выходе
+    atexit.register(listener.stop)
+    return listener
+
+log_listener = setup_logging()
+
+def log(msg, level=logging.INFO, pkg_id=None, phase=None, duration=None):
+    logging.log(level, msg, extra={"pkg_id": pkg_id, "phase": phase, "duration": duration})
+
+def get_recent_logs():
+    """Последние строки лога без чтения файла"""
+    return list(recent_logs)
+
+def log_span(record):
+    """Интервал трассировки -> запись DEBUG (попадает только в JSONL-журнал)"""
+    log(f"{record['phase']} {record['pkg_id'] or ''} код {record['returncode']}"
+        + (" (таймаут)" if record["timeout"] else ""),
+        level=logging.DEBUG, pkg_id=record["pkg_id"], phase=record["phase"], duration=record["duration"])
+
+if LOG_JSONL_FILE:
+    trace.span_listeners.append(log_span)
+
+# Настройки кэша метаданных winget (рядом с installer.log)
+CACHE_FILE = "installer_cache.db"
+CACHE_MAX_ENTRIES = 2000
+CACHE_TTL_EXISTS = 24 * 60 * 60       # пакет есть в каталоге winget
+CACHE_TTL_NOT_FOUND = 60 * 60         # пакета нет в каталоге
+CACHE_TTL_INSTALLED = 10 * 60         # состояние установки меняется чаще
+
+# Настройки GitHub
+GITHUB_REPO = "Vvyiloff/Post-Install"  # Ваш репозиторий
+GITHUB_RAW_URL = f"https://raw.githubusercontent.com/{GITHUB_REPO}/main/packages.json"
+# Источники каталога по порядку (зеркала в локальной сети, затем GitHub).
+# Пути внутри источника: packages.json, catalog/index.json, installers/index.json, sha256/<хэш>
+CATALOG_URLS = [
+    url.strip().rstrip("/") + "/"
+    for url in os.environ.get("INSTALLER_CATALOG_URLS", "").split(",") if url.strip()
+] + [urllib.parse.urljoin(GITHUB_RAW_URL, ".")]
+LOCAL_PACKAGES_FILE = "packages.json"
+# ETag / Last-Modified последней загрузки, соответствующие LOCAL_PACKAGES_FILE
+PACKAGES_VALIDATORS_FILE = "packages.meta.json"
+# Шардированный каталог: index.json + по файлу на группу, кэш шардов по хэшу
+CATALOG_INDEX_PATH = "catalog/index.json"
+SHARD_CACHE_DIR = "catalog_cache"
+
+# Настройки DNS
+DNS1 = "176.99.11.77"
+DNS2 = "80.78.247.254"
+DOH_TEMPLATE = "https://xbox-dns.ru/dns-query"
+
+# Настройки установки
+# Количество параллельных проверок пакетов (сам запуск установщиков идёт по одному)
+INSTALL_WORKERS = max(1, int(os.environ.get("INSTALL_WORKERS", "4")))
+# Файл трассировки установки (.jsonl или Chrome trace .json), пусто - без экспорта
+TRACE_FILE = os.environ.get("INSTALLER_TRACE", "")
+
+valorant_installed = False
+needs_reboot = False
+update_available = False
+
+REQUIRED_PACKAGE_FIELDS = ("name", "id", "group")
+
+def is_admin():
+    """Проверка прав администратора"""
+    try:
+        return ctypes.windll.shell32.IsUserAnAdmin()
+    except:
+        return False
+
+def validate_package(pkg):
+    """Валидация структуры пакета. Возвращает описание ошибки или None"""
+    if not isinstance(pkg, dict):
+        return f"пакет не является объектом: {pkg!r}"
+
+    for field in REQUIRED_PACKAGE_FIELDS:
+        value = pkg.get(field)
+        if value is None:
+            return f"нет обязательного поля '{field}': {pkg}"
+        if not isinstance(value, str) or not value.strip():
+            return f"поле '{field}' пустое или не является строкой: {pkg}"
+
+    # Валидация ID пакета (должен содержать точку для разделения publisher.app)
+    if "." not in pkg["id"]:
+        return f"неверный формат ID пакета: {pkg['id']}"
+
+    # Порядок установки: ID пакетов, которые ставятся раньше, и точка синхронизации
+    depends_on = pkg.get("depends_on")
+    if depends_on is not None:
+        if isinstance(depends_on, str):
+            depends_on = [depends_on]
+        if not isinstance(depends_on, list) or not all(isinstance(d, str) and d.strip() for d in depends_on):
+            return f"поле 'depends_on' должно быть списком ID пакетов: {pkg}"
+        if pkg["id"].lower() in (d.lower() for d in depends_on):
+            return f"пакет зависит сам от себя: {pkg['id']}"
+    if "barrier" in pkg and not isinstance(pkg["barrier"], bool):
+        return f"поле 'barrier' должно быть true/false: {pkg}"
+
+    # Необязательные подсказки для таймаута установки (секунды и мегабайты)
+    for field in ("timeout", "expected_size"):
+        value = pkg.get(field)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0):
+            return f"поле '{field}' должно быть положительным числом: {pkg}"
+
+    return None
+
+def validate_packages_list(packages):
+    """Валидация списка пакетов за один проход: возвращает список Package или False"""
+    if not isinstance(packages, list):
+        log("Список пакетов не является массивом")
+        return False
+
+    if not packages:
+        log("Список пакетов пуст")
+        return False
+
+    valid_packages = []
+    errors = []
+    seen_ids = set()
+    interned_groups = {}
+    for pkg in packages:
+        error = validate_package(pkg)
+        if error is None:
+            key = pkg["id"].lower()
+            if key in seen_ids:
+                error = f"повторяющийся ID пакета: {pkg['id']}"
+        if error is not None:
+            errors.append(error)
+            continue
+        seen_ids.add(key)
+        valid_packages.append(make_package(pkg, interned_groups))
+
+    # Пакеты с циклическими зависимостями (и зависящие от цикла) не устанавливаются
+    unordered = find_dependency_cycles(valid_packages)
+    if unordered:
+        errors.extend(f"циклическая зависимость: {pkg.id}" for pkg in valid_packages if pkg.id.lower() in unordered)
+        valid_packages = [pkg for pkg in valid_packages if pkg.id.lower() not in unordered]
+
+    # Одна запись в лог на весь список вместо строки на каждый пакет
+    if errors:
+        shown = "\n  ".join(errors[:20])
+        more = f"\n  ... и ещё {len(errors) - 20}" if len(errors) > 20 else ""
+        log(f"Пропущено некорректных пакетов: {len(errors)}\n  {shown}{more}")
+
+    if not valid_packages:
+        log("Нет корректных пакетов в списке")
+        return False
+
+    return valid_packages
+
+def validate_dns_address(address):
+    """Валидация DNS адреса"""
+    try:
+        ipaddress.ip_address(address)
+        return True
+    except ValueError:
+        return False
+
+def validate_dns_config():
+    """Валидация DNS конфигурации"""
+    if not validate_dns_address(DNS1):
+        log(f"Неверный первичный DNS адрес: {DNS1}")
+        return False
+    if not validate_dns_address(DNS2):
+        log(f"Неверный вторичный DNS адрес: {DNS2}")
+        return False
+    return True
+
+# ===================== ПАКЕТЫ =====================
+
+# Иконки для программ (emoji)
+PROGRAM_ICONS = {
+    "Steam": "🎮",
+    "Epic Games Launcher": "🎯",
+    "Ubisoft Connect": "🛡️",
+    "VALORANT (EU)": "⚔️",
+    "Visual Studio Code": "💻",
+    "Git": "🔀",
+    "Cursor": "✏️",
+    "Termius": "🖥️",
+    "Unity Hub": "🎨",
+    "Google Chrome": "🌐",
+    "Telegram": "💬",
+    "7-Zip": "📦",
+    "VLC": "🎬",
+    "Paint.NET": "🎨",
+    "Yandex.Disk": "☁️",
+    "OBS Studio": "📹",
+    "Discord": "🎧",
+    "Spotify": "🎵",
+    "Blender": "🎭",
+    "GIMP": "🖌️"
+}
+
+# Цвета для категорий
+CATEGORY_COLORS = {
+    "Игры": "#e74c3c",
+    "Разработка": "#3498db",
+    "Базовый софт": "#27ae60",
+    "Стриминг": "#9b59b6",
+    "Коммуникация": "#f39c12",
+    "Музыка": "#e91e63",
+    "3D-графика": "#607d8b",
+    "Графика": "#795548"
+}
+
+DEFAULT_ICON = "📦"
+DEFAULT_COLOR = "#6c757d"
+
+# Поля каталога, которые хранятся в Package отдельно
+PACKAGE_FIELDS = ("name", "id", "group", "reboot", "special")
+PACKAGE_FIELDS_SET = frozenset(PACKAGE_FIELDS)
+
+# Пакет каталога: компактный неизменяемый кортеж, проверяется один раз при загрузке.
+# Иконка и цвет вычисляются сразу, остальные поля каталога сохраняются в extra
+Package = namedtuple(
+    "Package",
+    ["name", "id", "group", "reboot", "special", "icon", "color", "extra"],
+    defaults=(False, None, DEFAULT_ICON, DEFAULT_COLOR, None)
+)
+
+def make_package(data, interned_groups=None):
+    """Создаёт Package из проверенной записи каталога"""
+    group = data["group"]
+    if interned_groups is not None:
+        group = interned_groups.setdefault(group, group)
+    else:
+        group = sys.intern(group)
+    extra = None
+    # Почти у всех записей нет дополнительных полей - словарь собирается только для них
+    if len(data) > 3:
+        if data.keys() - PACKAGE_FIELDS_SET:
+            extra = {key: value for key, value in data.items() if key not in PACKAGE_FIELDS_SET}
+    name = data["name"]
+    # Кортеж собирается напрямую, без разбора аргументов в Package.__new__
+    return tuple.__new__(Package, (
+        name,
+        data["id"],
+        group,
+        bool(data.get("reboot", False)),
+        data.get("special"),
+        PROGRAM_ICONS.get(name, DEFAULT_ICON),
+        CATEGORY_COLORS.get(group, DEFAULT_COLOR),
+        extra,
+    ))
+
+def package_to_dict(pkg):
+    """Запись каталога в формате packages.json"""
+    data = {"name": pkg.name, "id": pkg.id, "group": pkg.group}
+    if pkg.reboot:
+        data["reboot"] = True
+    if pkg.special is not None:
+        data["special"] = pkg.special
+    if pkg.extra:
+        data.update(pkg.extra)
+    return data
+
+def package_dependencies(pkg):
+    """ID зависимостей пакета (в нижнем регистре)"""
+    depends_on = (pkg.extra or {}).get("depends_on") or []
+    if isinstance(depends_on, str):
+        depends_on = [depends_on]
+    return [dep.lower() for dep in depends_on]
+
+def is_barrier(pkg):
+    """Пакет-барьер ставится в одиночку после всех остальных"""
+    return bool((pkg.extra or {}).get("barrier"))
+
+def find_dependency_cycles(packages):
+    """ID пакетов, которые нельзя упорядочить (цикл или зависимость от цикла).
+    Алгоритм Кана; зависимости вне списка не учитываются"""
+    # В цикле могут быть только пакеты с зависимостями - граф строится только из них.
+    # Зависимость от пакета без зависимостей всегда выполнима и не учитывается
+    with_deps = [pkg for pkg in packages if pkg.extra and pkg.extra.get("depends_on")]
+    if not with_deps:
+        return set()
+
+    ids = {pkg.id.lower() for pkg in with_deps}
+    waiting = {}
+    dependents = {}
+    for pkg in with_deps:
+        deps = {dep for dep in package_dependencies(pkg) if dep in ids}
+        waiting[pkg.id.lower()] = len(deps)
+        for dep in deps:
+            dependents.setdefault(dep, []).append(pkg.id.lower())
+
+    ready = [pkg_id for pkg_id, count in waiting.items() if count == 0]
+    while ready:
+        pkg_id = ready.pop()
+        for dependent in dependents.get(pkg_id, ()):
+            waiting[dependent] -= 1
+            if waiting[dependent] == 0:
+                ready.append(dependent)
+    return {pkg_id for pkg_id, count in waiting.items() if count > 0}
+
+packages_by_id = None
+
+def get_package(pkg_id):
+    """Пакет каталога по id (без учёта регистра) или None"""
+    global packages_by_id
+    if packages_by_id is None or packages_by_id[0] is not PACKAGES:
+        packages_by_id = (PACKAGES, {pkg.id.lower(): pkg for pkg in PACKAGES})
+    return packages_by_id[1].get(pkg_id.lower())
+
+BUILTIN_PACKAGES = [
+    # Игры
+    {"name": "Steam", "id": "Valve.Steam", "group": "Игры"},
+    {"name": "Epic Games Launcher", "id": "EpicGames.EpicGamesLauncher", "group": "Игры"},
+    {"name": "Ubisoft Connect", "id": "Ubisoft.Connect", "group": "Игры"},
+    {"name": "VALORANT (EU)", "id": "RiotGames.Valorant.EU", "group": "Игры", "reboot": True, "special": "valorant"},
+
+    # Разработка
+    {"name": "Visual Studio Code", "id": "Microsoft.VisualStudioCode", "group": "Разработка"},
+    {"name": "Git", "id": "Git.Git", "group": "Разработка"},
+    {"name": "Cursor", "id": "Anysphere.Cursor", "group": "Разработка", "depends_on": ["Git.Git"]},
+    {"name": "Termius", "id": "Termius.Termius", "group": "Разработка"},
+    {"name": "Unity Hub", "id": "Unity.UnityHub", "group": "Разработка"},
+
+    # Базовый софт
+    {"name": "Google Chrome", "id": "Google.Chrome", "group": "Базовый софт"},
+    {"name": "Telegram", "id": "Telegram.TelegramDesktop", "group": "Базовый софт"},
+    {"name": "7-Zip", "id": "7zip.7zip", "group": "Базовый софт"},
+    {"name": "VLC", "id": "VideoLAN.VLC", "group": "Базовый софт"},
+    {"name": "Paint.NET", "id": "dotPDN.PaintDotNet", "group": "Базовый софт"},
+]
+
+PACKAGES = validate_packages_list(BUILTIN_PACKAGES)
+
+# ===================== ПОИСК =====================
+
+# Транслитерация кириллицы: запрос "телеграм" находит "Telegram".
+# "х" -> "h", чтобы "хром" совпадал с "chrome" по триграммам
+TRANSLIT = str.maketrans({
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "e",
+    "ж": "zh", "з": "z", "и": "i", "й": "y", "к": "k", "л": "l", "м": "m",
+    "н": "n", "о": "o", "п": "p", "р": "r", "с": "s", "т": "t", "у": "u",
+    "ф": "f", "х": "h", "ц": "c", "ч": "ch", "ш": "sh", "щ": "sch", "ъ": "",
+    "ы": "y", "ь": "", "э": "e", "ю": "yu", "я": "ya",
+})
+
+search_index = None
+
+def normalize_search_text(text):
+    """Нижний регистр, латиница, только буквы и цифры через пробел"""
+    text = text.lower().translate(TRANSLIT)
+    return " ".join(re.findall(r"[a-z0-9]+", text))
+
+def trigrams(text, padded=True):
+    """Триграммы текста; с пробелами по краям - для индекса, без них - для запроса,
+    чтобы запрос находил и префиксы, и подстроки слов ("git" -> "GitHub Desktop")"""
+    if padded:
+        text = f" {text} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def build_search_index(packages):
+    """Строит поисковый индекс по имени, id и группе один раз на каталог"""
+    entries = []
+    trigram_map = {}
+    prefix_map = {}
+    groups = {}
+
+    for i, pkg in enumerate(packages):
+        name = normalize_search_text(pkg.name)
+        pkg_id = normalize_search_text(pkg.id)
+        group = normalize_search_text(pkg.group)
+        entries.append((name, pkg_id, group))
+        groups.setdefault(pkg.group, []).append(pkg)
+
+        text = f"{name} {pkg_id} {group}"
+        for gram in trigrams(text):
+            trigram_map.setdefault(gram, set()).add(i)
+        # Префиксы слов для коротких запросов (1-2 символа)
+        for word in text.split():
+            prefix_map.setdefault(word[:1], set()).add(i)
+            prefix_map.setdefault(word[:2], set()).add(i)
+
+    return {
+        "source": packages,
+        "entries": entries,
+        "trigrams": trigram_map,
+        "prefixes": prefix_map,
+        "groups": groups,
+    }
+
+def get_search_index():
+    """Индекс текущего каталога (перестраивается при смене PACKAGES)"""
+    global search_index
+    if search_index is None or search_index["source"] is not PACKAGES:
+        search_index = build_search_index(PACKAGES)
+    return search_index
+
+def group_packages(group):
+    """Пакеты категории из корзины индекса"""
+    return get_search_index()["groups"].get(group, [])
+
+def rank_match(query, entry):
+    """Ранг совпадения (меньше - лучше) или None"""
+    name, pkg_id, group = entry
+    if name == query:
+        return 0
+    if name.startswith(query):
+        return 1
+    if f" {query}" in f" {name}":
+        return 2
+    if query in name:
+        return 3
+    if query in pkg_id:
+        return 4
+    if query in group:
+        return 5
+    return None
+
+def search_packages(query, group=None):
+    """Ранжированный поиск по каталогу с учётом транслитерации и опечаток"""
+    index = get_search_index()
+    packages = index["source"]
+    query = normalize_search_text(query)
+
+    if group is not None:
+        allowed = {id(pkg) for pkg in index["groups"].get(group, [])}
+    else:
+        allowed = None
+
+    if not query:
+        return list(index["groups"].get(group, [])) if group is not None else list(packages)
+
+    # Кандидаты: пересечение триграмм (или префиксы для коротких запросов)
+    if len(query) < 3:
+        candidates = set()
+        for word in query.split():
+            candidates |= index["prefixes"].get(word, set())
+    else:
+        query_grams = trigrams(query, padded=False)
+        posting = sorted((index["trigrams"].get(g, set()) for g in query_grams), key=len)
+        candidates = set.intersection(*posting) if posting and posting[0] else set()
+
+    ranked = []
+    for i in candidates:
+        if allowed is not None and id(packages[i]) not in allowed:
+            continue
+        rank = rank_match(query, index["entries"][i])
+        if rank is not None:
+            ranked.append((rank, i))
+
+    # Нечёткое совпадение по доле общих триграмм (опечатки, "хром" -> "chrome")
+    if not ranked and len(query) >= 3:
+        scores = {}
+        for gram in query_grams:
+            for i in index["trigrams"].get(gram, ()):
+                scores[i] = scores.get(i, 0) + 1
+        threshold = max(2, len(query_grams) // 2)
+        for i, score in scores.items():
+            if score >= threshold and (allowed is None or id(packages[i]) in allowed):
+                ranked.append((10 - score / len(query_grams), i))
+
+    ranked.sort()
+    return [packages[i] for _, i in ranked]
+
+# ===================== КЭШ =====================
+
+cache_lock = threading.Lock()
+cache_conn = None
+cache_hits = 0
+cache_misses = 0
+# Отметки использования для LRU копятся в памяти и пишутся вместе с cache_set или при выходе,
+# чтобы чтение из кэша не открывало транзакцию записи
+CACHE_TOUCH_INTERVAL = 60 * 60
+pending_touches = {}  # (pkg_id, kind) -> время последнего чтения
+
+def get_cache_connection():
+    """Открывает (один раз) SQLite-кэш метаданных"""
+    global cache_conn
+    if cache_conn is None:
+        cache_conn = sqlite3.connect(CACHE_FILE, check_same_thread=False)
+        cache_conn.execute(
+            "CREATE TABLE IF NOT EXISTS metadata ("
+            "pkg_id TEXT NOT NULL, kind TEXT NOT NULL, value TEXT, "
+            "expires_at REAL NOT NULL, last_used REAL NOT NULL, "
+            "PRIMARY KEY (pkg_id, kind))"
+        )
+        # История длительностей вызовов winget для адаптивных таймаутов
+        cache_conn.execute(
+            "CREATE TABLE IF NOT EXISTS durations ("
+            "pkg_id TEXT NOT NULL, phase TEXT NOT NULL, duration REAL NOT NULL, "
+            "timed_out INTEGER NOT NULL, recorded_at REAL NOT NULL)"
+        )
+        cache_conn.execute(
+            "CREATE INDEX IF NOT EXISTS durations_key ON durations (pkg_id, phase, recorded_at)"
+        )
+        cache_conn.commit()
+    return cache_conn
+
+def cache_get(pkg_id, kind):
+    """Возвращает значение из кэша или None, если записи нет или она устарела"""
+    global cache_hits, cache_misses
+    now = time.time()
+    try:
+        with cache_lock:
+            conn = get_cache_connection()
+            row = conn.execute(
+                "SELECT value, expires_at, last_used FROM metadata WHERE pkg_id = ? AND kind = ?",
+                (pkg_id.lower(), kind)
+            ).fetchone()
+            if row is None or row[1] < now:
+                cache_misses += 1
+                return None
+            # Точность LRU до CACHE_TOUCH_INTERVAL достаточна для вытеснения
+            if now - row[2] > CACHE_TOUCH_INTERVAL:
+                pending_touches[(pkg_id.lower(), kind)] = now
+            cache_hits += 1
+            return json.loads(row[0])
+    except (sqlite3.Error, ValueError) as e:
+        log(f"Ошибка чтения кэша для {pkg_id}: {e}")
+        return None
+
+def write_pending_touches(conn):
+    """Переносит накопленные отметки использования в таблицу (без commit, под cache_lock)"""
+    if pending_touches:
+        conn.executemany(
+            "UPDATE metadata SET last_used = ? WHERE pkg_id = ? AND kind = ?",
+            [(used, pkg_id, kind) for (pkg_id, kind), used in pending_touches.items()]
+        )
+        pending_touches.clear()
+
+def flush_cache_touches():
+    """Сохраняет отметки использования при выходе"""
+    if not pending_touches or cache_conn is None:
+        return
+    try:
+        with cache_lock:
+            write_pending_touches(cache_conn)
+            cache_conn.commit()
+    except sqlite3.Error as e:
+        log(f"Ошибка записи кэша: {e}")
+
+atexit.register(flush_cache_touches)
+
+def cache_set(pkg_id, kind, value, ttl):
+    """Сохраняет значение в кэш и вытесняет давно не использованные записи"""
+    now = time.time()
+    try:
+        with cache_lock:
+            conn = get_cache_connection()
+            # Отметки использования - до вытеснения, в той же транзакции
+            write_pending_touches(conn)
+            conn.execute(
+                "INSERT OR REPLACE INTO metadata (pkg_id, kind, value, expires_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (pkg_id.lower(), kind, json.dumps(value), now + ttl, now)
+            )
+            # LRU-вытеснение сверх лимита
+            conn.execute(
+                "DELETE FROM metadata WHERE rowid IN ("
+                "SELECT rowid FROM metadata ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (CACHE_MAX_ENTRIES,)
+            )
+            conn.commit()
+    except sqlite3.Error as e:
+        log(f"Ошибка записи кэша для {pkg_id}: {e}")
+
+def cache_invalidate(pkg_id):
+    """Удаляет все записи пакета (после установки или удаления)"""
+    try:
+        with cache_lock:
+            conn = get_cache_connection()
+            conn.execute("DELETE FROM metadata WHERE pkg_id = ?", (pkg_id.lower(),))
+            conn.commit()
+    except sqlite3.Error as e:
+        log(f"Ошибка очистки кэша для {pkg_id}: {e}")
+
+def log_cache_stats():
+    """Пишет в лог счётчики попаданий и промахов кэша"""
+    log(f"Кэш метаданных: попаданий {cache_hits}, промахов {cache_misses}")
+
+# ===================== ТАЙМАУТЫ =====================
+
+# Таймауты по фазам: (минимум, по умолчанию без истории, максимум), секунды
+TIMEOUT_LIMITS = {
+    "winget show": (10, 30, 120),
+    "winget list --id": (10, 30, 120),
+    "winget list": (20, 60, 300),
+    "winget uninstall": (30, 60, 600),
+    "winget install": (60, 300, 3600),
+    "winget download": (30, 600, 3600),
+    "cached install": (60, 300, 3600),
+}
+TIMEOUT_FACTOR = 3          # запас над p99 наблюдаемых длительностей
+TIMEOUT_MIN_SAMPLES = 3     # меньше замеров - берём значение по умолчанию
+TIMEOUT_HISTORY_SIZE = 50   # сколько последних замеров хранится на пакет и фазу
+# Скорость загрузки для подсказки expected_size (МБ/с, с запасом на медленный канал)
+TIMEOUT_MIN_SPEED_MB = 0.5
+
+def record_duration(record):
+    """Обработчик интервала трассировки: длительность вызова winget в историю.
+    Записываются только успешные вызовы и таймауты: быстрые ошибки ("пакет не найден",
+    промах winget list --id) и отменённые установки занизили бы p99, и крупную установку
+    оборвал бы таймаут, выведенный из такой истории"""
+    if record["phase"] not in TIMEOUT_LIMITS or record.get("cancelled"):
+        return
+    success_codes = INSTALL_SUCCESS_CODES if record["phase"] in ("winget install", "cached install") else (0,)
+    if not record["timeout"] and record["returncode"] not in success_codes:
+        return
+    pkg_id = (record["pkg_id"] or "").lower()
+    try:
+        with cache_lock:
+            conn = get_cache_connection()
+            conn.execute(
+                "INSERT INTO durations (pkg_id, phase, duration, timed_out, recorded_at) VALUES (?, ?, ?, ?, ?)",
+                (pkg_id, record["phase"], record["duration"], int(record["timeout"]), time.time())
+            )
+            conn.execute(
+                "DELETE FROM durations WHERE pkg_id = ? AND phase = ? AND rowid NOT IN ("
+                "SELECT rowid FROM durations WHERE pkg_id = ? AND phase = ? "
+                "ORDER BY recorded_at DESC LIMIT ?)",
+                (pkg_id, record["phase"], pkg_id, record["phase"], TIMEOUT_HISTORY_SIZE)
+            )
+            conn.commit()
+    except sqlite3.Error as e:
+        log(f"Ошибка записи истории длительностей для {pkg_id}: {e}")
+
+trace.span_listeners.append(record_duration)
+
+def get_duration_history(pkg_id, phase):
+    """Последние длительности вызова (секунды); таймауты записаны как время до обрыва"""
+    try:
+        with cache_lock:
+            conn = get_cache_connection()
+            rows = conn.execute(
+                "SELECT duration FROM durations WHERE pkg_id = ? AND phase = ?",
+                ((pkg_id or "").lower(), phase)
+            ).fetchall()
+        return [row[0] for row in rows]
+    except sqlite3.Error as e:
+        log(f"Ошибка чтения истории длительностей для {pkg_id}: {e}")
+        return []
+
+def get_timeout(phase, pkg_id=None):
+    """Таймаут вызова winget: подсказка каталога, затем p99 истории x TIMEOUT_FACTOR
+    в пределах TIMEOUT_LIMITS, иначе значение по умолчанию"""
+    floor, default, ceiling = TIMEOUT_LIMITS[phase]
+
+    if phase == "winget install" and pkg_id:
+        pkg = get_package(pkg_id)
+        hints = (pkg.extra or {}) if pkg else {}
+        if hints.get("timeout"):
+            return min(max(hints["timeout"], floor), ceiling)
+        if hints.get("expected_size"):
+            default = min(max(default, floor + hints["expected_size"] / TIMEOUT_MIN_SPEED_MB), ceiling)
+
+    history = sorted(get_duration_history(pkg_id, phase))
+    if len(history) < TIMEOUT_MIN_SAMPLES:
+        return default
+
+    p99 = history[min(len(history) - 1, int(len(history) * 0.99))]
+    return min(max(p99 * TIMEOUT_FACTOR, floor), ceiling)
+
+# ===================== WINGET =====================
+
+def parse_winget_show_version(output):
+    """Извлекает версию из вывода `winget show`"""
+    match = re.search(r"^\s*(?:Version|Версия)\s*:\s*(\S+)", output, re.MULTILINE)
+    return match.group(1) if match else None
+
+def winget_exists(pkg_id):
+    cached = cache_get(pkg_id, "exists")
+    if cached is not None:
+        return cached["exists"]
+
+    try:
+        result = trace.traced_run(
+            ["winget", "show", "--id", pkg_id, "-e"], "winget show", pkg_id,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            encoding="utf-8",
+            errors="replace",
+            timeout=get_timeout("winget show", pkg_id)
+        )
+        exists = result.returncode == 0
+        cache_set(
+            pkg_id, "exists",
+            {"exists": exists, "version": parse_winget_show_version(result.stdout or "") if exists else None},
+            CACHE_TTL_EXISTS if exists else CACHE_TTL_NOT_FOUND
+        )
+        return exists
+    except subprocess.TimeoutExpired:
+        log(f"Таймаут проверки пакета {pkg_id}")
+        return False
+    except FileNotFoundError:
+        log("winget не найден")
+        return False
+    except Exception as e:
+        log(f"Ошибка проверки пакета {pkg_id}: {e}")
+        return False
+
+# Индекс установленных программ: id (в нижнем регистре) -> версия.
+# Заполняется одним вызовом `winget list` вместо отдельного процесса на каждый пакет
+installed_index = {}
+installed_index_loaded = False
+installed_index_lock = threading.Lock()
+# Длинные ID winget обрезает до ширины колонки: (начало ID, ключ индекса)
+installed_truncated = []
+
+# Признаки обрезанного значения в таблице winget
+WINGET_TRUNCATION_MARKS = ("…", "...")
+
+def truncated_id_prefix(pkg_id):
+    """Начало обрезанного ID ("Contoso.LongName…" -> "contoso.longname") или None"""
+    for mark in WINGET_TRUNCATION_MARKS:
+        if pkg_id.endswith(mark):
+            return pkg_id[:-len(mark)].lower()
+    return None
+
+def char_width(char):
+    """Ширина символа в колонках консоли: иероглифы занимают две"""
+    if unicodedata.combining(char):
+        return 0
+    return 2 if unicodedata.east_asian_width(char) in ("W", "F") else 1
+
+def display_slice(line, start, end=None):
+    """Срез строки по колонкам консоли: winget выравнивает таблицу по ширине символов"""
+    if line.isascii():
+        return line[start:end]
+    column = 0
+    chars = []
+    for char in line:
+        if end is not None and column >= end:
+            break
+        if column >= start:
+            chars.append(char)
+        column += char_width(char)
+    return "".join(chars)
+
+def display_width(line):
+    return len(line) if line.isascii() else sum(char_width(char) for char in line)
+
+def parse_winget_list(output):
+    """Разбор табличного вывода `winget list` в словарь id -> версия.
+    Обрезанные winget ID сохраняются как есть (с "…"), см. truncated_id_prefix"""
+    lines = output.splitlines()
+
+    # Таблица начинается после строки из дефисов, заголовок - строкой выше
+    # (одиночный "-" - это кадр спиннера winget, а не разделитель)
+    sep_index = None
+    for i, line in enumerate(lines):
+        if len(line.strip()) > 3 and set(line.strip()) == {"-"}:
+            sep_index = i
+            break
+    if sep_index is None or sep_index == 0:
+        return {}
+
+    header = lines[sep_index - 1]
+
+    # Начала колонок: позиции, где после пробела начинается слово
+    starts = [display_width(header[:m.start()]) for m in re.finditer(r"(?:^|(?<=\s))\S", header)]
+    if len(starts) < 3:
+        return {}
+
+    packages = {}
+    for line in lines[sep_index + 1:]:
+        if display_width(line) <= starts[1] or not line.strip():
+            continue
+        pkg_id = display_slice(line, starts[1], starts[2]).strip()
+        end = starts[3] if len(starts) > 3 else None
+        version = display_slice(line, starts[2], end).strip()
+        # Строки без id (например, ARP-записи с пробелами) пропускаем
+        if not pkg_id or " " in pkg_id:
+            continue
+        packages[pkg_id.lower()] = version
+    return packages
+
+def installed_version(pkg_id):
+    """Версия установленной программы по индексу (без запуска процессов) или None.
+    Для обрезанного winget ID - только при однозначном совпадении начала"""
+    version = installed_index.get(pkg_id.lower())
+    if version is not None:
+        return version
+    matches = [key for prefix, key in installed_truncated if pkg_id.lower().startswith(prefix)]
+    return installed_index.get(matches[0]) if len(matches) == 1 else None
+
+def refresh_installed_index():
+    """Перечитывает индекс установленных программ одним вызовом winget"""
+    global installed_index, installed_index_loaded, installed_truncated
+    try:
+        result = trace.traced_run(
+            ["winget", "list", "--accept-source-agreements"], "winget list",
+            capture_output=True,
+            encoding="utf-8",
+            errors="replace",
+            timeout=get_timeout("winget list")
+        )
+    except subprocess.TimeoutExpired:
+        log("Таймаут получения списка установленных программ")
+        return False
+    except FileNotFoundError:
+        log("winget не найден")
+        return False
+    except Exception as e:
+        log(f"Ошибка получения списка установленных программ: {e}")
+        return False
+
+    if result.returncode != 0:
+        log(f"winget list завершился с кодом {result.returncode}")
+        return False
+
+    index = parse_winget_list(result.stdout)
+    truncated = [(prefix, key) for key, prefix in ((key, truncated_id_prefix(key)) for key in index) if prefix]
+    with installed_index_lock:
+        installed_index = index
+        installed_truncated = truncated
+        installed_index_loaded = True
+    log(f"Индекс установленных программ обновлён: {len(index)} записей")
+    return True
+
+def is_installed(pkg_id):
+    if installed_index_loaded:
+        if pkg_id.lower() in installed_index:
+            return True
+        # winget обрезал длинный ID ("…") - по началу ID нельзя отличить соседние пакеты,
+        # поэтому такой пакет проверяем отдельно через `winget list --id`
+        if not any(pkg_id.lower().startswith(prefix) for prefix, _ in installed_truncated):
+            return False
+
+    # Индекс недоступен - проверяем пакет отдельно (через кэш)
+    cached = cache_get(pkg_id, "installed")
+    if cached is not None:
+        return cached["installed"]
+
+    try:
+        installed = trace.traced_run(
+            ["winget", "list", "--id", pkg_id, "-e"], "winget list --id", pkg_id,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            timeout=get_timeout("winget list --id", pkg_id)
+        ).returncode == 0
+        cache_set(pkg_id, "installed", {"installed": installed}, CACHE_TTL_INSTALLED)
+        return installed
+    except subprocess.TimeoutExpired:
+        log(f"Таймаут проверки установки {pkg_id}")
+        return False
+    except FileNotFoundError:
+        log("winget не найден")
+        return False
+    except Exception as e:
+        log(f"Ошибка проверки установки {pkg_id}: {e}")
+        return False
+
+def uninstall_package(pkg_id):
+    try:
+        result = trace.traced_run(
+            ["winget", "uninstall", "--id", pkg_id, "-e", "--silent"], "winget uninstall", pkg_id,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            timeout=get_timeout("winget uninstall", pkg_id)
+        )
+        if result.returncode == 0:
+            cache_invalidate(pkg_id)
+            with installed_index_lock:
+                installed_index.pop(pkg_id.lower(), None)
+        return result.returncode == 0
+    except subprocess.TimeoutExpired:
+        log(f"Таймаут удаления {pkg_id}")
+        return False
+    except FileNotFoundError:
+        log("winget не найден")
+        return False
+    except Exception as e:
+        log(f"Ошибка удаления {pkg_id}: {e}")
+        return False
+
+def get_installed_packages():
+    """Возвращает индекс установленных программ (id -> версия)"""
+    if not installed_index_loaded:
+        refresh_installed_index()
+    return installed_index
+
+# winget не умеет запускать несколько установщиков одновременно (MSI mutex),
+# поэтому шаг установки сериализуется, а проверки идут параллельно
+install_lock = threading.Lock()
+
+# Объём хранимого вывода winget (таймаут установки - get_timeout)
+WINGET_OUTPUT_TAIL_LINES = 200       # для сообщения об ошибке хватает хвоста
+WINGET_OUTPUT_MAX_LINE = 1000        # прогресс-бары winget бывают очень длинными
+
+# Отмена установки: флаг для очереди и запущенные процессы winget
+cancel_event = threading.Event()
+active_processes = set()
+active_processes_lock = threading.Lock()
+
+# Фазы winget по строкам вывода (английская и русская локализации)
+WINGET_PHASE_PATTERNS = [
+    ("download", re.compile(r"^(Downloading|Скачивание)\b", re.IGNORECASE)),
+    ("verify", re.compile(r"(verified installer hash|хэш установщика)", re.IGNORECASE)),
+    ("install", re.compile(r"^(Starting package install|Запуск установки)", re.IGNORECASE)),
+    ("done", re.compile(r"^(Successfully installed|Установлено)", re.IGNORECASE)),
+]
+WINGET_PERCENT_RE = re.compile(r"(\d{1,3})\s*%")
+# Размеры в прогресс-баре: "0 B / 58.6 MB", "12,5 МБ / 50 МБ"
+WINGET_SIZE_RE = re.compile(r"([\d.,]+)\s*([KMG]?B|[КМГ]?Б)\s*/\s*([\d.,]+)\s*([KMG]?B|[КМГ]?Б)", re.IGNORECASE)
+SIZE_UNITS = {"b": 1, "kb": 1024, "mb": 1024 ** 2, "gb": 1024 ** 3,
+              "б": 1, "кб": 1024, "мб": 1024 ** 2, "гб": 1024 ** 3}
+
+def parse_winget_progress(line):
+    """Строка вывода winget -> (фаза, процент) или None.
+    Процент есть только у строк прогресс-бара загрузки"""
+    line = line.strip()
+    if not line:
+        return None
+
+    for phase, pattern in WINGET_PHASE_PATTERNS:
+        if pattern.search(line):
+            return phase, 100 if phase == "done" else None
+
+    match = WINGET_SIZE_RE.search(line)
+    if match:
+        done = float(match.group(1).replace(",", ".")) * SIZE_UNITS[match.group(2).lower()]
+        total = float(match.group(3).replace(",", ".")) * SIZE_UNITS[match.group(4).lower()]
+        if total > 0:
+            return "download", min(100, int(done * 100 / total))
+
+    match = WINGET_PERCENT_RE.search(line)
+    if match:
+        return "download", min(100, int(match.group(1)))
+    return None
+
+def iter_process_lines(stream):
+    """Строки вывода процесса по мере появления. winget перерисовывает прогресс
+    через \\r, поэтому строкой считается и кусок до \\r"""
+    pending = b""
+    while True:
+        chunk = stream.read1(4096)
+        if not chunk:
+            break
+        pending += chunk
+        # \r\n может прийти двумя кусками - последний \r ждёт следующего куска
+        carry = b""
+        if pending.endswith(b"\r"):
+            pending, carry = pending[:-1], b"\r"
+        *lines, pending = pending.replace(b"\r\n", b"\n").replace(b"\r", b"\n").split(b"\n")
+        pending += carry
+        # Без переводов строки буфер не растёт бесконечно
+        if len(pending) > WINGET_OUTPUT_MAX_LINE:
+            pending = pending[-WINGET_OUTPUT_MAX_LINE:]
+        for line in lines:
+            yield line[:WINGET_OUTPUT_MAX_LINE].decode("utf-8", errors="replace")
+    pending = pending.rstrip(b"\r")
+    if pending:
+        yield pending.decode("utf-8", errors="replace")
+
+def kill_process_tree(process):
+    """Завершает процесс вместе с дочерними (сам установщик запускается потомком winget)"""
+    if process.poll() is not None:
+        return
+    try:
+        if os.name == "nt":
+            subprocess.run(["taskkill", "/PID", str(process.pid), "/T", "/F"],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=30)
+        else:
+            os.killpg(process.pid, 9)
+    except Exception as e:
+        log(f"Ошибка завершения процесса {process.pid}: {e}")
+        process.kill()
+
+def cancel_installs():
+    """Отмена: пакеты из очереди не запускаются, текущие установщики завершаются"""
+    cancel_event.set()
+    with active_processes_lock:
+        processes = list(active_processes)
+    for process in processes:
+        kill_process_tree(process)
+    log(f"Установка отменена пользователем (прервано процессов: {len(processes)})")
+
+def stream_winget_install(pkg_id, on_progress=None, timeout=None):
+    """winget install с чтением вывода на лету.
+    on_progress(фаза, процент) вызывается при смене фазы или процента.
+    Возвращает CompletedProcess с хвостом вывода в stdout/stderr"""
+    if timeout is None:
+        timeout = get_timeout("winget install", pkg_id)
+    return stream_process([
+        "winget", "install",
+        "--id", pkg_id, "-e",
+        "--silent",
+        "--accept-source-agreements",
+        "--accept-package-agreements"
+    ], "winget install", pkg_id, on_progress, timeout)
+
+def stream_process(args, phase, pkg_id, on_progress, timeout, on_line=None):
+    """Процесс установки с чтением вывода на лету, отменой и таймаутом.
+    on_line(строка) получает каждую строку вывода до разбора прогресса"""
+    popen_kwargs = {}
+    if os.name == "nt":
+        popen_kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        popen_kwargs["start_new_session"] = True
+
+    with trace.span(phase, pkg_id) as record:
+        process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, **popen_kwargs)
+        with active_processes_lock:
+            active_processes.add(process)
+
+        # Таймаут проверяется отдельным таймером: чтение вывода блокирующее
+        timed_out = threading.Event()
+        def on_timeout():
+            timed_out.set()
+            kill_process_tree(process)
+        timer = threading.Timer(timeout, on_timeout)
+        timer.daemon = True
+        timer.start()
+
+        tail = deque(maxlen=WINGET_OUTPUT_TAIL_LINES)
+        last_progress = None
+        try:
+            for line in iter_process_lines(process.stdout):
+                if on_line:
+                    on_line(line)
+                progress = parse_winget_progress(line)
+                if progress is None:
+                    if line.strip():
+                        tail.append(line)
+                    continue
+                if progress != last_progress:
+                    last_progress = progress
+                    if on_progress:
+                        on_progress(*progress)
+            returncode = process.wait()
+            # Процесс, завершённый отменой, не попадает в историю длительностей
+            record["cancelled"] = cancel_event.is_set() and not timed_out.is_set()
+        finally:
+            timer.cancel()
+            process.stdout.close()
+            with active_processes_lock:
+                active_processes.discard(process)
+
+        record["returncode"] = returncode
+        if timed_out.is_set():
+            raise subprocess.TimeoutExpired(args, timeout)
+
+    output = "\n".join(tail)
+    return subprocess.CompletedProcess(args, returncode, stdout=output, stderr=output)
+
+def run_winget_install(pkg_id, on_progress=None, installer=None):
+    """Запуск winget install или установщика из кэша предзагрузки
+    (только один установщик одновременно).
+    None - установку отменили, пока пакет ждал очереди"""
+    # Ожидание очереди видно в трассировке отдельной фазой
+    with trace.span("install queue", pkg_id):
+        install_lock.acquire()
+    try:
+        if cancel_event.is_set():
+            return None
+        if installer is not None:
+            return stream_process(installer["command"], "cached install", pkg_id, on_progress,
+                                  get_timeout("cached install", pkg_id))
+        return stream_winget_install(pkg_id, on_progress)
+    finally:
+        install_lock.release()
+
+# ===================== ЖУРНАЛ =====================
+
+# Журнал установки: по строке JSON на событие, каждая запись сбрасывается на диск (fsync).
+# Если последней записи "finished" нет - установка прервалась и её можно продолжить
+JOURNAL_FILE = "install_journal.jsonl"
+RESUME_RUNONCE_KEY = r"Software\Microsoft\Windows\CurrentVersion\RunOnce"
+RESUME_RUNONCE_VALUE = "PostInstallResume"
+
+journal_lock = threading.Lock()
+
+def journal_write(event, pkg_id=None, **fields):
+    """Дописывает событие в журнал и дожидается записи на диск"""
+    record = {"time": time.time(), "event": event, "pkg_id": pkg_id, **fields}
+    line = json.dumps(record, ensure_ascii=False) + "\n"
+    try:
+        with journal_lock:
+            with open(JOURNAL_FILE, "a+b") as f:
+                # После сбоя последняя строка могла оборваться - запись начинается с новой строки,
+                # иначе она склеится с обрывком и потеряется (в том числе "finished")
+                if f.seek(0, os.SEEK_END) > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        line = "\n" + line
+                f.write(line.encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+    except OSError as e:
+        log(f"Ошибка записи журнала установки: {e}")
+
+def journal_begin(packages):
+    """Новый журнал: план установки и флаги, накопленные до него (при продолжении)"""
+    try:
+        with journal_lock:
+            if os.path.exists(JOURNAL_FILE):
+                os.remove(JOURNAL_FILE)
+    except OSError as e:
+        log(f"Ошибка очистки журнала установки: {e}")
+    journal_write(
+        "planned",
+        packages=[package_to_dict(pkg) for pkg in packages],
+        needs_reboot=needs_reboot,
+        valorant_installed=valorant_installed
+    )
+
+def journal_finish():
+    """Отметка о завершении: продолжать больше нечего"""
+    journal_write("finished")
+    unregister_resume_after_reboot()
+
+def load_unfinished_journal():
+    """Незавершённая установка из журнала или None.
+    Возвращает словарь: packages (весь план), remaining (что осталось),
+    results (подтверждённые журналом итоги), needs_reboot, valorant_installed"""
+    try:
+        with open(JOURNAL_FILE, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        log(f"Ошибка чтения журнала установки: {e}")
+        return None
+
+    plan = None
+    results = {}
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            # Последняя строка могла оборваться при сбое
+            continue
+        event = record.get("event")
+        if event == "planned":
+            plan = record
+            results = {}
+        elif event == "finished":
+            plan = None
+        elif plan is not None and event in ("succeeded", "failed"):
+            results[record["pkg_id"]] = (record.get("status"), record.get("message", ""))
+
+    if plan is None:
+        return None
+
+    # План записан самим установщиком (в нём бывают ID вне каталога), повторная валидация не нужна
+    try:
+        packages = [make_package(data) for data in plan.get("packages") or []]
+    except (KeyError, TypeError) as e:
+        log(f"Повреждённый план в журнале установки: {e}")
+        return None
+    if not packages:
+        return None
+
+    # Установленные и отсутствующие в winget пакеты повторно не проверяются
+    confirmed = {pkg_id: result for pkg_id, result in results.items()
+                 if result[0] in (STATUS_INSTALLED, STATUS_ALREADY_INSTALLED, STATUS_NOT_FOUND)}
+    return {
+        "packages": packages,
+        "remaining": [pkg for pkg in packages if pkg.id not in confirmed],
+        "results": confirmed,
+        "needs_reboot": bool(plan.get("needs_reboot")) or any(
+            pkg.reboot for pkg in packages if confirmed.get(pkg.id, (None,))[0] == STATUS_INSTALLED),
+        "valorant_installed": bool(plan.get("valorant_installed")) or any(
+            pkg.special == "valorant" for pkg in packages if confirmed.get(pkg.id, (None,))[0] == STATUS_INSTALLED),
+    }
+
+def resume_command():
+    """Команда для RunOnce: обычный запуск GUI (рабочая папка - папка установщика).
+    Без аргументов: сборка --windowed не показывает консоль, а GUI сам находит
+    незавершённый журнал и спрашивает пользователя, продолжать ли установку"""
+    if getattr(sys, "frozen", False):
+        app_dir = os.path.dirname(sys.executable)
+        command = f'"{sys.executable}"'
+    else:
+        app_dir = os.path.dirname(os.path.abspath(__file__))
+        command = f'"{sys.executable}" "{os.path.join(app_dir, "software_installer.py")}"'
+    return f'cmd /c cd /d "{app_dir}" && {command}'
+
+def register_resume_after_reboot():
+    """Одноразовый запуск продолжения установки после перезагрузки (RunOnce)"""
+    try:
+        import winreg
+        with winreg.CreateKey(winreg.HKEY_CURRENT_USER, RESUME_RUNONCE_KEY) as key:
+            winreg.SetValueEx(key, RESUME_RUNONCE_VALUE, 0, winreg.REG_SZ, resume_command())
+        log("Продолжение установки после перезагрузки зарегистрировано")
+        return True
+    except ImportError:
+        return False
+    except OSError as e:
+        log(f"Ошибка регистрации продолжения после перезагрузки: {e}")
+        return False
+
+def unregister_resume_after_reboot():
+    """Убирает запись RunOnce, если установка завершилась без перезагрузки"""
+    try:
+        import winreg
+        with winreg.OpenKey(winreg.HKEY_CURRENT_USER, RESUME_RUNONCE_KEY, 0, winreg.KEY_SET_VALUE) as key:
+            winreg.DeleteValue(key, RESUME_RUNONCE_VALUE)
+    except (ImportError, OSError):
+        pass
+
+# ===================== ПРЕДЗАГРУЗКА =====================
+
+# Кэш установщиков: <папка>/<id>/<версия>/ с установщиком, манифестом winget и entry.json.
+# Папку можно вынести на общий диск, чтобы ставить программы на много машин без сети
+PREFETCH_ENABLED = os.environ.get("INSTALLER_PREFETCH", "1") != "0"
+PREFETCH_DIR = os.environ.get("INSTALLER_CACHE_DIR", "installer_cache")
+PREFETCH_MAX_BYTES = int(os.environ.get("INSTALLER_CACHE_MAX_MB", "10240")) * 1024 * 1024
+PREFETCH_WORKERS = 3        # загрузки профиля целиком
+PREFETCH_SPECULATIVE = 1    # фоновые загрузки отмеченных программ - по одной
+
+prefetch_pool = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+speculative_pool = ThreadPoolExecutor(max_workers=PREFETCH_SPECULATIVE, thread_name_prefix="prefetch-bg")
+prefetch_futures = {}
+prefetch_lock = threading.Lock()
+# Вытеснение и чтение entry.json не должны пересекаться
+prefetch_cache_lock = threading.Lock()
+
+# Тихая установка по типу установщика (если в манифесте нет InstallerSwitches.Silent).
+# У произвольного "exe" ключей тихой установки нет - такие пакеты ставит winget
+SILENT_SWITCHES = {
+    "inno": ["/VERYSILENT", "/SUPPRESSMSGBOXES", "/NORESTART", "/SP-"],
+    "nullsoft": ["/S"],
+    "burn": ["/quiet", "/norestart"],
+}
+
+def safe_path_part(text):
+    """Имя папки из ID или версии"""
+    return re.sub(r"[^\w.+-]", "_", text)
+
+def parse_installer_manifest(text):
+    """Нужные поля из YAML-манифеста winget download (без зависимостей от PyYAML)"""
+    fields = {}
+    patterns = {
+        "version": r"^PackageVersion:\s*(.+)$",
+        "installer_type": r"^\s*-?\s*InstallerType:\s*(.+)$",
+        "sha256": r"^\s*-?\s*InstallerSha256:\s*([0-9A-Fa-f]{64})\s*$",
+        "silent": r"^\s*Silent:\s*(.+)$",
+    }
+    for key, pattern in patterns.items():
+        match = re.search(pattern, text, re.MULTILINE)
+        if match:
+            fields[key] = match.group(1).strip().strip("'\"")
+    return fields
+
+def file_sha256(path):
+    """SHA-256 файла потоково (установщики бывают на гигабайты)"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def installer_command(path, installer_type, silent=None):
+    """Команда тихой установки файла из кэша или None (тип не поддерживается - ставит winget)"""
+    installer_type = (installer_type or "").lower()
+    if installer_type in ("msi", "wix"):
+        return ["msiexec", "/i", path, "/qn", "/norestart"]
+    if installer_type in ("msix", "appx"):
+        return ["powershell", "-NoProfile", "-Command", f"Add-AppxPackage -Path '{path}'"]
+    if silent:
+        return [path] + silent.split()
+    if installer_type in SILENT_SWITCHES:
+        return [path] + SILENT_SWITCHES[installer_type]
+    return None
+
+def read_cache_entries():
+    """Все записи кэша установщиков (entry.json)"""
+    entries = []
+    if not os.path.isdir(PREFETCH_DIR):
+        return entries
+    for pkg_dir in os.listdir(PREFETCH_DIR):
+        pkg_path = os.path.join(PREFETCH_DIR, pkg_dir)
+        if not os.path.isdir(pkg_path):
+            continue
+        for version in os.listdir(pkg_path):
+            entry_file = os.path.join(pkg_path, version, "entry.json")
+            try:
+                with open(entry_file, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+                entry["dir"] = os.path.join(pkg_path, version)
+                entries.append(entry)
+            except (OSError, ValueError):
+                continue
+    return entries
+
+def write_cache_entry(entry_dir, entry):
+    """Атомарно записывает entry.json (под prefetch_cache_lock, если запись уже в кэше)"""
+    tmp_file = os.path.join(entry_dir, "entry.json.tmp")
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump({key: value for key, value in entry.items() if key != "dir"}, f, ensure_ascii=False)
+    os.replace(tmp_file, os.path.join(entry_dir, "entry.json"))
+
+def remove_cache_entry(entry_dir):
+    """Удаляет версию из кэша и папку пакета, если версий не осталось (под prefetch_cache_lock)"""
+    shutil.rmtree(entry_dir, ignore_errors=True)
+    try:
+        os.rmdir(os.path.dirname(entry_dir))
+    except OSError:
+        pass
+
+def evict_installer_cache():
+    """LRU-вытеснение: удаляет давно не использованные версии сверх PREFETCH_MAX_BYTES"""
+    with prefetch_cache_lock:
+        entries = sorted(read_cache_entries(), key=lambda e: e.get("last_used", 0))
+        total = sum(entry.get("size", 0) for entry in entries)
+        for entry in entries:
+            if total <= PREFETCH_MAX_BYTES:
+                break
+            remove_cache_entry(entry["dir"])
+            total -= entry.get("size", 0)
+            log(f"Кэш установщиков: удалён {entry['id']} {entry['version']}")
+
+def get_cached_installer(pkg_id):
+    """Проверенный установщик из кэша или None.
+    Версия - из кэша winget show, если известна, иначе самая свежая загруженная"""
+    wait_for_prefetch(pkg_id)
+
+    cached = cache_get(pkg_id, "exists")
+    version = cached.get("version") if cached else None
+
+    def find_entries():
+        with prefetch_cache_lock:
+            entries = [entry for entry in read_cache_entries() if entry["id"].lower() == pkg_id.lower()]
+        if version:
+            entries = [entry for entry in entries if entry["version"] == version]
+        return entries
+
+    entries = find_entries()
+    # Нет в локальном кэше - пробуем зеркало в локальной сети
+    if not entries and fetch_installer_from_mirror(pkg_id, version):
+        entries = find_entries()
+    if not entries:
+        return None
+    entry = max(entries, key=lambda e: e.get("downloaded_at", 0))
+
+    path = os.path.join(entry["dir"], entry["installer"])
+    try:
+        with trace.span("installer hash", pkg_id):
+            actual = file_sha256(path)
+    except OSError:
+        return None
+    if actual.lower() != entry["sha256"].lower():
+        log(f"Хэш установщика {pkg_id} {entry['version']} не совпал - запись удалена", pkg_id=pkg_id)
+        with prefetch_cache_lock:
+            remove_cache_entry(entry["dir"])
+        return None
+
+    command = installer_command(path, entry.get("installer_type"), entry.get("silent"))
+    if command is None:
+        return None
+
+    # Отметка для LRU - под той же блокировкой, что вытеснение и запись загрузок
+    entry["last_used"] = time.time()
+    with prefetch_cache_lock:
+        if not os.path.isfile(path):
+            # Запись вытеснили после проверки хэша - ставит winget
+            return None
+        try:
+            write_cache_entry(entry["dir"], entry)
+        except OSError as e:
+            log(f"Ошибка записи entry.json для {pkg_id}: {e}", pkg_id=pkg_id)
+    return {**entry, "path": path, "command": command}
+
+def download_installer(pkg_id):
+    """winget download во временную папку кэша, затем перенос в <id>/<версия>/.
+    Возвращает запись кэша или None"""
+    os.makedirs(PREFETCH_DIR, exist_ok=True)
+    temp_dir = tempfile.mkdtemp(prefix=".download-", dir=PREFETCH_DIR)
+    try:
+        # Как и установка, загрузка прерывается отменой или выходом из приложения
+        result = stream_process([
+            "winget", "download",
+            "--id", pkg_id, "-e",
+            "--download-directory", temp_dir,
+            "--accept-source-agreements",
+            "--accept-package-agreements"
+        ], "winget download", pkg_id, None, get_timeout("winget download", pkg_id))
+        if result.returncode != 0:
+            log(f"winget download {pkg_id} завершился с кодом {result.returncode}", pkg_id=pkg_id)
+            return None
+
+        files = os.listdir(temp_dir)
+        manifests = [name for name in files if name.endswith(".yaml")]
+        installers = [name for name in files if not name.endswith(".yaml")]
+        if not manifests or len(installers) != 1:
+            log(f"winget download {pkg_id}: не найден установщик или манифест", pkg_id=pkg_id)
+            return None
+
+        with open(os.path.join(temp_dir, manifests[0]), "r", encoding="utf-8", errors="replace") as f:
+            manifest = parse_installer_manifest(f.read())
+        if not manifest.get("version") or not manifest.get("sha256"):
+            log(f"winget download {pkg_id}: в манифесте нет версии или хэша", pkg_id=pkg_id)
+            return None
+
+        installer_path = os.path.join(temp_dir, installers[0])
+        if file_sha256(installer_path).lower() != manifest["sha256"].lower():
+            log(f"winget download {pkg_id}: хэш установщика не совпал с манифестом", pkg_id=pkg_id)
+            return None
+
+        now = time.time()
+        entry = {
+            "id": pkg_id,
+            "version": manifest["version"],
+            "installer": installers[0],
+            "installer_type": manifest.get("installer_type"),
+            "silent": manifest.get("silent"),
+            "sha256": manifest["sha256"],
+            "size": os.path.getsize(installer_path),
+            "downloaded_at": now,
+            "last_used": now,
+        }
+        write_cache_entry(temp_dir, entry)
+
+        target = os.path.join(PREFETCH_DIR, safe_path_part(pkg_id), safe_path_part(manifest["version"]))
+        with prefetch_cache_lock:
+            shutil.rmtree(target, ignore_errors=True)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(temp_dir, target)
+        log(f"Установщик {pkg_id} {manifest['version']} загружен в кэш ({entry['size'] // 1024} КБ)", pkg_id=pkg_id)
+        evict_installer_cache()
+        return entry
+    except subprocess.TimeoutExpired:
+        log(f"Таймаут загрузки установщика {pkg_id}", pkg_id=pkg_id)
+        return None
+    except FileNotFoundError:
+        log("winget не найден")
+        return None
+    except Exception as e:
+        log(f"Ошибка загрузки установщика {pkg_id}: {e}", pkg_id=pkg_id)
+        return None
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def prefetch_task(pkg, skip_installed):
+    """Загрузка одного пакета в кэш"""
+    if skip_installed and is_installed(pkg.id):
+        return None
+    return download_installer(pkg.id)
+
+def prefetch_packages(packages, speculative=True, skip_installed=True):
+    """Предзагрузка установщиков в фоне. speculative - отмеченные программы, по одной,
+    чтобы не занимать канал; False - профиль целиком, на полной скорости.
+    skip_installed=False - загрузить и уже установленные (наполнение общего кэша)"""
+    if not PREFETCH_ENABLED:
+        return []
+    futures = []
+    with prefetch_lock:
+        for pkg in packages:
+            key = pkg.id.lower()
+            future = prefetch_futures.get(key)
+            if future is None or future.done():
+                pool = speculative_pool if speculative else prefetch_pool
+                future = pool.submit(prefetch_task, pkg, skip_installed)
+                prefetch_futures[key] = future
+            futures.append(future)
+    return futures
+
+def shutdown_prefetch():
+    """При выходе: очередь загрузок отменяется, текущие winget download завершаются"""
+    with prefetch_lock:
+        for future in prefetch_futures.values():
+            future.cancel()
+    with active_processes_lock:
+        processes = [process for process in active_processes if process.args[1:2] == ["download"]]
+    for process in processes:
+        kill_process_tree(process)
+
+def wait_for_prefetch(pkg_id):
+    """Если установщик сейчас загружается - дожидаемся, а не качаем второй раз.
+    Ещё не начатая загрузка отменяется: пакет поставит winget install"""
+    with prefetch_lock:
+        future = prefetch_futures.get(pkg_id.lower())
+    if future is not None and not future.cancel() and not future.done():
+        with trace.span("prefetch wait", pkg_id):
+            try:
+                future.result()
+            except Exception:
+                pass
+
+# ===================== УСТАНОВКА =====================
+
+# Итоговые статусы установки пакета
+STATUS_INSTALLED = "installed"
+STATUS_ALREADY_INSTALLED = "already_installed"
+STATUS_NOT_FOUND = "not_found"
+STATUS_FAILED = "failed"
+STATUS_TIMEOUT = "timeout"
+STATUS_CANCELLED = "cancelled"
+STATUS_SKIPPED = "skipped"
+
+# Коды успешной установки: 3010/1641 - успех, но нужна перезагрузка (MSI)
+INSTALL_SUCCESS_CODES = (0, 3010, 1641)
+INSTALL_REBOOT_CODES = (3010, 1641)
+
+# Этапы установки: сначала обычные пакеты, затем требующие перезагрузки
+# (одна перезагрузка в конце), затем барьеры - по одному, без параллельных задач
+STAGE_REGULAR = 0
+STAGE_REBOOT = 1
+STAGE_BARRIER = 2
+
+# Названия фаз winget для строки статуса
+PHASE_NAMES = {
+    "download": "загрузка",
+    "verify": "проверка хэша",
+    "install": "установка",
+    "done": "готово",
+}
+
+def package_progress_callback(pkg, report, on_package_progress):
+    """on_progress(фаза, процент) для вывода winget одного пакета: строка статуса и доля пакета"""
+    def on_progress(phase, percent):
+        text = f"Установка: {pkg.name} — {PHASE_NAMES.get(phase, phase)}"
+        report(f"{text} {percent}%" if percent is not None else text)
+        if on_package_progress:
+            # Загрузка - первые 80% пакета, запуск установщика - остальное
+            if phase == "download" and percent is not None:
+                on_package_progress(pkg.id, percent * 0.8)
+            elif phase in ("verify", "install"):
+                on_package_progress(pkg.id, 80)
+    return on_progress
+
+def install_package(pkg, on_status=None, on_package_progress=None):
+    """Конвейер установки одного пакета: проверки параллельно, установка по очереди.
+    on_package_progress(pkg_id, процент) - прогресс загрузки/установки пакета.
+    Возвращает (статус, сообщение)"""
+    global valorant_installed, needs_reboot
+
+    def report(text):
+        if on_status:
+            on_status(text)
+
+    def cancelled():
+        message = f"Отменено: {pkg.name}"
+        report(message)
+        return STATUS_CANCELLED, message
+
+    if cancel_event.is_set():
+        return cancelled()
+
+    report(f"Проверка: {pkg.name}")
+
+    if is_installed(pkg.id):
+        message = f"Уже установлено: {pkg.name}"
+        report(message)
+        return STATUS_ALREADY_INSTALLED, message
+
+    # Установщик из кэша предзагрузки не требует сети (и проверки через winget show)
+    installer = get_cached_installer(pkg.id)
+    if installer is None and not winget_exists(pkg.id):
+        message = f"Пакет не найден: {pkg.name}"
+        report(message)
+        return STATUS_NOT_FOUND, message
+
+    on_progress = package_progress_callback(pkg, report, on_package_progress)
+
+    report(f"Установка: {pkg.name}" + (" (из кэша)" if installer else ""))
+    journal_write("started", pkg.id)
+
+    try:
+        result = run_winget_install(pkg.id, on_progress, installer)
+        if result is None:
+            return cancelled()
+
+        if result.returncode in INSTALL_SUCCESS_CODES:
+            cache_invalidate(pkg.id)
+            if pkg.special == "valorant":
+                valorant_installed = True
+            if pkg.reboot or result.returncode in INSTALL_REBOOT_CODES:
+                needs_reboot = True
+            message = f"Успешно установлено: {pkg.name}"
+            report(message)
+            return STATUS_INSTALLED, message
+
+        if cancel_event.is_set():
+            return cancelled()
+
+        # В сообщение - последние строки вывода, остальное в логе
+        details = "\n".join(result.stderr.splitlines()[-5:])
+        log(f"Вывод {result.args[0]} {pkg.id} (код {result.returncode}):\n{result.stderr}", pkg_id=pkg.id)
+        message = f"Ошибка установки {pkg.name}: {details}"
+        report(message)
+        return STATUS_FAILED, message
+
+    except subprocess.TimeoutExpired:
+        message = f"Таймаут установки {pkg.name}"
+        report(message)
+        return STATUS_TIMEOUT, message
+    except Exception as e:
+        message = f"Ошибка установки {pkg.name}: {str(e)}"
+        report(message)
+        return STATUS_FAILED, message
+
+def build_install_schedule(packages):
+    """План установки: id -> (этап, ID зависимостей внутри списка).
+    Пакет попадает не раньше этапа своих зависимостей"""
+    by_id = {pkg.id.lower(): pkg for pkg in packages}
+    unordered = find_dependency_cycles(packages)
+    if unordered:
+        log(f"Циклические зависимости игнорируются: {', '.join(sorted(unordered))}")
+
+    schedule = {}
+    def visit(pkg_id):
+        if pkg_id not in schedule:
+            pkg = by_id[pkg_id]
+            deps = [] if pkg_id in unordered else [dep for dep in package_dependencies(pkg) if dep in by_id]
+            stage = STAGE_BARRIER if is_barrier(pkg) else STAGE_REBOOT if pkg.reboot else STAGE_REGULAR
+            for dep in deps:
+                stage = max(stage, visit(dep)[0])
+            schedule[pkg_id] = (stage, deps)
+        return schedule[pkg_id]
+
+    for pkg_id in by_id:
+        visit(pkg_id)
+    return schedule
+
+def install_packages(selected_packages, on_status=None, on_progress=None, workers=None,
+                     resume_after_reboot=False):
+    """Установка списка пакетов на пуле потоков.
+    Прогресс учитывает загрузку текущего пакета, а не только завершённые.
+    Ход установки пишется в журнал; resume_after_reboot - продолжить её после перезагрузки.
+    Возвращает словарь id -> (статус, сообщение)"""
+    results = {}
+    total = len(selected_packages)
+    if not total:
+        return results
+
+    cancel_event.clear()
+    journal_begin(selected_packages)
+    if resume_after_reboot:
+        register_resume_after_reboot()
+    done = 0
+    started = time.perf_counter()
+    if on_progress:
+        on_progress(0)
+
+    # Доля выполнения незавершённых пакетов (0-100)
+    package_progress = {}
+    progress_lock = threading.Lock()
+
+    def report_progress():
+        if on_progress:
+            with progress_lock:
+                partial = sum(package_progress.values()) / 100
+            on_progress((done + partial) * 100 / total)
+
+    def on_package_progress(pkg_id, percent):
+        with progress_lock:
+            package_progress[pkg_id] = percent
+        report_progress()
+
+    # Один вызов winget list вместо проверки каждого пакета
+    get_installed_packages()
+
+    def finish(pkg, result):
+        nonlocal done
+        results[pkg.id] = result
+        status, message = result
+        journal_write("succeeded" if status in (STATUS_INSTALLED, STATUS_ALREADY_INSTALLED) else "failed",
+                      pkg.id, status=status, message=message)
+        with progress_lock:
+            package_progress.pop(pkg.id, None)
+        done += 1
+        report_progress()
+
+    # Пакет запускается, когда готовы его зависимости и закончились предыдущие этапы.
+    # Независимые ветки идут параллельно (проверки), установщики - по очереди
+    schedule = build_install_schedule(selected_packages)
+    finished_ids = {}
+    pending = list(selected_packages)
+    running = {}
+    workers = min(workers or INSTALL_WORKERS, total)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while pending or running:
+            current_stage = min(schedule[pkg.id.lower()][0] for pkg in pending + list(running.values()))
+            for pkg in list(pending):
+                stage, deps = schedule[pkg.id.lower()]
+                if stage > current_stage or any(dep not in finished_ids for dep in deps):
+                    continue
+                # Барьер ставится в одиночку
+                if any(is_barrier(other) for other in running.values()) or (is_barrier(pkg) and running):
+                    break
+                pending.remove(pkg)
+                failed_deps = [dep for dep in deps
+                               if finished_ids[dep] not in (STATUS_INSTALLED, STATUS_ALREADY_INSTALLED)]
+                if failed_deps:
+                    message = f"Пропущено {pkg.name}: не установлены зависимости {', '.join(failed_deps)}"
+                    if on_status:
+                        on_status(message)
+                    finish(pkg, (STATUS_SKIPPED, message))
+                    finished_ids[pkg.id.lower()] = STATUS_SKIPPED
+                    continue
+                running[pool.submit(install_package, pkg, on_status, on_package_progress)] = pkg
+
+            if not running:
+                # Все готовые пакеты пропущены - пересчитываем этап и зависимости
+                continue
+
+            completed, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in completed:
+                pkg = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    log(f"Ошибка в задаче установки: {e}")
+                    result = (STATUS_FAILED, f"Ошибка установки {pkg.name}: {str(e)}")
+                finish(pkg, result)
+                finished_ids[pkg.id.lower()] = result[0]
+
+    finish_install_run(started)
+    return results
+
+def finish_install_run(started):
+    """Завершение установки: журнал, индекс установленных, сводка и файл трассировки"""
+    journal_finish()
+
+    # После пакета установок индекс устарел - перечитываем его
+    refresh_installed_index()
+    log_cache_stats()
+    log("Трассировка установки:\n" + trace.summary_table(since=started))
+    if TRACE_FILE:
+        try:
+            trace.export_trace(TRACE_FILE, since=started)
+        except OSError as e:
+            log(f"Не удалось сохранить трассировку {TRACE_FILE}: {e}")
+
+def resume_install(journal, on_status=None, on_progress=None, workers=None, resume_after_reboot=False,
+                   bulk=False):
+    """Продолжение прерванной установки: только оставшиеся пакеты.
+    Итоги, подтверждённые журналом, возвращаются без повторных проверок.
+    bulk - оставшиеся пакеты ставятся одним winget import"""
+    global needs_reboot, valorant_installed
+    needs_reboot = needs_reboot or journal["needs_reboot"]
+    valorant_installed = valorant_installed or journal["valorant_installed"]
+    log(f"Продолжение установки: осталось {len(journal['remaining'])} из {len(journal['packages'])}")
+
+    results = dict(journal["results"])
+    if journal["remaining"] and bulk:
+        results.update(install_packages_bulk(journal["remaining"], on_status, on_progress, resume_after_reboot))
+    elif journal["remaining"]:
+        results.update(install_packages(journal["remaining"], on_status, on_progress, workers, resume_after_reboot))
+    else:
+        journal_finish()
+    return results
+
+def select_profile(packages, profile):
+    """Пакеты из группы профиля"""
+    if packages is PACKAGES:
+        return list(group_packages(profile))
+    return [pkg for pkg in packages if pkg.group == profile]
+
+# ===================== ПАКЕТНАЯ УСТАНОВКА =====================
+
+# Источник winget в файле импорта (как в выводе `winget export`)
+WINGET_SOURCE_DETAILS = {
+    "Argument": "https://cdn.winget.microsoft.com/cache",
+    "Identifier": "Microsoft.Winget.Source_8wekyb3d8bbwe",
+    "Name": "winget",
+    "Type": "Microsoft.PreIndexed.Package",
+}
+
+# События в выводе `winget import` (английская и русская локализации)
+WINGET_IMPORT_PATTERNS = [
+    ("found", re.compile(r"^(Found|Найдено)\s.*\[(?P<id>[^\]\s]+)\]", re.IGNORECASE)),
+    ("already_installed", re.compile(r"(already installed|уже установлен)\w*:\s*(?P<id>\S+)", re.IGNORECASE)),
+    ("not_found", re.compile(r"(not found for import|не найден\w* для импорта)\w*:\s*(?P<id>\S+)", re.IGNORECASE)),
+    ("installed", re.compile(r"^(Successfully installed|Установлено)", re.IGNORECASE)),
+    ("failed", re.compile(r"(Installer failed with exit code|Сбой установщика с кодом выхода):\s*(?P<code>-?\d+)", re.IGNORECASE)),
+]
+
+def build_import_manifest(packages):
+    """Файл импорта winget для списка пакетов в порядке установки
+    (зависимости раньше зависящих, пакеты с перезагрузкой и барьеры - в конце)"""
+    schedule = build_install_schedule(packages)
+    by_id = {pkg.id.lower(): pkg for pkg in packages}
+    # План перечисляет зависимости раньше пакетов, сортировка по этапу устойчивая
+    ordered = sorted(schedule, key=lambda pkg_id: schedule[pkg_id][0])
+    return {
+        "$schema": "https://aka.ms/winget-packages.schema.2.0.json",
+        "CreationDate": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "Sources": [{
+            "Packages": [{"PackageIdentifier": by_id[pkg_id].id} for pkg_id in ordered],
+            "SourceDetails": WINGET_SOURCE_DETAILS,
+        }],
+    }
+
+def write_import_manifest(packages, path):
+    """Сохраняет файл импорта winget"""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(build_import_manifest(packages), f, ensure_ascii=False, indent=2)
+
+def parse_winget_import_line(line):
+    """Строка вывода winget import -> (событие, ID пакета или код выхода) или None"""
+    line = line.strip()
+    for event, pattern in WINGET_IMPORT_PATTERNS:
+        match = pattern.search(line)
+        if match:
+            groups = match.groupdict()
+            if "id" in groups:
+                return event, groups["id"]
+            if "code" in groups:
+                return event, int(groups["code"])
+            return event, None
+    return None
+
+def install_packages_bulk(selected_packages, on_status=None, on_progress=None, resume_after_reboot=False):
+    """Установка списка пакетов одним вызовом `winget import` вместо list/show/install на пакет.
+    Итог каждого пакета восстанавливается из вывода winget.
+    Возвращает словарь id -> (статус, сообщение), как install_packages"""
+    results = {}
+    total = len(selected_packages)
+    if not total:
+        return results
+
+    def report(text):
+        if on_status:
+            on_status(text)
+
+    cancel_event.clear()
+    journal_begin(selected_packages)
+    if resume_after_reboot:
+        register_resume_after_reboot()
+    started = time.perf_counter()
+    if on_progress:
+        on_progress(0)
+
+    by_id = {pkg.id.lower(): pkg for pkg in selected_packages}
+    # Пакет, который winget устанавливает сейчас: (пакет, начало, его строки вывода)
+    current = [None, 0.0, deque(maxlen=WINGET_OUTPUT_TAIL_LINES)]
+    current_percent = [0]
+
+    def finish(pkg, status, message, returncode=None):
+        if pkg.id in results:
+            return
+        results[pkg.id] = (status, message)
+        journal_write("succeeded" if status in (STATUS_INSTALLED, STATUS_ALREADY_INSTALLED) else "failed",
+                      pkg.id, status=status, message=message)
+        if current[0] is pkg:
+            # Длительность пакета внутри импорта идёт в историю таймаутов установки
+            trace.record_span("winget install", pkg.id, current[1], returncode)
+            current[0] = None
+            current_percent[0] = 0
+        report(message)
+        report_progress()
+
+    def report_progress():
+        if on_progress:
+            on_progress((len(results) + current_percent[0] / 100) * 100 / total)
+
+    def on_package_progress(pkg_id, percent):
+        current_percent[0] = percent
+        report_progress()
+
+    def on_line(line):
+        global valorant_installed, needs_reboot
+        event = parse_winget_import_line(line)
+        pkg = current[0]
+        if event is None:
+            if pkg is not None and line.strip():
+                current[2].append(line)
+            return
+        kind, value = event
+        if kind == "found":
+            pkg = by_id.get(value.lower())
+            if pkg is not None:
+                current[:] = [pkg, time.perf_counter(), deque(maxlen=WINGET_OUTPUT_TAIL_LINES)]
+                journal_write("started", pkg.id)
+                report(f"Установка: {pkg.name}")
+        elif kind == "already_installed" and value.lower() in by_id:
+            pkg = by_id[value.lower()]
+            finish(pkg, STATUS_ALREADY_INSTALLED, f"Уже установлено: {pkg.name}")
+        elif kind == "not_found" and value.lower() in by_id:
+            pkg = by_id[value.lower()]
+            finish(pkg, STATUS_NOT_FOUND, f"Пакет не найден: {pkg.name}")
+        elif kind == "installed" and pkg is not None:
+            cache_invalidate(pkg.id)
+            if pkg.special == "valorant":
+                valorant_installed = True
+            if pkg.reboot:
+                needs_reboot = True
+            finish(pkg, STATUS_INSTALLED, f"Успешно установлено: {pkg.name}", 0)
+        elif kind == "failed" and pkg is not None:
+            if value in INSTALL_REBOOT_CODES:
+                needs_reboot = True
+            log(f"Вывод winget import {pkg.id} (код {value}):\n" + "\n".join(current[2]), pkg_id=pkg.id)
+            details = "\n".join(list(current[2])[-5:] + [line.strip()])
+            finish(pkg, STATUS_FAILED, f"Ошибка установки {pkg.name}: {details}", value)
+
+    def on_winget_progress(phase, percent):
+        if current[0] is not None:
+            package_progress_callback(current[0], report, on_package_progress)(phase, percent)
+
+    # Без зеркал и кэша предзагрузки: всё ставит winget, таймаут - сумма таймаутов пакетов
+    timeout = sum(get_timeout("winget install", pkg.id) for pkg in selected_packages)
+    manifest_path = None
+    report(f"Установка {total} программ через winget import...")
+    try:
+        with tempfile.NamedTemporaryFile("w", suffix=".json", prefix="winget-import-",
+                                         delete=False, encoding="utf-8") as f:
+            manifest_path = f.name
+            json.dump(build_import_manifest(selected_packages), f, ensure_ascii=False, indent=2)
+
+        with trace.span("install queue"):
+            install_lock.acquire()
+        try:
+            result = stream_process([
+                "winget", "import",
+                "--import-file", manifest_path,
+                "--ignore-unavailable",
+                "--no-upgrade",
+                "--accept-source-agreements",
+                "--accept-package-agreements"
+            ], "winget import", None, on_winget_progress, timeout, on_line)
+        finally:
+            install_lock.release()
+        unresolved = f"нет итога в выводе winget import (код {result.returncode})"
+        unresolved_status = STATUS_FAILED
+    except subprocess.TimeoutExpired:
+        unresolved = "таймаут winget import"
+        unresolved_status = STATUS_TIMEOUT
+    except Exception as e:
+        unresolved = str(e)
+        unresolved_status = STATUS_FAILED
+    finally:
+        if manifest_path:
+            try:
+                os.remove(manifest_path)
+            except OSError:
+                pass
+
+    # Пакеты без итога: winget прервали или его вывод не распознан
+    for pkg in selected_packages:
+        if pkg.id in results:
+            continue
+        if cancel_event.is_set():
+            finish(pkg, STATUS_CANCELLED, f"Отменено: {pkg.name}")
+        elif unresolved_status == STATUS_TIMEOUT and current[0] is pkg:
+            finish(pkg, STATUS_TIMEOUT, f"Таймаут установки {pkg.name}")
+        else:
+            finish(pkg, unresolved_status, f"Ошибка установки {pkg.name}: {unresolved}")
+
+    finish_install_run(started)
+    return results
+
+# ===================== DNS =====================
+
+def is_windows_11():
+    return platform.release() == "10" and int(platform.version().split(".")[2]) >= 22000
+
+# Сетевой адаптер из Get-NetAdapter/Get-NetIPConfiguration (не зависит от языка Windows)
+NetAdapter = namedtuple(
+    "NetAdapter",
+    ["name", "description", "index", "status", "virtual", "ipv4", "gateways", "dns_servers", "guid"],
+    defaults=("",)
+)
+
+# Один запрос PowerShell вместо разбора текста ipconfig/netsh
+NET_ADAPTERS_SCRIPT = (
+    "[Console]::OutputEncoding = [Text.Encoding]::UTF8; "
+    "$config = @{}; Get-NetIPConfiguration -ErrorAction SilentlyContinue | "
+    "ForEach-Object { $config[$_.InterfaceIndex] = $_ }; "
+    "$adapters = @(Get-NetAdapter -ErrorAction SilentlyContinue | ForEach-Object { "
+    "$c = $config[$_.ifIndex]; [pscustomobject]@{ "
+    "Name = $_.Name; InterfaceDescription = $_.InterfaceDescription; ifIndex = $_.ifIndex; "
+    "Status = [string]$_.Status; Virtual = [bool]$_.Virtual; InterfaceGuid = $_.InterfaceGuid; "
+    "IPv4 = @($c.IPv4Address.IPAddress); Gateways = @($c.IPv4DefaultGateway.NextHop); "
+    "DnsServers = @(($c.DNSServer | Where-Object AddressFamily -eq 2).ServerAddresses) } }); "
+    "ConvertTo-Json -InputObject $adapters -Depth 3 -Compress"
+)
+
+# Кэш адаптеров сбрасывается при смене IP-адресов (NotifyAddrChange) и после своих
+# изменений DNS; без отслеживания изменений - не реже раза в NET_ADAPTERS_TTL секунд
+NET_ADAPTERS_TTL = 5 * 60
+net_adapters_cache = None  # (время загрузки, список NetAdapter)
+net_adapters_lock = threading.Lock()
+net_watcher_started = False
+net_watcher_active = False
+
+def json_list(value):
+    """Поле ConvertTo-Json: одиночное значение, массив или null -> список строк без пустых"""
+    if value is None:
+        return []
+    if not isinstance(value, list):
+        value = [value]
+    return [str(item) for item in value if item not in (None, "")]
+
+def parse_net_adapters(text):
+    """Вывод NET_ADAPTERS_SCRIPT -> список NetAdapter. ValueError при некорректном JSON"""
+    # С OutputEncoding = UTF8 Windows PowerShell может начать вывод с BOM
+    text = text.lstrip("\ufeff").strip()
+    if not text:
+        return []
+    data = json.loads(text)
+    # Старые PowerShell разворачивают массив из одного элемента в объект
+    if isinstance(data, dict):
+        data = [data]
+    if not isinstance(data, list):
+        raise ValueError("ожидался список адаптеров")
+
+    adapters = []
+    for item in data:
+        if not isinstance(item, dict) or not item.get("Name"):
+            continue
+        try:
+            index = int(item.get("ifIndex") or 0)
+        except (TypeError, ValueError):
+            index = 0
+        adapters.append(NetAdapter(
+            name=str(item["Name"]),
+            description=str(item.get("InterfaceDescription") or ""),
+            index=index,
+            status=str(item.get("Status") or ""),
+            virtual=bool(item.get("Virtual")),
+            ipv4=tuple(json_list(item.get("IPv4"))),
+            gateways=tuple(json_list(item.get("Gateways"))),
+            dns_servers=tuple(json_list(item.get("DnsServers"))),
+            guid=str(item.get("InterfaceGuid") or ""),
+        ))
+    return adapters
+
+def select_active_adapter(adapters):
+    """Адаптер для настройки DNS: подключён и имеет IPv4 (не APIPA).
+    Предпочтение - со шлюзом по умолчанию, затем физический, затем меньший индекс"""
+    candidates = [
+        adapter for adapter in adapters
+        if adapter.status.lower() == "up"
+        and "loopback" not in adapter.description.lower()
+        and any(not address.startswith("169.254.") for address in adapter.ipv4)
+    ]
+    if not candidates:
+        return None
+    return min(candidates, key=lambda adapter: (not adapter.gateways, adapter.virtual, adapter.index))
+
+def watch_network_changes():
+    """Фоновый поток: NotifyAddrChange без OVERLAPPED блокируется до смены IP-адресов"""
+    global net_watcher_active
+    net_watcher_active = True
+    try:
+        while ctypes.windll.iphlpapi.NotifyAddrChange(None, None) == 0:
+            invalidate_net_adapters()
+        log("Отслеживание изменений сети остановлено, кэш адаптеров обновляется по времени")
+    except Exception as e:
+        log(f"Отслеживание изменений сети недоступно: {e}")
+    finally:
+        net_watcher_active = False
+
+def start_network_watcher():
+    """Запускает отслеживание изменений сети (один раз, только Windows)"""
+    global net_watcher_started
+    if net_watcher_started or os.name != "nt":
+        return
+    net_watcher_started = True
+    threading.Thread(target=watch_network_changes, daemon=True).start()
+
+def invalidate_net_adapters():
+    """Сбрасывает кэш адаптеров: следующий запрос снова спросит PowerShell"""
+    global net_adapters_cache
+    with net_adapters_lock:
+        net_adapters_cache = None
+
+def get_net_adapters(refresh=False):
+    """Сетевые адаптеры из кэша или одним запуском PowerShell"""
+    global net_adapters_cache
+    start_network_watcher()
+    with net_adapters_lock:
+        if not refresh and net_adapters_cache is not None:
+            loaded_at, adapters = net_adapters_cache
+            if net_watcher_active or time.monotonic() - loaded_at < NET_ADAPTERS_TTL:
+                return adapters
+
+        try:
+            out = trace.traced_check_output(
+                ["powershell", "-NoProfile", "-NonInteractive", "-Command", NET_ADAPTERS_SCRIPT],
+                "powershell Get-NetAdapter",
+                encoding="utf-8",
+                errors="replace",
+                stderr=subprocess.DEVNULL,
+                timeout=30
+            )
+            adapters = parse_net_adapters(out)
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError, ValueError) as e:
+            log(f"Ошибка получения сетевых адаптеров: {e}")
+            return []
+
+        net_adapters_cache = (time.monotonic(), adapters)
+        return adapters
+
+def get_active_adapter():
+    """Активный адаптер (NetAdapter) или None"""
+    return select_active_adapter(get_net_adapters())
+
+def get_active_interface():
+    """Имя активного сетевого интерфейса для netsh или None"""
+    adapter = get_active_adapter()
+    return adapter.name if adapter else None
+
+def check_dns():
+    """Проверка текущих DNS. Возвращает (успех, текст для пользователя)"""
+    iface = get_active_interface()
+    if not iface:
+        return False, "Активный интерфейс не найден"
+
+    try:
+        dns_info = trace.traced_check_output(
+            ["netsh", "interface", "ip", "show", "dns", f'name="{iface}"'], "netsh show dns",
+            encoding="utf-8",
+            errors="replace"
+        )
+    except subprocess.CalledProcessError as e:
+        return False, f"Ошибка проверки DNS: {e}"
+    except Exception as e:
+        return False, f"Неожиданная ошибка: {e}"
+
+    doh = "Неизвестно"
+    if is_windows_11():
+        try:
+            trace.traced_check_output(
+                ["reg", "query", r"HKLM\SYSTEM\CurrentControlSet\Services\Dnscache\Parameters\DohWellKnownServers"], "reg query",
+                stderr=subprocess.DEVNULL
+            )
+            doh = "Включён"
+        except subprocess.CalledProcessError:
+            doh = "Выключен"
+        except Exception as e:
+            log(f"Ошибка проверки DoH: {e}")
+            doh = "Ошибка проверки"
+
+    return True, f"Интерфейс: {iface}\n\n{dns_info}\nDNS over HTTPS: {doh}"
+
+# Настройки в реестре HKLM: статические DNS интерфейса (NameServer) и шаблоны DoH
+TCPIP_INTERFACES_KEY = r"SYSTEM\CurrentControlSet\Services\Tcpip\Parameters\Interfaces"
+DOH_SERVERS_KEY = r"SYSTEM\CurrentControlSet\Services\Dnscache\Parameters\DohWellKnownServers"
+DOH_VALUE_NAMES = ("Template", "AutoUpgrade")
+DOH_AUTO_UPGRADE = 2
+NETSH_SCRIPT_TIMEOUT = 60
+
+def build_dns_plan(interface, servers, doh):
+    """План изменения DNS без обращения к системе: (строки скрипта netsh -f, операции реестра).
+    interface - индекс интерфейса (скрипт остаётся ASCII при любом имени адаптера);
+    servers - статические IPv4 DNS по порядку, пустой список - получать по DHCP;
+    doh - {ip: {значение реестра: данные или None - удалить}} или {ip: None} - удалить ключ.
+    Операции: ("set_value", ключ, имя, данные), ("delete_value", ключ, имя), ("delete_key", ключ).
+    ValueError, если план некорректен"""
+    if isinstance(interface, bool) or not isinstance(interface, int) or interface <= 0:
+        raise ValueError(f"некорректный индекс интерфейса: {interface!r}")
+    for address in servers:
+        if not validate_dns_address(address) or ipaddress.ip_address(address).version != 4:
+            raise ValueError(f"некорректный IPv4 адрес DNS: {address!r}")
+
+    if servers:
+        lines = [f"interface ipv4 set dnsservers name={interface} source=static "
+                 f"address={servers[0]} register=primary validate=no"]
+        lines += [f"interface ipv4 add dnsservers name={interface} address={address} index={position} validate=no"
+                  for position, address in enumerate(servers[1:], 2)]
+    else:
+        lines = [f"interface ipv4 set dnsservers name={interface} source=dhcp"]
+
+    ops = []
+    for address, values in doh.items():
+        if not validate_dns_address(address):
+            raise ValueError(f"некорректный адрес DoH: {address!r}")
+        key = f"{DOH_SERVERS_KEY}\\{address}"
+        if values is None:
+            ops.append(("delete_key", key))
+            continue
+        for name, data in values.items():
+            if name not in DOH_VALUE_NAMES:
+                raise ValueError(f"неизвестное значение DoH: {name}")
+            if data is None:
+                ops.append(("delete_value", key, name))
+            elif name == "Template" and not (isinstance(data, str) and data.startswith("https://")):
+                raise ValueError(f"шаблон DoH должен быть https-адресом: {data!r}")
+            elif name == "AutoUpgrade" and (isinstance(data, bool) or not isinstance(data, int)):
+                raise ValueError(f"AutoUpgrade должен быть числом: {data!r}")
+            else:
+                ops.append(("set_value", key, name, data))
+    return lines, ops
+
+def doh_restore_target(previous_doh, doh):
+    """Состояние DoH для отката: прежние значения тех записей, которые меняет doh"""
+    restore = {}
+    for address, values in doh.items():
+        previous = previous_doh.get(address)
+        if previous is None:
+            # Ключа не было - удаляем созданный
+            restore[address] = None
+        else:
+            restore[address] = {name: previous.get(name) for name in (values or previous)}
+    return restore
+
+def read_registry_values(winreg, key_path, names):
+    """Значения из HKLM: None - ключа нет, значение None - нет такого значения"""
+    try:
+        key = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, key_path)
+    except FileNotFoundError:
+        return None
+    with key:
+        values = {}
+        for name in names:
+            try:
+                values[name] = winreg.QueryValueEx(key, name)[0]
+            except FileNotFoundError:
+                values[name] = None
+        return values
+
+def read_dns_state(adapter, doh_addresses):
+    """Текущие статические DNS интерфейса (пусто - DHCP) и записи DoH - без запуска процессов"""
+    import winreg
+    if not re.fullmatch(r"\{[0-9A-Fa-f-]{36}\}", adapter.guid):
+        raise ValueError(f"неизвестен GUID интерфейса {adapter.name}")
+    tcpip = read_registry_values(winreg, f"{TCPIP_INTERFACES_KEY}\\{adapter.guid}", ("NameServer",)) or {}
+    servers = tuple(address for address in re.split(r"[,\s]+", tcpip.get("NameServer") or "") if address)
+    doh = {address: read_registry_values(winreg, f"{DOH_SERVERS_KEY}\\{address}", DOH_VALUE_NAMES)
+           for address in doh_addresses}
+    return servers, doh
+
+def apply_registry_ops(ops):
+    """Выполняет операции реестра из build_dns_plan в процессе, через winreg"""
+    if not ops:
+        return
+    import winreg
+    with trace.span("winreg write"):
+        for op in ops:
+            kind, key_path = op[0], op[1]
+            if kind == "delete_key":
+                try:
+                    winreg.DeleteKey(winreg.HKEY_LOCAL_MACHINE, key_path)
+                except FileNotFoundError:
+                    pass
+            elif kind == "delete_value":
+                try:
+                    with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, key_path, 0, winreg.KEY_SET_VALUE) as key:
+                        winreg.DeleteValue(key, op[2])
+                except FileNotFoundError:
+                    pass
+            else:
+                name, data = op[2], op[3]
+                value_type = winreg.REG_DWORD if isinstance(data, int) else winreg.REG_SZ
+                with winreg.CreateKeyEx(winreg.HKEY_LOCAL_MACHINE, key_path, 0, winreg.KEY_SET_VALUE) as key:
+                    winreg.SetValueEx(key, name, 0, value_type, data)
+
+def run_netsh_script(lines):
+    """Все команды netsh одним процессом (netsh -f). RuntimeError, если скрипт не выполнился"""
+    fd, path = tempfile.mkstemp(prefix="dns-", suffix=".netsh")
+    try:
+        with os.fdopen(fd, "w", encoding="ascii") as f:
+            f.write("\n".join(lines) + "\n")
+        result = trace.traced_run(
+            ["netsh", "-f", path], "netsh -f",
+            capture_output=True,
+            encoding="cp866",
+            errors="replace",
+            timeout=NETSH_SCRIPT_TIMEOUT
+        )
+        if result.returncode != 0:
+            output = (result.stdout + result.stderr).strip()
+            raise RuntimeError(f"netsh завершился с кодом {result.returncode}: {output}")
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def change_dns(servers, doh):
+    """Изменение DNS одной транзакцией: проверка плана заранее, один netsh -f и запись реестра.
+    Прежнее состояние запоминается и восстанавливается при любой ошибке.
+    Возвращает (успех, сообщение об ошибке или None)"""
+    adapter = get_active_adapter()
+    if adapter is None:
+        return False, "Интерфейс не найден"
+
+    try:
+        previous_servers, previous_doh = read_dns_state(adapter, doh.keys())
+        netsh_lines, registry_ops = build_dns_plan(adapter.index, servers, doh)
+        rollback_lines, rollback_ops = build_dns_plan(
+            adapter.index, previous_servers, doh_restore_target(previous_doh, doh))
+    except ImportError:
+        return False, "Настройка DNS доступна только в Windows"
+    except (ValueError, OSError) as e:
+        return False, f"Некорректная конфигурация DNS: {e}"
+
+    log(f"DNS {adapter.name}: {', '.join(previous_servers) or 'DHCP'} -> {', '.join(servers) or 'DHCP'}")
+    try:
+        run_netsh_script(netsh_lines)
+        # netsh -f не всегда сообщает об ошибке кодом возврата - сверяем результат
+        applied = read_dns_state(adapter, ())[0]
+        if applied != tuple(servers):
+            raise RuntimeError(f"после netsh DNS {', '.join(applied) or 'DHCP'}")
+        apply_registry_ops(registry_ops)
+        return True, None
+    except Exception as e:
+        log(f"Ошибка изменения DNS, откат к прежним настройкам: {e}")
+        try:
+            run_netsh_script(rollback_lines)
+            apply_registry_ops(rollback_ops)
+            outcome = "прежние настройки восстановлены"
+        except Exception as rollback_error:
+            log(f"Ошибка отката DNS: {rollback_error}")
+            outcome = f"откат не удался: {rollback_error}"
+        return False, f"Ошибка изменения DNS: {e} ({outcome})"
+    finally:
+        # DNS-серверы в кэше адаптеров устарели
+        invalidate_net_adapters()
+
+def set_dns():
+    """Настройка DNS и DoH. Возвращает (успех, текст для пользователя)"""
+    if not is_admin():
+        return False, "Для настройки DNS требуются права администратора"
+
+    if not validate_dns_config():
+        return False, "Некорректная конфигурация DNS"
+
+    log("DNS SET")
+    doh = {}
+    if is_windows_11():
+        doh = {dns: {"Template": DOH_TEMPLATE, "AutoUpgrade": DOH_AUTO_UPGRADE} for dns in (DNS1, DNS2)}
+    success, error = change_dns((DNS1, DNS2), doh)
+    return success, "DNS настроен" if success else error
+
+def rollback_dns():
+    """Возврат DNS к DHCP. Возвращает (успех, текст для пользователя)"""
+    if not is_admin():
+        return False, "Для отката DNS требуются права администратора"
+
+    log("DNS ROLLBACK")
+    # Удаляются только свои записи DoH - встроенные в Windows остаются
+    doh = {dns: None for dns in (DNS1, DNS2)} if is_windows_11() else {}
+    success, error = change_dns((), doh)
+    return success, "DNS возвращён в авто" if success else error
+
+# ===================== ЗЕРКАЛА =====================
+
+# Пул keep-alive соединений: (схема, хост) -> свободные HTTPConnection
+http_pool = {}
+http_pool_lock = threading.Lock()
+HTTP_POOL_SIZE = 4
+# Индекс в CATALOG_URLS последнего ответившего источника - с него начинаем
+preferred_mirror = 0
+HTTP_REDIRECT_CODES = (301, 302, 303, 307, 308)
+HTTP_MAX_REDIRECTS = 5
+http_proxies = None  # urllib.request.getproxies(), см. get_proxies()
+
+def acquire_connection(scheme, netloc, timeout):
+    """Свободное соединение из пула или новое. Возвращает (соединение, из пула ли)"""
+    with http_pool_lock:
+        idle = http_pool.get((scheme, netloc))
+        if idle:
+            conn = idle.pop()
+            conn.timeout = timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(timeout)
+            return conn, True
+    if scheme == "https":
+        return http.client.HTTPSConnection(netloc, timeout=timeout), False
+    return http.client.HTTPConnection(netloc, timeout=timeout), False
+
+def release_connection(scheme, netloc, conn):
+    """Возвращает соединение в пул (лишние закрываются)"""
+    with http_pool_lock:
+        idle = http_pool.setdefault((scheme, netloc), [])
+        if len(idle) < HTTP_POOL_SIZE:
+            idle.append(conn)
+            return
+    conn.close()
+
+def read_response_body(response, sink):
+    """Тело ответа: 200 перезаписывает sink с начала, 206 пишется с позиции из Content-Range.
+    Без sink (и для остальных кодов) тело возвращается"""
+    if sink is None or response.status not in (200, 206):
+        return response.read()
+    if response.status == 200:
+        sink.seek(0)
+        sink.truncate()
+    else:
+        # Докачка пишется с позиции из Content-Range, а не с текущей
+        match = re.match(r"bytes (\d+)-", response.headers.get("Content-Range", ""))
+        if match:
+            sink.seek(int(match.group(1)))
+            sink.truncate()
+    for chunk in iter(lambda: response.read(1024 * 1024), b""):
+        sink.write(chunk)
+    return None
+
+def get_proxies():
+    """Системные прокси (переменные окружения, на Windows - настройки Internet Options),
+    читаются один раз за сеанс"""
+    global http_proxies
+    if http_proxies is None:
+        http_proxies = urllib.request.getproxies()
+    return http_proxies
+
+def uses_proxy(parts):
+    """Запрос к хосту должен идти через прокси (хост не в исключениях)"""
+    return parts.scheme in get_proxies() and not urllib.request.proxy_bypass(parts.hostname or "")
+
+def urllib_request(url, headers=None, timeout=5, sink=None):
+    """GET через urllib: прокси и переадресации обрабатывает он сам.
+    Возвращает (код, заголовки, тело), как direct_request"""
+    opener = urllib.request.build_opener(urllib.request.ProxyHandler(get_proxies()))
+    try:
+        response = opener.open(urllib.request.Request(url, headers=headers or {}), timeout=timeout)
+    except urllib.error.HTTPError as e:
+        e.close()
+        return e.code, e.headers, None
+    with response:
+        return response.status, response.headers, read_response_body(response, sink)
+
+def direct_request(url, headers=None, timeout=5, sink=None):
+    """GET через пул keep-alive соединений (без прокси и переадресаций).
+    Возвращает (код, заголовки, тело)"""
+    parts = urllib.parse.urlsplit(url)
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+
+    for attempt in range(2):
+        conn, reused = acquire_connection(parts.scheme, parts.netloc, timeout)
+        try:
+            conn.request("GET", path, headers=headers or {})
+            response = conn.getresponse()
+            body = read_response_body(response, sink)
+        except (http.client.HTTPException, OSError) as e:
+            conn.close()
+            # Сервер мог закрыть простаивающее соединение - повторяем на новом
+            if reused and attempt == 0:
+                continue
+            raise urllib.error.URLError(e)
+
+        if response.will_close:
+            conn.close()
+        else:
+            release_connection(parts.scheme, parts.netloc, conn)
+        return response.status, response.headers, body
+
+def pooled_request(url, headers=None, timeout=5, sink=None):
+    """GET с переадресациями: через системный прокси - urllib, напрямую - пул соединений.
+    Тело пишется в sink (файл) или возвращается. Возвращает (код, заголовки, тело)"""
+    for _ in range(HTTP_MAX_REDIRECTS + 1):
+        if uses_proxy(urllib.parse.urlsplit(url)):
+            return urllib_request(url, headers, timeout, sink)
+        status, response_headers, body = direct_request(url, headers, timeout, sink)
+        location = response_headers.get("Location")
+        if status not in HTTP_REDIRECT_CODES or not location:
+            return status, response_headers, body
+        # Переименованный репозиторий, переадресация зеркала
+        url = urllib.parse.urljoin(url, location)
+    raise urllib.error.URLError(f"слишком много переадресаций: {url}")
+
+def mirror_get(path, headers=None, timeout=5, sink=None):
+    """Файл из первого доступного источника CATALOG_URLS.
+    Ошибка сети, 5xx и 404 - переход к следующему источнику.
+    Коды 304 и 4xx отдаются как urllib.error.HTTPError, как у urlopen"""
+    global preferred_mirror
+    order = list(range(preferred_mirror, len(CATALOG_URLS))) + list(range(preferred_mirror))
+    last_error = None
+    for index in order:
+        url = urllib.parse.urljoin(CATALOG_URLS[index], path)
+        try:
+            status, response_headers, body = pooled_request(url, headers, timeout, sink)
+        except urllib.error.URLError as e:
+            log(f"Источник каталога недоступен: {CATALOG_URLS[index]} ({e.reason})")
+            last_error = e
+            continue
+
+        if status >= 500 or status == 404:
+            last_error = urllib.error.HTTPError(url, status, f"HTTP {status}", response_headers, None)
+            continue
+        if status >= 300:
+            raise urllib.error.HTTPError(url, status, f"HTTP {status}", response_headers, None)
+
+        if index != preferred_mirror:
+            log(f"Источник каталога: {CATALOG_URLS[index]}")
+            preferred_mirror = index
+        return status, response_headers, body
+
+    raise last_error or urllib.error.URLError("нет источников каталога")
+
+# Индекс установщиков зеркала (installers/index.json), загружается один раз за сеанс
+mirror_installers = None
+mirror_installers_lock = threading.Lock()
+
+def load_mirror_installers():
+    """Список установщиков на зеркалах ([] - зеркал с установщиками нет)"""
+    global mirror_installers
+    with mirror_installers_lock:
+        # На GitHub установщиков нет - без настроенных зеркал не спрашиваем
+        if len(CATALOG_URLS) < 2:
+            mirror_installers = []
+        if mirror_installers is None:
+            try:
+                index = json.loads(fetch_url("installers/index.json").decode("utf-8"))
+                mirror_installers = [entry for entry in index.get("installers", [])
+                                     if isinstance(entry, dict) and {"id", "version", "sha256", "installer"} <= entry.keys()]
+                log(f"Установщиков на зеркале: {len(mirror_installers)}")
+            except (urllib.error.URLError, ValueError, UnicodeDecodeError, AttributeError) as e:
+                log(f"Установщики на зеркале недоступны: {e}")
+                mirror_installers = []
+        return mirror_installers
+
+def fetch_installer_from_mirror(pkg_id, version=None):
+    """Загружает установщик с зеркала в локальный кэш (по адресу sha256/<хэш>).
+    Прерванная загрузка докачивается запросом Range. Возвращает True при успехе"""
+    entries = [entry for entry in load_mirror_installers() if entry["id"].lower() == pkg_id.lower()]
+    if version:
+        entries = [entry for entry in entries if entry["version"] == version]
+    if not entries:
+        return False
+    entry = max(entries, key=lambda e: e.get("downloaded_at", 0))
+
+    target = os.path.join(PREFETCH_DIR, safe_path_part(entry["id"]), safe_path_part(entry["version"]))
+    installer_name = os.path.basename(entry["installer"])
+    part_path = os.path.join(target, installer_name + ".part")
+    try:
+        os.makedirs(target, exist_ok=True)
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        with trace.span("mirror download", pkg_id) as record:
+            with open(part_path, "r+b" if offset else "wb") as f:
+                f.seek(offset)
+                try:
+                    record["returncode"] = mirror_get(f"sha256/{entry['sha256']}", headers, timeout=30, sink=f)[0]
+                except urllib.error.HTTPError as e:
+                    # 416 - недокачанный файл на самом деле уже полный, проверяем хэш
+                    if e.code != 416:
+                        raise
+
+        if file_sha256(part_path).lower() != entry["sha256"].lower():
+            log(f"Хэш установщика {pkg_id} с зеркала не совпал", pkg_id=pkg_id)
+            os.remove(part_path)
+            return False
+
+        now = time.time()
+        with prefetch_cache_lock:
+            os.replace(part_path, os.path.join(target, installer_name))
+            write_cache_entry(target, {
+                "id": entry["id"],
+                "version": entry["version"],
+                "installer": installer_name,
+                "installer_type": entry.get("installer_type"),
+                "silent": entry.get("silent"),
+                "sha256": entry["sha256"],
+                "size": os.path.getsize(os.path.join(target, installer_name)),
+                "downloaded_at": now,
+                "last_used": now,
+            })
+        log(f"Установщик {pkg_id} {entry['version']} загружен с зеркала", pkg_id=pkg_id)
+        evict_installer_cache()
+        return True
+    except (urllib.error.URLError, OSError) as e:
+        log(f"Ошибка загрузки установщика {pkg_id} с зеркала: {e}", pkg_id=pkg_id)
+        return False
+
+# ===================== GITHUB =====================
+
+def load_packages_from_github():
+    """Загружает список пакетов из GitHub (оптимизированная версия)"""
+    global PACKAGES, update_available
+
+    try:
+        # Быстрая загрузка с коротким таймаутом (зеркала по очереди, затем GitHub).
+        # Условный запрос: если локальная копия актуальна, сервер ответит 304
+        request_headers = {}
+        validators = load_packages_validators()
+        if validators.get("etag"):
+            request_headers['If-None-Match'] = validators["etag"]
+        if validators.get("last_modified"):
+            request_headers['If-Modified-Since'] = validators["last_modified"]
+
+        try:
+            _, headers, data = mirror_get("packages.json", request_headers, timeout=5)
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                # Каталог не изменился - локальную копию не перечитываем
+                log("Список пакетов на GitHub не изменился (304)")
+                update_available = False
+                return None
+            raise
+
+        # Быстрое декодирование и парсинг
+        github_packages = json.loads(data.decode('utf-8'))
+
+        # Валидация загруженных пакетов
+        validated_packages = validate_packages_list(github_packages)
+        if not validated_packages:
+            log("Загруженные с GitHub пакеты не прошли валидацию")
+            update_available = False
+            return None
+
+        # Локальная копия и валидаторы должны соответствовать друг другу
+        if save_raw_packages(data):
+            save_packages_validators(headers.get("ETag"), headers.get("Last-Modified"))
+
+        # Быстрое сравнение по хэшу канонического JSON
+        if catalog_hash(validated_packages) != catalog_hash(PACKAGES):
+            update_available = True
+            return validated_packages
+
+        update_available = False
+        return None
+
+    except urllib.error.URLError as e:
+        log(f"Ошибка сети при загрузке с GitHub: {e}")
+        update_available = False
+        return None
+    except json.JSONDecodeError as e:
+        log(f"Ошибка парсинга JSON с GitHub: {e}")
+        update_available = False
+        return None
+    except ValueError as e:
+        log(f"Ошибка валидации данных с GitHub: {e}")
+        update_available = False
+        return None
+    except Exception as e:
+        log(f"Неожиданная ошибка загрузки с GitHub: {e}")
+        update_available = False
+        return None
+
+def catalog_hash(packages):
+    """SHA-256 канонического JSON каталога (порядок ключей не важен)"""
+    canonical = json.dumps([package_to_dict(pkg) for pkg in packages], sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def diff_catalogs(old_packages, new_packages):
+    """Разница каталогов по id: добавленные, удалённые и изменённые пакеты"""
+    old_by_id = {pkg.id: pkg for pkg in old_packages}
+    new_by_id = {pkg.id: pkg for pkg in new_packages}
+    return {
+        "added": [pkg for pkg_id, pkg in new_by_id.items() if pkg_id not in old_by_id],
+        "removed": [pkg for pkg_id, pkg in old_by_id.items() if pkg_id not in new_by_id],
+        "changed": [pkg for pkg_id, pkg in new_by_id.items()
+                    if pkg_id in old_by_id and old_by_id[pkg_id] != pkg],
+    }
+
+def merge_catalog(old_packages, new_packages):
+    """Новый каталог, в котором неизменённые пакеты - те же объекты, что и раньше.
+    Возвращает (каталог, разница)"""
+    old_by_id = {pkg.id: pkg for pkg in old_packages}
+    merged = []
+    for pkg in new_packages:
+        old_pkg = old_by_id.get(pkg.id)
+        merged.append(old_pkg if old_pkg == pkg else pkg)
+    return merged, diff_catalogs(old_packages, new_packages)
+
+def load_packages_validators():
+    """Валидаторы HTTP-кэша для локальной копии списка пакетов"""
+    if not os.path.exists(LOCAL_PACKAGES_FILE):
+        return {}
+    try:
+        with open(PACKAGES_VALIDATORS_FILE, 'r', encoding='utf-8') as f:
+            validators = json.load(f)
+        return validators if isinstance(validators, dict) else {}
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        log(f"Ошибка чтения {PACKAGES_VALIDATORS_FILE}: {e}")
+        return {}
+
+def save_packages_validators(etag, last_modified):
+    """Сохраняет ETag / Last-Modified последней загрузки"""
+    try:
+        if not etag and not last_modified:
+            if os.path.exists(PACKAGES_VALIDATORS_FILE):
+                os.remove(PACKAGES_VALIDATORS_FILE)
+            return
+        with open(PACKAGES_VALIDATORS_FILE, 'w', encoding='utf-8') as f:
+            json.dump({"etag": etag, "last_modified": last_modified}, f)
+    except OSError as e:
+        log(f"Ошибка записи {PACKAGES_VALIDATORS_FILE}: {e}")
+
+def save_raw_packages(data):
+    """Атомарно сохраняет загруженный список пакетов как есть"""
+    tmp_file = LOCAL_PACKAGES_FILE + ".tmp"
+    try:
+        with open(tmp_file, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_file, LOCAL_PACKAGES_FILE)
+        return True
+    except OSError as e:
+        log(f"Ошибка файловой системы при сохранении пакетов: {e}")
+        return False
+
+def save_packages_to_file(packages):
+    """Сохраняет список пакетов в локальный файл"""
+    # Файл больше не совпадает с ответом сервера - его ETag/Last-Modified недействительны,
+    # иначе следующий условный запрос получит 304 для другого содержимого
+    save_packages_validators(None, None)
+    try:
+        with open(LOCAL_PACKAGES_FILE, 'w', encoding='utf-8') as f:
+            json.dump([package_to_dict(pkg) for pkg in packages], f, ensure_ascii=False, indent=2)
+        log(f"Пакеты сохранены в {LOCAL_PACKAGES_FILE}")
+        return True
+    except PermissionError:
+        log(f"Нет прав на запись в {LOCAL_PACKAGES_FILE}")
+        return False
+    except OSError as e:
+        log(f"Ошибка файловой системы при сохранении пакетов: {e}")
+        return False
+    except (TypeError, ValueError) as e:
+        log(f"Ошибка сериализации пакетов: {e}")
+        return False
+    except Exception as e:
+        log(f"Неожиданная ошибка сохранения пакетов: {e}")
+        return False
+
+def load_packages_from_file():
+    """Загружает список пакетов из локального файла"""
+    try:
+        if os.path.exists(LOCAL_PACKAGES_FILE):
+            with open(LOCAL_PACKAGES_FILE, 'r', encoding='utf-8') as f:
+                packages = json.load(f)
+
+            # Валидация загруженных пакетов
+            validated_packages = validate_packages_list(packages)
+            if validated_packages:
+                log(f"Пакеты загружены из {LOCAL_PACKAGES_FILE}")
+                return validated_packages
+            else:
+                log(f"Пакеты из {LOCAL_PACKAGES_FILE} не прошли валидацию")
+                return None
+    except FileNotFoundError:
+        log(f"Файл {LOCAL_PACKAGES_FILE} не найден")
+    except PermissionError:
+        log(f"Нет прав на чтение {LOCAL_PACKAGES_FILE}")
+    except OSError as e:
+        log(f"Ошибка файловой системы при загрузке пакетов: {e}")
+    except (json.JSONDecodeError, ValueError) as e:
+        log(f"Ошибка парсинга JSON в {LOCAL_PACKAGES_FILE}: {e}")
+    except Exception as e:
+        log(f"Неожиданная ошибка загрузки локальных пакетов: {e}")
+    return None
+
+# ===================== ШАРДЫ КАТАЛОГА =====================
+
+loaded_shard_groups = set()
+catalog_index_missing = False
+
+def shard_file_name(group):
+    """Имя файла шарда для группы (латиница, без пробелов)"""
+    slug = normalize_search_text(group).replace(" ", "-") or "group"
+    return f"{slug}.json"
+
+def build_catalog_shards(packages, out_dir):
+    """Раскладывает каталог по шардам (по одному на группу) и пишет index.json"""
+    groups = {}
+    for pkg in packages:
+        groups.setdefault(pkg.group, []).append(package_to_dict(pkg))
+
+    os.makedirs(out_dir, exist_ok=True)
+    shards = []
+    for group, items in groups.items():
+        data = json.dumps(items, ensure_ascii=False, indent=2).encode("utf-8")
+        file_name = shard_file_name(group)
+        with open(os.path.join(out_dir, file_name), "wb") as f:
+            f.write(data)
+        shards.append({
+            "group": group,
+            "count": len(items),
+            "file": file_name,
+            "sha256": hashlib.sha256(data).hexdigest(),
+        })
+
+    index = {"version": 1, "total": len(packages), "shards": shards}
+    with open(os.path.join(out_dir, "index.json"), "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+    return index
+
+def fetch_url(path, timeout=5):
+    """Загрузка файла каталога (путь внутри источника) без промежуточных кэшей"""
+    return mirror_get(path, {'Cache-Control': 'no-cache', 'Pragma': 'no-cache'}, timeout=timeout)[2]
+
+def load_catalog_index():
+    """Загружает index.json шардированного каталога или возвращает None"""
+    global catalog_index_missing
+    if catalog_index_missing:
+        return None
+
+    try:
+        index = json.loads(fetch_url(CATALOG_INDEX_PATH).decode("utf-8"))
+        shards = index.get("shards") if isinstance(index, dict) else None
+        if not isinstance(shards, list) or not all(
+            isinstance(entry, dict) and {"group", "file", "sha256"} <= entry.keys() for entry in shards
+        ):
+            log("index.json каталога имеет неверный формат")
+            return None
+        return index
+    except urllib.error.HTTPError as e:
+        if e.code == 404:
+            # Шардированного каталога нет - больше не пытаемся в этом сеансе
+            catalog_index_missing = True
+        log(f"Индекс шардов каталога недоступен: {e}")
+        return None
+    except urllib.error.URLError as e:
+        log(f"Ошибка сети при загрузке индекса шардов: {e}")
+        return None
+    except (ValueError, UnicodeDecodeError) as e:
+        log(f"Ошибка парсинга индекса шардов: {e}")
+        return None
+
+def load_catalog_shard(entry):
+    """Пакеты одного шарда: из кэша по хэшу или с сервера с проверкой хэша"""
+    cache_path = os.path.join(SHARD_CACHE_DIR, f"{entry['sha256']}.json")
+    data = None
+    try:
+        with open(cache_path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        log(f"Ошибка чтения кэша шарда {entry['file']}: {e}")
+
+    if data is None:
+        try:
+            data = fetch_url(urllib.parse.urljoin(CATALOG_INDEX_PATH, urllib.parse.quote(entry["file"])))
+        except urllib.error.URLError as e:
+            log(f"Ошибка загрузки шарда {entry['file']}: {e}")
+            return None
+        if hashlib.sha256(data).hexdigest() != entry["sha256"]:
+            log(f"Хэш шарда {entry['file']} не совпадает с index.json")
+            return None
+        try:
+            os.makedirs(SHARD_CACHE_DIR, exist_ok=True)
+            with open(cache_path, "wb") as f:
+                f.write(data)
+        except OSError as e:
+            log(f"Ошибка записи кэша шарда {entry['file']}: {e}")
+
+    try:
+        return validate_packages_list(json.loads(data.decode("utf-8"))) or None
+    except (ValueError, UnicodeDecodeError) as e:
+        log(f"Ошибка парсинга шарда {entry['file']}: {e}")
+        return None
+
+def load_packages_from_shards(groups=None):
+    """Каталог из шардов: загружаются только группы из groups (None - все),
+    остальные группы берутся из текущего PACKAGES. None - шарды недоступны"""
+    index = load_catalog_index()
+    if index is None:
+        return None
+
+    shard_packages = {}
+    for entry in index["shards"]:
+        if groups is not None and entry["group"] not in groups:
+            continue
+        packages = load_catalog_shard(entry)
+        if packages is None:
+            return None
+        shard_packages[entry["group"]] = packages
+    loaded_shard_groups.update(shard_packages)
+
+    # Порядок групп задаёт index.json
+    result = []
+    for entry in index["shards"]:
+        group = entry["group"]
+        if group in shard_packages:
+            result.extend(shard_packages[group])
+        else:
+            result.extend(group_packages(group))
+    return result
+
+def load_remote_packages(groups=None):
+    """Каталог с сервера: шарды нужных групп, иначе монолитный packages.json.
+    Возвращает новый каталог, только если он отличается от PACKAGES"""
+    global update_available
+
+    packages = load_packages_from_shards(groups)
+    if packages is None:
+        return load_packages_from_github()
+
+    update_available = catalog_hash(packages) != catalog_hash(PACKAGES)
+    if not update_available:
+        return None
+    # Локальная копия нужна для мгновенного запуска в следующий раз
+    save_packages_to_file(packages)
+    return packages
+
+def load_catalog():
+    """Каталог для запуска без GUI: локальный файл или встроенный список"""
+    global PACKAGES
+    local_packages = load_packages_from_file()
+    if local_packages:
+        PACKAGES = local_packages
+    return PACKAGES
@@ -0,0 +1,259 @@
+"""Зеркало каталога и установщиков для настройки парка машин в локальной сети.
+
+Одна машина раздаёт packages.json, шарды каталога и кэш установщиков:
+
+    python software_installer.py --serve --port 8765
+
+Остальные получают адрес через INSTALLER_CATALOG_URLS=http://host:8765/
+(GitHub остаётся запасным источником). Пути:
+
+    /packages.json, /catalog/index.json, /catalog/<шард>
+    /installers/index.json - список установщиков из кэша
+    /sha256/<хэш>          - установщик по SHA-256 (неизменяемый, поддерживает Range)
+"""
+
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import installer_core as core
+from installer_core import log
+
+MIRROR_PORT = 8765
+COPY_CHUNK = 1024 * 1024
+
+# Файлы каталога, подготовленные при запуске: путь запроса -> файл
+catalog_files = {}
+
+
+def build_mirror_catalog(packages, out_dir):
+    """packages.json и шарды каталога для раздачи"""
+    catalog_files.clear()
+    packages_path = os.path.join(out_dir, "packages.json")
+    with open(packages_path, "w", encoding="utf-8") as f:
+        json.dump([core.package_to_dict(pkg) for pkg in packages], f, ensure_ascii=False, indent=2)
+    catalog_files["packages.json"] = packages_path
+
+    shards_dir = os.path.join(out_dir, "catalog")
+    index = core.build_catalog_shards(packages, shards_dir)
+    catalog_files[core.CATALOG_INDEX_PATH] = os.path.join(shards_dir, "index.json")
+    for entry in index["shards"]:
+        catalog_files[f"catalog/{entry['file']}"] = os.path.join(shards_dir, entry["file"])
+    return index
+
+
+def installers_index():
+    """Установщики из кэша: (index.json для клиентов, хэш -> путь к файлу)"""
+    installers = []
+    by_hash = {}
+    for entry in core.read_cache_entries():
+        path = os.path.join(entry["dir"], entry["installer"])
+        if not os.path.isfile(path):
+            continue
+        by_hash[entry["sha256"].lower()] = path
+        installers.append({
+            **{key: value for key, value in entry.items() if key not in ("dir", "last_used")},
+            "url": f"sha256/{entry['sha256'].lower()}",
+        })
+    return {"installers": installers}, by_hash
+
+
+# Индекс установщиков строится при запуске и перечитывается, только когда меняется кэш
+installers_cache = {"stamp": None, "index": {"installers": []}, "by_hash": {}}
+installers_cache_lock = threading.Lock()
+
+
+def cache_dir_stamp():
+    """Времена изменения папок кэша (<id>/<версия>): меняются при добавлении и вытеснении
+    версий и при записи entry.json. Только stat - без чтения entry.json"""
+    stamp = []
+    try:
+        stamp.append(os.stat(core.PREFETCH_DIR).st_mtime_ns)
+        for pkg_dir in os.scandir(core.PREFETCH_DIR):
+            if pkg_dir.is_dir():
+                stamp.append(pkg_dir.stat().st_mtime_ns)
+                stamp.extend(version.stat().st_mtime_ns for version in os.scandir(pkg_dir.path)
+                             if version.is_dir())
+    except OSError:
+        pass
+    return tuple(stamp)
+
+
+def refresh_installers_index(force=False):
+    """Кэшированный installers_index(); пересобирается при изменении папок кэша"""
+    with installers_cache_lock:
+        stamp = cache_dir_stamp()
+        if force or stamp != installers_cache["stamp"]:
+            index, by_hash = installers_index()
+            installers_cache.update(stamp=stamp, index=index, by_hash=by_hash)
+        return installers_cache["index"], installers_cache["by_hash"]
+
+
+def installer_path(sha256):
+    """Путь к установщику по хэшу. Адрес неизменяем, поэтому кэш проверяется только при промахе"""
+    path = installers_cache["by_hash"].get(sha256)
+    if path and os.path.isfile(path):
+        return path
+    return refresh_installers_index()[1].get(sha256)
+
+
+def parse_range(header, size):
+    """Заголовок Range -> (начало, конец включительно) или None, если диапазон недопустим.
+    Поддерживается один диапазон: bytes=a-b, bytes=a-, bytes=-n"""
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", header.strip())
+    if not match or (not match.group(1) and not match.group(2)):
+        return None
+    if match.group(1):
+        start = int(match.group(1))
+        end = int(match.group(2)) if match.group(2) else size - 1
+    else:
+        start = max(0, size - int(match.group(2)))
+        end = size - 1
+    if start >= size or end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def file_etag(path):
+    """ETag файла каталога по размеру и времени изменения"""
+    stat = os.stat(path)
+    return f'"{stat.st_size:x}-{int(stat.st_mtime_ns):x}"'
+
+
+class MirrorRequestHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 - клиенты держат keep-alive соединение
+    protocol_version = "HTTP/1.1"
+    server_version = "PostInstallMirror/1.0"
+    # Заголовки и тело уходят отдельными записями - без TCP_NODELAY каждый ответ
+    # ждёт задержанного ACK клиента (~40 мс)
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.handle_request(send_body=True)
+
+    def do_HEAD(self):
+        self.handle_request(send_body=False)
+
+    def log_message(self, format, *args):
+        log(f"Зеркало {self.client_address[0]}: {format % args}")
+
+    def handle_request(self, send_body):
+        path = urllib.parse.unquote(urllib.parse.urlsplit(self.path).path).lstrip("/")
+
+        if path in catalog_files:
+            self.send_file(catalog_files[path], "application/json", file_etag(catalog_files[path]),
+                           "no-cache", send_body)
+            return
+
+        if path == "installers/index.json":
+            index, _ = refresh_installers_index()
+            body = json.dumps(index, ensure_ascii=False).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            if send_body:
+                self.wfile.write(body)
+            return
+
+        match = re.fullmatch(r"sha256/([0-9a-f]{64})", path)
+        if match:
+            file_path = installer_path(match.group(1))
+            if file_path:
+                # Адрес по хэшу неизменяем - клиенты и прокси могут кэшировать навсегда
+                self.send_file(file_path, "application/octet-stream", f'"{match.group(1)}"',
+                               "public, max-age=31536000, immutable", send_body)
+                return
+
+        self.send_error_response(404, "Not Found", send_body)
+
+    def send_error_response(self, code, message, send_body):
+        """Текстовая ошибка; на HEAD только заголовки - тело сломало бы keep-alive соединение"""
+        body = message.encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def send_file(self, path, content_type, etag, cache_control, send_body):
+        """Файл целиком, диапазоном (206) или 304 по If-None-Match"""
+        size = os.path.getsize(path)
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        start, end = 0, size - 1
+        status = 200
+        range_header = self.headers.get("Range")
+        if range_header and size > 0:
+            requested = parse_range(range_header, size)
+            if requested is None:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            start, end = requested
+            status = 206
+
+        length = max(0, end - start + 1)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(length))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", cache_control)
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.end_headers()
+
+        if not send_body:
+            return
+        with open(path, "rb") as f:
+            f.seek(start)
+            remaining = length
+            while remaining > 0:
+                chunk = f.read(min(COPY_CHUNK, remaining))
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+                remaining -= len(chunk)
+
+
+def create_mirror_server(packages, bind="0.0.0.0", port=MIRROR_PORT):
+    """Готовит файлы каталога и создаёт сервер (запуск - serve_forever)"""
+    out_dir = tempfile.mkdtemp(prefix="post-install-mirror-")
+    index = build_mirror_catalog(packages, out_dir)
+    server = ThreadingHTTPServer((bind, port), MirrorRequestHandler)
+    server.daemon_threads = True
+    server.mirror_dir = out_dir
+    installers, _ = refresh_installers_index(force=True)
+    log(f"Зеркало: {len(packages)} программ, шардов {len(index['shards'])}, "
+        f"установщиков {len(installers['installers'])}, порт {server.server_address[1]}")
+    return server
+
+
+def run_mirror(packages, bind="0.0.0.0", port=MIRROR_PORT):
+    """Запускает зеркало до Ctrl+C"""
+    server = create_mirror_server(packages, bind, port)
+    print(f"Зеркало запущено: http://{bind}:{server.server_address[1]}/ (кэш установщиков: {core.PREFETCH_DIR})")
+    print(f"На клиентах: set INSTALLER_CATALOG_URLS=http://<адрес этой машины>:{server.server_address[1]}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        shutil.rmtree(server.mirror_dir, ignore_errors=True)
+    return 0
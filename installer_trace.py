@@ -0,0 +1,169 @@
+"""Трассировка установщика: интервалы вокруг процессов winget/netsh и обновлений UI.
+
+Каждый интервал - словарь с полями phase, pkg_id, start, duration, returncode, timeout.
+Интервалы экспортируются в JSONL или в формат Chrome trace (chrome://tracing, Perfetto).
+"""
+
+import json
+import os
+import subprocess
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Хранится не больше MAX_SPANS последних интервалов
+MAX_SPANS = 50000
+
+spans = deque(maxlen=MAX_SPANS)
+spans_lock = threading.Lock()
+
+# Обработчики завершённых интервалов (например, запись в JSONL-журнал)
+span_listeners = []
+
+# Начало отсчёта для Chrome trace (микросекунды от запуска)
+TRACE_STARTED = time.perf_counter()
+
+
+@contextmanager
+def span(phase, pkg_id=None):
+    """Замер интервала. Вызывающий код может записать returncode в словарь интервала"""
+    record = {
+        "phase": phase,
+        "pkg_id": pkg_id,
+        "start": time.perf_counter(),
+        "duration": 0.0,
+        "returncode": None,
+        "timeout": False,
+        "thread": threading.get_ident(),
+    }
+    try:
+        yield record
+    except subprocess.TimeoutExpired:
+        record["timeout"] = True
+        raise
+    finally:
+        record["duration"] = time.perf_counter() - record["start"]
+        add_span(record)
+
+
+def add_span(record):
+    """Сохраняет завершённый интервал и передаёт его обработчикам"""
+    with spans_lock:
+        spans.append(record)
+    for listener in span_listeners:
+        listener(record)
+
+
+def record_span(phase, pkg_id, start, returncode=None):
+    """Интервал, измеренный вне span() (например, пакет внутри общего процесса winget import)"""
+    add_span({
+        "phase": phase,
+        "pkg_id": pkg_id,
+        "start": start,
+        "duration": time.perf_counter() - start,
+        "returncode": returncode,
+        "timeout": False,
+        "thread": threading.get_ident(),
+    })
+
+
+def traced_run(args, phase, pkg_id=None, **kwargs):
+    """subprocess.run внутри интервала трассировки"""
+    with span(phase, pkg_id) as record:
+        result = subprocess.run(args, **kwargs)
+        record["returncode"] = result.returncode
+        return result
+
+
+def traced_check_output(args, phase, pkg_id=None, **kwargs):
+    """subprocess.check_output внутри интервала трассировки"""
+    with span(phase, pkg_id) as record:
+        try:
+            output = subprocess.check_output(args, **kwargs)
+        except subprocess.CalledProcessError as e:
+            record["returncode"] = e.returncode
+            raise
+        record["returncode"] = 0
+        return output
+
+
+def get_spans(since=None):
+    """Копия интервалов (начиная с момента since по perf_counter)"""
+    with spans_lock:
+        items = list(spans)
+    if since is not None:
+        items = [item for item in items if item["start"] >= since]
+    return items
+
+
+def export_jsonl(path, since=None):
+    """Интервалы построчно в JSON"""
+    with open(path, "w", encoding="utf-8") as f:
+        for item in get_spans(since):
+            f.write(json.dumps({
+                **item,
+                "start": item["start"] - TRACE_STARTED,
+            }, ensure_ascii=False) + "\n")
+
+
+def export_chrome_trace(path, since=None):
+    """Интервалы в формате Chrome trace-event (события "X")"""
+    pid = os.getpid()
+    events = []
+    for item in get_spans(since):
+        name = item["phase"] if not item["pkg_id"] else f"{item['phase']} {item['pkg_id']}"
+        events.append({
+            "name": name,
+            "cat": item["phase"],
+            "ph": "X",
+            "ts": (item["start"] - TRACE_STARTED) * 1e6,
+            "dur": item["duration"] * 1e6,
+            "pid": pid,
+            "tid": item["thread"],
+            "args": {
+                "pkg_id": item["pkg_id"],
+                "returncode": item["returncode"],
+                "timeout": item["timeout"],
+            },
+        })
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+
+
+def export_trace(path, since=None):
+    """Экспорт по расширению: .jsonl - построчный JSON, иначе Chrome trace"""
+    if path.endswith(".jsonl"):
+        export_jsonl(path, since)
+    else:
+        export_chrome_trace(path, since)
+
+
+def summary_table(since=None, limit=10):
+    """Текстовая сводка: самые медленные пакеты и фазы"""
+    items = get_spans(since)
+    if not items:
+        return "Трассировка: интервалов нет"
+
+    by_package = {}
+    by_phase = {}
+    for item in items:
+        if item["pkg_id"]:
+            by_package[item["pkg_id"]] = by_package.get(item["pkg_id"], 0.0) + item["duration"]
+        by_phase.setdefault(item["phase"], []).append(item)
+
+    lines = [f"{'Фаза':<28} {'вызовов':>8} {'всего, мс':>10} {'макс, мс':>9} {'таймаутов':>10}"]
+    phases = sorted(by_phase.items(), key=lambda kv: -sum(i["duration"] for i in kv[1]))
+    for phase, phase_items in phases[:limit]:
+        total = sum(i["duration"] for i in phase_items) * 1000
+        longest = max(i["duration"] for i in phase_items) * 1000
+        timeouts = sum(1 for i in phase_items if i["timeout"])
+        lines.append(f"{phase:<28} {len(phase_items):>8} {total:>10.0f} {longest:>9.0f} {timeouts:>10}")
+
+    if by_package:
+        lines.append("")
+        lines.append(f"{'Самые медленные пакеты':<40} {'всего, мс':>10}")
+        for pkg_id, total in sorted(by_package.items(), key=lambda kv: -kv[1])[:limit]:
+            lines.append(f"{pkg_id:<40} {total * 1000:>10.0f}")
+
+    return "\n".join(lines)
@@ -1,521 +1,52 @@
-import subprocess
-import shutil
-import os
-import platform
-import re
-import logging
-import tkinter as tk
-from tkinter import ttk, messagebox
-import json
-import urllib.request
-import urllib.error
-import threading
+import sys
 import time
-import ctypes
-import ipaddress
-
-# ===================== ЛОГ =====================
-
-logging.basicConfig(
-    filename="installer.log",
-    level=logging.INFO,
-    format="%(asctime)s | %(levelname)s | %(message)s"
-)
-
-def log(msg):
-    logging.info(msg)
-
-# Настройки GitHub
-GITHUB_REPO = "Vvyiloff/Post-Install"  # Ваш репозиторий
-GITHUB_RAW_URL = f"https://raw.githubusercontent.com/{GITHUB_REPO}/main/packages.json"
-LOCAL_PACKAGES_FILE = "packages.json"
-
-# Настройки DNS
-DNS1 = "176.99.11.77"
-DNS2 = "80.78.247.254"
-DOH_TEMPLATE = "https://xbox-dns.ru/dns-query"
-
-# Иконки для программ (emoji)
-PROGRAM_ICONS = {
-    "Steam": "🎮",
-    "Epic Games Launcher": "🎯",
-    "Ubisoft Connect": "🛡️",
-    "VALORANT (EU)": "⚔️",
-    "Visual Studio Code": "💻",
-    "Git": "🔀",
-    "Cursor": "✏️",
-    "Termius": "🖥️",
-    "Unity Hub": "🎨",
-    "Google Chrome": "🌐",
-    "Telegram": "💬",
-    "7-Zip": "📦",
-    "VLC": "🎬",
-    "Paint.NET": "🎨",
-    "Yandex.Disk": "☁️",
-    "OBS Studio": "📹",
-    "Discord": "🎧",
-    "Spotify": "🎵",
-    "Blender": "🎭",
-    "GIMP": "🖌️"
-}
-
-# Цвета для категорий
-CATEGORY_COLORS = {
-    "Игры": "#e74c3c",
-    "Разработка": "#3498db",
-    "Базовый софт": "#27ae60",
-    "Стриминг": "#9b59b6",
-    "Коммуникация": "#f39c12",
-    "Музыка": "#e91e63",
-    "3D-графика": "#607d8b",
-    "Графика": "#795548"
-}
-
-valorant_installed = False
-needs_reboot = False
-update_available = False
-update_checking = False
 
-def is_admin():
-    """Проверка прав администратора"""
-    try:
-        return ctypes.windll.shell32.IsUserAnAdmin()
-    except:
-        return False
-
-def validate_package(pkg):
-    """Валидация структуры пакета"""
-    required_fields = ["name", "id", "group"]
-    for field in required_fields:
-        if field not in pkg:
-            log(f"Пакет не содержит обязательное поле '{field}': {pkg}")
-            return False
-        if not isinstance(pkg[field], str) or not pkg[field].strip():
-            log(f"Поле '{field}' пакета пустое или не является строкой: {pkg}")
-            return False
-
-    # Валидация ID пакета (должен содержать точку для разделения publisher.app)
-    if "." not in pkg["id"]:
-        log(f"Неверный формат ID пакета: {pkg['id']}")
-        return False
-
-    return True
-
-def validate_packages_list(packages):
-    """Валидация списка пакетов"""
-    if not isinstance(packages, list):
-        log("Список пакетов не является массивом")
-        return False
-
-    if not packages:
-        log("Список пакетов пуст")
-        return False
-
-    valid_packages = []
-    for pkg in packages:
-        if validate_package(pkg):
-            valid_packages.append(pkg)
-        else:
-            log(f"Пропускаем некорректный пакет: {pkg}")
-
-    if not valid_packages:
-        log("Нет корректных пакетов в списке")
-        return False
+# Отсчёт метрики "время до интерактивного списка"
+STARTUP_STARTED = time.perf_counter()
 
-    return valid_packages
-
-def validate_dns_address(address):
-    """Валидация DNS адреса"""
-    try:
-        ipaddress.ip_address(address)
-        return True
-    except ValueError:
-        return False
-
-def validate_dns_config():
-    """Валидация DNS конфигурации"""
-    if not validate_dns_address(DNS1):
-        log(f"Неверный первичный DNS адрес: {DNS1}")
-        return False
-    if not validate_dns_address(DNS2):
-        log(f"Неверный вторичный DNS адрес: {DNS2}")
-        return False
-    return True
-
-# ===================== ПАКЕТЫ =====================
-
-PACKAGES = [
-    # Игры
-    {"name": "Steam", "id": "Valve.Steam", "group": "Игры"},
-    {"name": "Epic Games Launcher", "id": "EpicGames.EpicGamesLauncher", "group": "Игры"},
-    {"name": "Ubisoft Connect", "id": "Ubisoft.Connect", "group": "Игры"},
-    {"name": "VALORANT (EU)", "id": "RiotGames.Valorant.EU", "group": "Игры", "reboot": True, "special": "valorant"},
-
-    # Разработка
-    {"name": "Visual Studio Code", "id": "Microsoft.VisualStudioCode", "group": "Разработка"},
-    {"name": "Git", "id": "Git.Git", "group": "Разработка"},
-    {"name": "Cursor", "id": "Anysphere.Cursor", "group": "Разработка"},
-    {"name": "Termius", "id": "Termius.Termius", "group": "Разработка"},
-    {"name": "Unity Hub", "id": "Unity.UnityHub", "group": "Разработка"},
-
-    # Базовый софт
-    {"name": "Google Chrome", "id": "Google.Chrome", "group": "Базовый софт"},
-    {"name": "Telegram", "id": "Telegram.TelegramDesktop", "group": "Базовый софт"},
-    {"name": "7-Zip", "id": "7zip.7zip", "group": "Базовый софт"},
-    {"name": "VLC", "id": "VideoLAN.VLC", "group": "Базовый софт"},
-    {"name": "Paint.NET", "id": "dotPDN.PaintDotNet", "group": "Базовый софт"},
-]
+# Консольный режим: при наличии аргументов работаем без Tk
+if __name__ == "__main__" and len(sys.argv) > 1:
+    from installer_cli import main
+    sys.exit(main())
 
-# ===================== WINGET =====================
-
-def winget_exists(pkg_id):
-    try:
-        return subprocess.run(
-            ["winget", "show", "--id", pkg_id, "-e"],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            timeout=30
-        ).returncode == 0
-    except subprocess.TimeoutExpired:
-        log(f"Таймаут проверки пакета {pkg_id}")
-        return False
-    except FileNotFoundError:
-        log("winget не найден")
-        return False
-    except Exception as e:
-        log(f"Ошибка проверки пакета {pkg_id}: {e}")
-        return False
-
-def is_installed(pkg_id):
-    try:
-        return subprocess.run(
-            ["winget", "list", "--id", pkg_id, "-e"],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            timeout=30
-        ).returncode == 0
-    except subprocess.TimeoutExpired:
-        log(f"Таймаут проверки установки {pkg_id}")
-        return False
-    except FileNotFoundError:
-        log("winget не найден")
-        return False
-    except Exception as e:
-        log(f"Ошибка проверки установки {pkg_id}: {e}")
-        return False
-
-def uninstall_package(pkg_id):
-    try:
-        result = subprocess.run(
-            ["winget", "uninstall", "--id", pkg_id, "-e", "--silent"],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            timeout=60
-        )
-        return result.returncode == 0
-    except subprocess.TimeoutExpired:
-        log(f"Таймаут удаления {pkg_id}")
-        return False
-    except FileNotFoundError:
-        log("winget не найден")
-        return False
-    except Exception as e:
-        log(f"Ошибка удаления {pkg_id}: {e}")
-        return False
+import queue
+import subprocess
+import shutil
+import threading
+import tkinter as tk
+from concurrent.futures import Future
+from tkinter import ttk, messagebox
 
-def get_installed_packages():
-    """Returns empty list to avoid laggy detection"""
-    return []
+import installer_core as core
+import installer_trace as trace
+from installer_core import log, is_admin
 
 # ===================== DNS =====================
 
-def is_windows_11():
-    return platform.release() == "10" and int(platform.version().split(".")[2]) >= 22000
-
-def get_active_interface():
-    try:
-        # Сначала попробуем получить интерфейс через ipconfig
-        out = subprocess.check_output(
-            ["ipconfig"],
-            encoding="cp866",  # Windows использует cp866 для кириллицы
-            errors="replace"
-        )
-
-        # Ищем адаптеры с IPv4 адресом (обычно это активные)
-        lines = out.splitlines()
-        current_adapter = None
-
-        for line in lines:
-            line = line.strip()
-            if line.startswith("Адаптер") or line.startswith("Adapter"):
-                current_adapter = line.split(":")[0].replace("Адаптер", "").replace("Adapter", "").strip()
-            elif current_adapter and ("IPv4" in line or "IP Address" in line or "IP-адрес" in line):
-                # Нашли активный интерфейс с IP
-                return current_adapter
-
-        # Если ipconfig не помог, используем netsh
-        out = subprocess.check_output(
-            ["netsh", "interface", "show", "interface"],
-            encoding="utf-8",
-            errors="replace"
-        )
-
-        for line in out.splitlines():
-            if "Connected" in line and ("Dedicated" in line or "Internal" in line):
-                parts = re.split(r"\s{2,}", line.strip())
-                if len(parts) >= 4:
-                    interface_name = parts[-1]
-                    # Проверяем что это не loopback или отключенный интерфейс
-                    if not any(x in interface_name.lower() for x in ["loopback", "disconnected", "отключен"]):
-                        return interface_name
-
-        return None
-    except subprocess.CalledProcessError as e:
-        log(f"Ошибка получения интерфейса: {e}")
-        return None
-    except Exception as e:
-        log(f"Неожиданная ошибка при получении интерфейса: {e}")
-        return None
-
 def check_dns():
-    iface = get_active_interface()
-    if not iface:
-        messagebox.showerror("DNS", "Активный интерфейс не найден")
-        return
-
-    try:
-        dns_info = subprocess.check_output(
-            ["netsh", "interface", "ip", "show", "dns", f'name="{iface}"'],
-            encoding="utf-8",
-            errors="replace"
-        )
-    except subprocess.CalledProcessError as e:
-        messagebox.showerror("DNS", f"Ошибка проверки DNS: {e}")
-        return
-    except Exception as e:
-        messagebox.showerror("DNS", f"Неожиданная ошибка: {e}")
-        return
-
-    doh = "Неизвестно"
-    if is_windows_11():
-        try:
-            subprocess.check_output(
-                ["reg", "query", r"HKLM\SYSTEM\CurrentControlSet\Services\Dnscache\Parameters\DohWellKnownServers"],
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL
-            )
-            doh = "Включён"
-        except subprocess.CalledProcessError:
-            doh = "Выключен"
-        except Exception as e:
-            log(f"Ошибка проверки DoH: {e}")
-            doh = "Ошибка проверки"
-
-    messagebox.showinfo(
-        "Проверка DNS",
-        f"Интерфейс: {iface}\n\n{dns_info}\nDNS over HTTPS: {doh}"
-    )
+    ok, message = core.check_dns()
+    if ok:
+        messagebox.showinfo("Проверка DNS", message)
+    else:
+        messagebox.showerror("DNS", message)
 
 def set_dns():
-    if not is_admin():
-        messagebox.showerror("DNS", "Для настройки DNS требуются права администратора")
-        return
-
-    if not validate_dns_config():
-        messagebox.showerror("DNS", "Некорректная конфигурация DNS")
-        return
-
-    iface = get_active_interface()
-    if not iface:
-        messagebox.showerror("DNS", "Интерфейс не найден")
-        return
-
-    try:
-        log("DNS SET")
-        # Установка первичного DNS
-        result1 = subprocess.run(
-            ["netsh", "interface", "ip", "set", "dns", f'name="{iface}"', "static", DNS1],
-            capture_output=True,
-            text=True
-        )
-        if result1.returncode != 0:
-            messagebox.showerror("DNS", f"Ошибка установки первичного DNS: {result1.stderr}")
-            return
-
-        # Установка вторичного DNS
-        result2 = subprocess.run(
-            ["netsh", "interface", "ip", "add", "dns", f'name="{iface}"', DNS2, "index=2"],
-            capture_output=True,
-            text=True
-        )
-        if result2.returncode != 0:
-            messagebox.showerror("DNS", f"Ошибка установки вторичного DNS: {result2.stderr}")
-            return
-
-        if is_windows_11():
-            for dns in (DNS1, DNS2):
-                # Настройка DoH Template
-                result3 = subprocess.run([
-                    "reg", "add",
-                    f"HKLM\\SYSTEM\\CurrentControlSet\\Services\\Dnscache\\Parameters\\DohWellKnownServers\\{dns}",
-                    "/v", "Template", "/t", "REG_SZ", "/d", DOH_TEMPLATE, "/f"
-                ], capture_output=True, text=True)
-
-                # Настройка AutoUpgrade
-                result4 = subprocess.run([
-                    "reg", "add",
-                    f"HKLM\\SYSTEM\\CurrentControlSet\\Services\\Dnscache\\Parameters\\DohWellKnownServers\\{dns}",
-                    "/v", "AutoUpgrade", "/t", "REG_DWORD", "/d", "2", "/f"
-                ], capture_output=True, text=True)
-
-                if result3.returncode != 0 or result4.returncode != 0:
-                    log(f"Ошибка настройки DoH для {dns}")
-
-        messagebox.showinfo("DNS", "DNS настроен")
-
-    except Exception as e:
-        log(f"Ошибка настройки DNS: {e}")
-        messagebox.showerror("DNS", f"Ошибка настройки DNS: {str(e)}")
+    ok, message = core.set_dns()
+    if ok:
+        messagebox.showinfo("DNS", message)
+    else:
+        messagebox.showerror("DNS", message)
 
 def rollback_dns():
-    if not is_admin():
-        messagebox.showerror("DNS", "Для отката DNS требуются права администратора")
-        return
-
-    iface = get_active_interface()
-    if not iface:
-        messagebox.showerror("DNS", "Интерфейс не найден")
-        return
-
-    try:
-        log("DNS ROLLBACK")
-        # Возврат к DHCP
-        result = subprocess.run(
-            ["netsh", "interface", "ip", "set", "dns", f'name="{iface}"', "dhcp"],
-            capture_output=True,
-            text=True
-        )
-        if result.returncode != 0:
-            messagebox.showerror("DNS", f"Ошибка отката DNS: {result.stderr}")
-            return
-
-        if is_windows_11():
-            # Удаление настроек DoH
-            subprocess.run([
-                "reg", "delete",
-                r"HKLM\SYSTEM\CurrentControlSet\Services\Dnscache\Parameters\DohWellKnownServers",
-                "/f"
-            ], capture_output=True)  # Игнорируем ошибки, если ключ не существует
-
-        messagebox.showinfo("DNS", "DNS возвращён в авто")
-
-    except Exception as e:
-        log(f"Ошибка отката DNS: {e}")
-        messagebox.showerror("DNS", f"Ошибка отката DNS: {str(e)}")
-
-# ===================== GITHUB =====================
-
-def load_packages_from_github():
-    """Загружает список пакетов из GitHub (оптимизированная версия)"""
-    global PACKAGES, update_available
+    ok, message = core.rollback_dns()
+    if ok:
+        messagebox.showinfo("DNS", message)
+    else:
+        messagebox.showerror("DNS", message)
 
-    try:
-        # Быстрая загрузка с GitHub с коротким таймаутом
-        req = urllib.request.Request(GITHUB_RAW_URL)
-        req.add_header('Cache-Control', 'no-cache')
-        req.add_header('Pragma', 'no-cache')
-
-        # Используем короткий таймаут для быстрого отклика
-        with urllib.request.urlopen(req, timeout=5) as response:
-            data = response.read()
-
-        # Быстрое декодирование и парсинг
-        github_packages = json.loads(data.decode('utf-8'))
-
-        # Валидация загруженных пакетов
-        validated_packages = validate_packages_list(github_packages)
-        if not validated_packages:
-            log("Загруженные с GitHub пакеты не прошли валидацию")
-            update_available = False
-            return None
-
-        # Быстрое сравнение только по длине и хэшу
-        if len(validated_packages) != len(PACKAGES):
-            update_available = True
-            return validated_packages
-
-        # Проверяем только если количество совпадает
-        for i, pkg in enumerate(validated_packages):
-            if pkg != PACKAGES[i]:
-                update_available = True
-                return validated_packages
-
-        update_available = False
-        return None
-
-    except urllib.error.URLError as e:
-        log(f"Ошибка сети при загрузке с GitHub: {e}")
-        update_available = False
-        return None
-    except json.JSONDecodeError as e:
-        log(f"Ошибка парсинга JSON с GitHub: {e}")
-        update_available = False
-        return None
-    except ValueError as e:
-        log(f"Ошибка валидации данных с GitHub: {e}")
-        update_available = False
-        return None
-    except Exception as e:
-        log(f"Неожиданная ошибка загрузки с GitHub: {e}")
-        update_available = False
-        return None
+# ===================== ОБНОВЛЕНИЯ =====================
 
-def save_packages_to_file(packages):
-    """Сохраняет список пакетов в локальный файл"""
-    try:
-        with open(LOCAL_PACKAGES_FILE, 'w', encoding='utf-8') as f:
-            json.dump(packages, f, ensure_ascii=False, indent=2)
-        log(f"Пакеты сохранены в {LOCAL_PACKAGES_FILE}")
-        return True
-    except PermissionError:
-        log(f"Нет прав на запись в {LOCAL_PACKAGES_FILE}")
-        return False
-    except OSError as e:
-        log(f"Ошибка файловой системы при сохранении пакетов: {e}")
-        return False
-    except (TypeError, ValueError) as e:
-        log(f"Ошибка сериализации пакетов: {e}")
-        return False
-    except Exception as e:
-        log(f"Неожиданная ошибка сохранения пакетов: {e}")
-        return False
-
-def load_packages_from_file():
-    """Загружает список пакетов из локального файла"""
-    try:
-        if os.path.exists(LOCAL_PACKAGES_FILE):
-            with open(LOCAL_PACKAGES_FILE, 'r', encoding='utf-8') as f:
-                packages = json.load(f)
-
-            # Валидация загруженных пакетов
-            validated_packages = validate_packages_list(packages)
-            if validated_packages:
-                log(f"Пакеты загружены из {LOCAL_PACKAGES_FILE}")
-                return validated_packages
-            else:
-                log(f"Пакеты из {LOCAL_PACKAGES_FILE} не прошли валидацию")
-                return None
-    except FileNotFoundError:
-        log(f"Файл {LOCAL_PACKAGES_FILE} не найден")
-    except PermissionError:
-        log(f"Нет прав на чтение {LOCAL_PACKAGES_FILE}")
-    except OSError as e:
-        log(f"Ошибка файловой системы при загрузке пакетов: {e}")
-    except (json.JSONDecodeError, ValueError) as e:
-        log(f"Ошибка парсинга JSON в {LOCAL_PACKAGES_FILE}: {e}")
-    except Exception as e:
-        log(f"Неожиданная ошибка загрузки локальных пакетов: {e}")
-    return None
+update_checking = False
 
 def check_for_updates():
     """Проверяет наличие обновлений в фоновом режиме"""
@@ -527,20 +58,23 @@ def check_for_updates():
     update_checking = True
 
     def update_check_thread():
-        global PACKAGES, update_checking
+        global update_checking
         try:
-            github_packages = load_packages_from_github()
+            # Полная проверка: все шарды (или монолитный packages.json)
+            # Локальную копию load_remote_packages уже сохранил: ответ сервера как есть
+            # (он соответствует сохранённым ETag/Last-Modified) или собранные шарды
+            github_packages = core.load_remote_packages()
             if github_packages:
-                # Сохраняем новые пакеты в файл
-                if save_packages_to_file(github_packages):
-                    # Предлагаем пользователю обновить (в главном потоке)
-                    def ask_update():
-                        if messagebox.askyesno("Обновление доступно",
-                                             "Доступна новая версия списка программ. Обновить?"):
-                            PACKAGES = github_packages
-                            refresh_software_list()
-                            messagebox.showinfo("Обновлено", "Список программ обновлён!")
-                    root.after(0, ask_update)
+                # Предлагаем пользователю обновить (в главном потоке)
+                def ask_update():
+                    diff = core.diff_catalogs(core.PACKAGES, github_packages)
+                    if messagebox.askyesno("Обновление доступно",
+                                         "Доступна новая версия списка программ "
+                                         f"(добавлено: {len(diff['added'])}, удалено: {len(diff['removed'])}, "
+                                         f"изменено: {len(diff['changed'])}). Обновить?"):
+                        apply_remote_packages(github_packages)
+                        messagebox.showinfo("Обновлено", "Список программ обновлён!")
+                ui_call(ask_update)
         except Exception as e:
             log(f"Ошибка проверки обновлений: {e}")
         finally:
@@ -712,28 +246,73 @@ def create_tooltip(widget, text):
     widget.bind("<Leave>", hide_tooltip)
 
 install_all_var = tk.BooleanVar()
+bulk_var = tk.BooleanVar(value=False)
 progress = tk.DoubleVar()
 status_text = tk.StringVar()
 status_text.set("Готово к установке")
 search_var = tk.StringVar()
 filter_var = tk.StringVar(value="Все")
 
-items = []
+# Модель выбора хранится отдельно от виджетов: строки списка переиспользуются
+selected_ids = set()
+visible_packages = []
 installing = False  # Флаг для предотвращения множественных установок
 
+# Виртуальный список: рисуются только видимые строки из пула виджетов
+ROW_HEIGHT = 86
+row_pool = []
+scroll_top = 0
+
 def toggle_install_all():
-    for item in items:
-        item["var"].set(install_all_var.get())
+    ids = {pkg.id for pkg in visible_packages}
+    if install_all_var.get():
+        selected_ids.update(ids)
+    else:
+        selected_ids.difference_update(ids)
+    render_visible_rows()
+    update_selected_count()
 
 def apply_profile(profile):
-    for item in items:
-        item["var"].set(item["pkg"]["group"] == profile)
+    selected_ids.clear()
+    selected_ids.update(pkg.id for pkg in core.group_packages(profile))
+    render_visible_rows()
+    update_selected_count()
+    # Профиль целиком - установщики загружаются заранее на полной скорости
+    core.prefetch_packages(core.group_packages(profile), speculative=False)
+    ensure_group_loaded(profile, select=True)
+
+def selected_filter_groups():
+    """Группы, нужные текущему фильтру (None - все)"""
+    filter_category = filter_var.get()
+    return None if filter_category == "Все" else {filter_category}
+
+def ensure_group_loaded(group, select=False):
+    """Подгружает шард категории в фоне, если он ещё не загружен в этом сеансе"""
+    if core.catalog_index_missing or group in core.loaded_shard_groups:
+        return
+
+    def shard_thread():
+        try:
+            packages = core.load_remote_packages({group})
+            if not packages:
+                return
+
+            def apply():
+                apply_remote_packages(packages)
+                if select:
+                    selected_ids.update(pkg.id for pkg in core.group_packages(group))
+                    render_visible_rows()
+                    update_selected_count()
+                    core.prefetch_packages(core.group_packages(group), speculative=False)
+            ui_call(apply)
+        except Exception as e:
+            log(f"Ошибка загрузки категории {group}: {e}")
+
+    threading.Thread(target=shard_thread, daemon=True).start()
 
-def create_program_card(parent, pkg):
-    """Создает красивую карточку для программы"""
-    # Создаем фрейм карточки
+def create_program_row(parent):
+    """Создает переиспользуемую строку-карточку (без привязки к программе)"""
     card = ttk.Frame(parent, style="Card.TFrame", padding=10)
-    card.pack(fill="x", pady=3, padx=5)
 
     # Основной контейнер
     main_frame = ttk.Frame(card, style="Card.TFrame")
@@ -743,191 +322,298 @@ def create_program_card(parent, pkg):
     left_frame = ttk.Frame(main_frame, style="Card.TFrame")
     left_frame.pack(side="left")
 
-    # Переменная чекбокса
-    var = tk.BooleanVar()
+    row = {"card": card, "pkg": None, "var": tk.BooleanVar()}
 
-    # Чекбокс
-    checkbox = ttk.Checkbutton(left_frame, variable=var, style="TCheckbutton")
+    # Чекбокс пишет в модель выбора, а не хранит состояние сам
+    checkbox = ttk.Checkbutton(left_frame, variable=row["var"], style="TCheckbutton",
+                               command=lambda: toggle_row(row))
     checkbox.pack(side="left", padx=(0, 10))
 
     # Иконка программы
-    icon_text = PROGRAM_ICONS.get(pkg["name"], "📦")
-    icon_label = ttk.Label(left_frame, text=icon_text, font=("Segoe UI", 20), background="#f8f9fa")
-    icon_label.pack(side="left", padx=(0, 10))
+    row["icon"] = ttk.Label(left_frame, font=("Segoe UI", 20), background="#f8f9fa")
+    row["icon"].pack(side="left", padx=(0, 10))
 
     # Правая часть - информация
     right_frame = ttk.Frame(main_frame, style="Card.TFrame")
     right_frame.pack(side="left", fill="x", expand=True)
 
     # Название программы
-    title_label = ttk.Label(right_frame, text=pkg["name"], style="CardTitle.TLabel")
-    title_label.pack(anchor="w")
+    row["title"] = ttk.Label(right_frame, style="CardTitle.TLabel")
+    row["title"].pack(anchor="w")
 
     # Категория с цветом
-    category_color = CATEGORY_COLORS.get(pkg["group"], "#6c757d")
-    category_label = ttk.Label(right_frame,
-                              text=f"🏷️ {pkg['group']}",
-                              style="CardDesc.TLabel",
-                              foreground=category_color)
-    category_label.pack(anchor="w")
+    row["category"] = ttk.Label(right_frame, style="CardDesc.TLabel")
+    row["category"].pack(anchor="w")
 
     # ID программы (маленький шрифт)
-    id_label = ttk.Label(right_frame,
-                        text=f"ID: {pkg['id']}",
-                        style="CardDesc.TLabel",
-                        font=("Segoe UI", 7))
-    id_label.pack(anchor="w")
-
-    # Индикатор перезагрузки если нужен
-    if pkg.get("reboot"):
-        reboot_label = ttk.Label(right_frame,
-                                text="🔄 Требуется перезагрузка",
-                                style="CardDesc.TLabel",
-                                foreground="#e74c3c",
-                                font=("Segoe UI", 8, "bold"))
-        reboot_label.pack(anchor="w")
-
-    return {"pkg": pkg, "var": var, "card": card}
-
-def refresh_software_list():
-    """Обновляет список программ с красивыми карточками"""
-    # Clear existing cards
-    for widget in box.winfo_children():
-        widget.destroy()
-
-    items.clear()
-
-    # Get search query and filter
-    search_query = search_var.get().lower()
-    filter_category = filter_var.get()
+    row["id"] = ttk.Label(right_frame, style="CardDesc.TLabel", font=("Segoe UI", 7))
+    row["id"].pack(anchor="w")
 
-    # Счетчик найденных программ
-    found_count = 0
+    # Отметка об установке и индикатор перезагрузки
+    row["extra"] = ttk.Label(right_frame, style="CardDesc.TLabel", font=("Segoe UI", 8, "bold"))
+    row["extra"].pack(anchor="w")
 
-    for pkg in PACKAGES:
-        # Apply category filter
-        if filter_category != "Все" and pkg["group"] != filter_category:
-            continue
+    return row
 
-        # Apply search filter
-        if search_query and search_query not in pkg["name"].lower():
-            continue
+def bind_program_row(row, pkg):
+    """Показывает программу в строке из пула"""
+    row["var"].set(pkg.id in selected_ids)
+    if row["pkg"] is pkg:
+        return
+    row["pkg"] = pkg
+
+    row["icon"].config(text=pkg.icon)
+    row["title"].config(text=pkg.name)
+    row["category"].config(text=f"🏷️ {pkg.group}",
+                           foreground=pkg.color)
+    row["id"].config(text=f"ID: {pkg.id}")
+
+    # Отметка об установке (по индексу, без запуска winget)
+    installed_version = core.installed_version(pkg.id)
+    if pkg.reboot:
+        row["extra"].config(text="🔄 Требуется перезагрузка", foreground="#e74c3c")
+    elif installed_version is not None:
+        row["extra"].config(text=f"✅ Установлено {installed_version}".strip(), foreground="#27ae60")
+    else:
+        row["extra"].config(text="")
+
+def toggle_row(row):
+    if row["pkg"] is None:
+        return
+    if row["var"].get():
+        selected_ids.add(row["pkg"].id)
+        # Отмеченная программа скорее всего будет установлена - загружаем установщик в фоне
+        core.prefetch_packages([row["pkg"]])
+    else:
+        selected_ids.discard(row["pkg"].id)
+    update_selected_count()
 
-        # Создаем карточку
-        item = create_program_card(box, pkg)
-        items.append(item)
-        found_count += 1
+def render_visible_rows():
+    """Раскладывает строки пула по видимой области списка"""
+    global scroll_top
 
-    # Обновляем информацию о количестве
-    if search_query or filter_category != "Все":
-        info_label.config(text=f"Найдено: {found_count} программ")
+    height = box.winfo_height()
+    if height <= 1:
+        return
+
+    total_height = len(visible_packages) * ROW_HEIGHT
+    scroll_top = max(0, min(scroll_top, total_height - height))
+
+    # Пул растёт только до размера видимой области
+    needed = height // ROW_HEIGHT + 2
+    while len(row_pool) < needed:
+        row_pool.append(create_program_row(box))
+
+    first = scroll_top // ROW_HEIGHT
+    offset = scroll_top % ROW_HEIGHT
+    for slot, row in enumerate(row_pool):
+        index = first + slot
+        if slot < needed and index < len(visible_packages):
+            bind_program_row(row, visible_packages[index])
+            row["card"].place(x=0, y=slot * ROW_HEIGHT - offset,
+                              relwidth=1, height=ROW_HEIGHT - 6)
+        else:
+            row["card"].place_forget()
+
+    if total_height > 0:
+        list_scrollbar.set(scroll_top / total_height, min(1.0, (scroll_top + height) / total_height))
     else:
-        info_label.config(text=f"Всего доступно: {len(PACKAGES)} программ")
+        list_scrollbar.set(0, 1)
+
+def scroll_software_list(*args):
+    """Обработчик полосы прокрутки (moveto / scroll)"""
+    global scroll_top
+    total_height = len(visible_packages) * ROW_HEIGHT
+    if args[0] == "moveto":
+        scroll_top = int(float(args[1]) * total_height)
+    elif args[0] == "scroll":
+        step = box.winfo_height() if args[2] == "pages" else ROW_HEIGHT
+        scroll_top += int(args[1]) * step
+    render_visible_rows()
+
+def on_list_mousewheel(event):
+    """Прокрутка колесом мыши, когда курсор над списком"""
+    global scroll_top
+    widget = root.winfo_containing(event.x_root, event.y_root)
+    if widget is None or not str(widget).startswith(str(box)):
+        return
+    scroll_top -= (event.delta // 120) * ROW_HEIGHT
+    render_visible_rows()
+
+def refresh_software_list(keep_scroll=False, rebind=True):
+    """Обновляет видимый набор программ без пересоздания виджетов"""
+    global scroll_top
+
+    with trace.span("ui refresh"):
+        # Get search query and filter
+        search_query = search_var.get().strip()
+        filter_category = filter_var.get()
+
+        # Ранжированный поиск по индексу (имя, id, группа, транслитерация)
+        group = None if filter_category == "Все" else filter_category
+        visible_packages[:] = core.search_packages(search_query, group)
+        # Перепривязка всех строк (например, после обновления индекса установленных).
+        # Без неё перерисовываются только строки с другим объектом пакета
+        if rebind:
+            for row in row_pool:
+                row["pkg"] = None
+        if not keep_scroll:
+            scroll_top = 0
+
+        # Обновляем информацию о количестве
+        found_count = len(visible_packages)
+        if search_query or filter_category != "Все":
+            info_label.config(text=f"Найдено: {found_count} программ")
+        else:
+            info_label.config(text=f"Всего доступно: {len(core.PACKAGES)} программ")
 
-    # Если ничего не найдено, показываем сообщение
-    if found_count == 0:
-        no_results = ttk.Label(box,
-                              text="🔍 Программы не найдены\nПопробуйте изменить фильтры или поисковый запрос",
-                              style="CardDesc.TLabel",
-                              font=("Segoe UI", 12),
-                              justify="center")
-        no_results.pack(pady=40)
+        # Если ничего не найдено, показываем сообщение
+        if found_count == 0:
+            no_results.place(relx=0.5, y=40, anchor="n")
+        else:
+            no_results.place_forget()
+
+        render_visible_rows()
+
+# ===================== ДИСПЕТЧЕР UI =====================
+
+# Фоновые потоки не трогают виджеты: статус, прогресс и вызовы идут через очередь.
+# Разбор планируется только при появлении записей и повторяется не чаще раза в кадр,
+# пока записи поступают; в простое главный поток ничего не опрашивает
+ui_queue = queue.Queue()
+UI_FRAME_MS = 16
+ui_drain_scheduled = False
+ui_drain_lock = threading.Lock()
+
+def post_ui(item):
+    """Кладёт запись в очередь UI и планирует разбор, если он ещё не запланирован"""
+    global ui_drain_scheduled
+    ui_queue.put(item)
+    with ui_drain_lock:
+        if ui_drain_scheduled:
+            return
+        ui_drain_scheduled = True
+    try:
+        root.after(0, drain_ui_queue)
+    except (RuntimeError, tk.TclError):
+        # Окно уже закрыто
+        pass
+
+def show_status(text):
+    """Статус с иконкой (только из главного потока)"""
+    # Добавляем иконку в зависимости от статуса
+    if "Ошибка" in text:
+        status_text.set(f"❌ {text}")
+    elif "Успешно" in text or "завершена" in text:
+        status_text.set(f"✅ {text}")
+    elif "Установка" in text or "Загрузка" in text:
+        status_text.set(f"⚙️ {text}")
+    elif "Проверка" in text:
+        status_text.set(f"🔍 {text}")
+    else:
+        status_text.set(f"ℹ️ {text}")
 
 def update_status(text):
     """Безопасное обновление статуса из любого потока"""
-    def update_with_animation():
-        # Добавляем иконку в зависимости от статуса
-        if "Ошибка" in text:
-            status_text.set(f"❌ {text}")
-        elif "Успешно" in text or "завершена" in text:
-            status_text.set(f"✅ {text}")
-        elif "Установка" in text or "Загрузка" in text:
-            status_text.set(f"⚙️ {text}")
-        elif "Проверка" in text:
-            status_text.set(f"🔍 {text}")
-        else:
-            status_text.set(f"ℹ️ {text}")
-
-    root.after(0, update_with_animation)
+    post_ui(("status", text))
 
 def update_progress(value):
     """Безопасное обновление прогресса из любого потока"""
-    root.after(0, lambda: progress.set(value))
+    post_ui(("progress", value))
+
+def ui_call(func, *args):
+    """Вызов func в главном потоке в ближайшем кадре, без ожидания результата"""
+    post_ui(("call", func, args, None))
+
+def ui_ask(func, *args):
+    """Вызов func в главном потоке с ожиданием результата (диалоги из фоновых потоков)"""
+    if threading.current_thread() is threading.main_thread():
+        return func(*args)
+    future = Future()
+    post_ui(("call", func, args, future))
+    return future.result()
+
+def drain_ui_queue():
+    """Разбор очереди UI: из накопившихся статусов и прогресса применяется только последний"""
+    global ui_drain_scheduled
+    status = progress_value = None
+    calls = []
+    try:
+        while True:
+            item = ui_queue.get_nowait()
+            if item[0] == "status":
+                status = item[1]
+            elif item[0] == "progress":
+                progress_value = item[1]
+            else:
+                calls.append(item[1:])
+    except queue.Empty:
+        pass
 
-def install_thread(selected_packages):
-    """Функция установки в отдельном потоке"""
-    global valorant_installed, needs_reboot, installing
+    if progress_value is not None:
+        progress.set(progress_value)
+    if status is not None:
+        show_status(status)
+    for func, args, future in calls:
+        try:
+            result = func(*args)
+        except Exception as e:
+            log(f"Ошибка обновления интерфейса: {e}")
+            if future is not None:
+                future.set_exception(e)
+        else:
+            if future is not None:
+                future.set_result(result)
+
+    # Пока идут обновления - следующий разбор через кадр (обновления за кадр склеиваются).
+    # Пустой разбор снимает флаг: следующую запись запланирует post_ui
+    busy = status is not None or progress_value is not None or calls
+    with ui_drain_lock:
+        if not busy and ui_queue.empty():
+            ui_drain_scheduled = False
+            return
+    root.after(UI_FRAME_MS, drain_ui_queue)
+
+def install_thread(selected_packages, journal=None, bulk=False):
+    """Функция установки в отдельном потоке (journal - продолжение прерванной установки,
+    bulk - одним вызовом winget import)"""
+    global installing
 
     try:
         # Проверяем на специальные пакеты требующие перезагрузки
-        reboot_packages = [pkg for pkg in selected_packages if pkg.get("reboot")]
+        reboot_packages = [pkg for pkg in selected_packages if pkg.reboot]
         if reboot_packages:
             def ask_reboot_confirm():
-                names = ", ".join([pkg["name"] for pkg in reboot_packages])
+                names = ", ".join([pkg.name for pkg in reboot_packages])
                 return messagebox.askyesno(
                     "Требуется перезагрузка",
                     f"Следующие программы требуют перезагрузки после установки:\n{names}\n\n"
                     "Продолжить установку?"
                 )
-            # Спрашиваем подтверждение в главном потоке
-            confirmed = [False]
-            def check_confirm():
-                confirmed[0] = ask_reboot_confirm()
-            root.after(0, check_confirm)
-            # Ждем ответа (простая синхронизация)
-            import time
-            time.sleep(0.1)
-            while not confirmed[0]:
-                time.sleep(0.1)
-
-        step = 100 / len(selected_packages)
-        update_progress(0)
-        update_status("Начало установки...")
-
-        for pkg in selected_packages:
-            update_status(f"Проверка: {pkg['name']}")
-
-            if is_installed(pkg["id"]):
-                update_status(f"Уже установлено: {pkg['name']}")
-                update_progress(progress.get() + step)
-                continue
-
-            update_status(f"Установка: {pkg['name']}")
-
-            if winget_exists(pkg["id"]):
-                update_status(f"Загрузка: {pkg['name']}")
-
-                try:
-                    result = subprocess.run([
-                        "winget", "install",
-                        "--id", pkg["id"], "-e",
-                        "--silent",
-                        "--accept-source-agreements",
-                        "--accept-package-agreements"
-                    ], capture_output=True, text=True, timeout=300)  # 5 минут таймаут
-
-                    if result.returncode == 0:
-                        update_status(f"Успешно установлено: {pkg['name']}")
-                        if pkg.get("special") == "valorant":
-                            valorant_installed = True
-                        if pkg.get("reboot"):
-                            needs_reboot = True
-                    else:
-                        update_status(f"Ошибка установки {pkg['name']}: {result.stderr}")
-
-                except subprocess.TimeoutExpired:
-                    update_status(f"Таймаут установки {pkg['name']}")
-                except Exception as e:
-                    update_status(f"Ошибка установки {pkg['name']}: {str(e)}")
-            else:
-                update_status(f"Пакет не найден: {pkg['name']}")
+            # Спрашиваем подтверждение в главном потоке и ждём ответа
+            if not ui_ask(ask_reboot_confirm):
+                update_status("Установка отменена")
+                return
 
-            update_progress(progress.get() + step)
+        update_status("Начало установки...")
+        # Если установку прервёт перезагрузка, она продолжится при следующем входе
+        if journal is not None:
+            core.resume_install(journal, on_status=update_status, on_progress=update_progress,
+                                resume_after_reboot=bool(reboot_packages), bulk=bulk)
+        elif bulk:
+            core.install_packages_bulk(selected_packages, on_status=update_status, on_progress=update_progress,
+                                       resume_after_reboot=bool(reboot_packages))
+        else:
+            core.install_packages(selected_packages, on_status=update_status, on_progress=update_progress,
+                                  resume_after_reboot=bool(reboot_packages))
+        ui_call(refresh_software_list)
 
         # Финализация
-        if needs_reboot:
+        if core.cancel_event.is_set():
+            update_status("Установка отменена")
+        elif core.needs_reboot:
             update_status("Установка завершена. Требуется перезагрузка.")
-            root.after(0, lambda: show_reboot_warning())
+            ui_call(show_reboot_warning)
         else:
             update_status("Установка завершена")
 
@@ -936,11 +622,12 @@ def install_thread(selected_packages):
         update_status(f"Критическая ошибка: {str(e)}")
     finally:
         installing = False
+        ui_call(update_install_button)
 
 def show_reboot_warning():
     """Показать предупреждение о перезагрузке в главном потоке"""
     message = "Программы требующие перезагрузки были установлены."
-    if valorant_installed:
+    if core.valorant_installed:
         message = "VALORANT и другие программы требующие перезагрузки были установлены."
 
     if not is_admin():
@@ -972,15 +659,39 @@ def install_selected():
         messagebox.showwarning("Установка", "Установка уже выполняется")
         return
 
-    selected = [i["pkg"] for i in items if i["var"].get()]
+    selected = [pkg for pkg in core.PACKAGES if pkg.id in selected_ids]
 
     if not selected:
         messagebox.showwarning("Установка", "Ничего не выбрано")
         return
 
     installing = True
+    update_install_button()
     # Запускаем установку в отдельном потоке
-    threading.Thread(target=install_thread, args=(selected,), daemon=True).start()
+    threading.Thread(target=install_thread, args=(selected, None, bulk_var.get()), daemon=True).start()
+
+def offer_resume():
+    """Предлагает продолжить установку, прерванную сбоем или перезагрузкой"""
+    global installing
+    journal = core.load_unfinished_journal()
+    if journal is None or installing:
+        return
+
+    names = ", ".join(pkg.name for pkg in journal["remaining"][:10])
+    if len(journal["remaining"]) > 10:
+        names += "..."
+    if not messagebox.askyesno(
+        "Незавершённая установка",
+        f"Предыдущая установка не была завершена.\n"
+        f"Осталось: {len(journal['remaining'])} из {len(journal['packages'])}"
+        + (f"\n{names}" if names else "") + "\n\nПродолжить?"
+    ):
+        core.journal_finish()
+        return
+
+    installing = True
+    update_install_button()
+    threading.Thread(target=install_thread, args=(journal["remaining"], journal), daemon=True).start()
 
 # ===== ВКЛАДКИ =====
 
@@ -1008,7 +719,7 @@ subtitle_label.pack(anchor="w", pady=(5, 0))
 
 # Информация о количестве программ
 info_label = ttk.Label(header_frame,
-                      text=f"Всего доступно: {len(PACKAGES)} программ",
+                      text=f"Всего доступно: {len(core.PACKAGES)} программ",
                       font=("Segoe UI", 9, "italic"),
                       foreground="#27ae60",
                       background="#f8f9fa")
@@ -1022,26 +733,19 @@ selected_label = ttk.Label(header_frame,
                           background="#f8f9fa")
 selected_label.pack(anchor="w")
 
+# Последнее показанное состояние: виджеты обновляются только при изменении
+shown_selected_count = None
+shown_button_state = None
+
 def update_selected_count():
-    """Обновляет счетчик выбранных программ"""
-    selected_count = sum(1 for item in items if item["var"].get())
+    """Обновляет счетчик выбранных программ (вызывается при изменении выбора)"""
+    global shown_selected_count
+    selected_count = len(selected_ids)
+    if selected_count == shown_selected_count:
+        return
+    shown_selected_count = selected_count
     selected_label.config(text=f"Выбрано: {selected_count} программ")
-
-    # Обновляем текст кнопки установки (если она уже создана)
-    try:
-        if selected_count > 0:
-            install_button.config(text=f"🚀 Установить {selected_count} программ")
-        else:
-            install_button.config(text="🚀 Начать установку")
-    except NameError:
-        # install_button еще не создана, пропускаем
-        pass
-
-    # Повторяем обновление
-    root.after(500, update_selected_count)
-
-# Запускаем обновление счетчика
-update_selected_count()
+    update_install_button()
 
 # Filter frame
 filter_frame = ttk.Frame(tab_soft, style="Card.TFrame", padding=10)
@@ -1057,7 +761,22 @@ search_icon.pack(side="left", padx=(0, 5))
 search_entry = ttk.Entry(search_frame, textvariable=search_var,
                         font=("Segoe UI", 10))
 search_entry.pack(side="left", fill="x", expand=True)
-search_entry.bind("<KeyRelease>", lambda e: refresh_software_list())
+# Поиск с задержкой: список обновляется, когда пользователь перестал печатать
+SEARCH_DEBOUNCE_MS = 150
+search_after_id = None
+
+def schedule_search(event=None):
+    global search_after_id
+    if search_after_id is not None:
+        root.after_cancel(search_after_id)
+    search_after_id = root.after(SEARCH_DEBOUNCE_MS, run_search)
+
+def run_search():
+    global search_after_id
+    search_after_id = None
+    refresh_software_list()
+
+search_entry.bind("<KeyRelease>", schedule_search)
 
 # Фильтр по категориям
 category_frame = ttk.Frame(filter_frame, style="Card.TFrame")
@@ -1072,10 +791,30 @@ filter_combobox = ttk.Combobox(category_frame, textvariable=filter_var,
                               values=categories, state="readonly", width=15,
                               font=("Segoe UI", 10))
 filter_combobox.pack(side="left")
-filter_combobox.bind("<<ComboboxSelected>>", lambda e: refresh_software_list())
+def on_filter_selected(event=None):
+    refresh_software_list()
+    groups = selected_filter_groups()
+    if groups:
+        ensure_group_loaded(next(iter(groups)))
+
+filter_combobox.bind("<<ComboboxSelected>>", on_filter_selected)
+
+list_frame = ttk.Frame(tab_soft)
+list_frame.pack(fill="both", expand=True, padx=10)
+
+list_scrollbar = ttk.Scrollbar(list_frame, orient="vertical", command=scroll_software_list)
+list_scrollbar.pack(side="right", fill="y")
+
+box = ttk.Frame(list_frame)
+box.pack(side="left", fill="both", expand=True)
+box.bind("<Configure>", lambda e: render_visible_rows())
+root.bind_all("<MouseWheel>", on_list_mousewheel)
 
-box = ttk.Frame(tab_soft)
-box.pack(fill="both", expand=True, padx=10)
+no_results = ttk.Label(box,
+                      text="🔍 Программы не найдены\nПопробуйте изменить фильтры или поисковый запрос",
+                      style="CardDesc.TLabel",
+                      font=("Segoe UI", 12),
+                      justify="center")
 
 # Initialize software list
 refresh_software_list()
@@ -1107,20 +846,45 @@ for i, (text, profile, color, tooltip_text) in enumerate(profile_buttons):
                    background=color,
                    foreground="white")
 
-install_button = ttk.Button(tab_soft, text="🚀 Начать установку", command=install_selected, style="Accent.TButton")
-install_button.pack(pady=10)
+install_buttons = ttk.Frame(tab_soft)
+install_buttons.pack(pady=10)
+
+install_button = ttk.Button(install_buttons, text="🚀 Начать установку", command=install_selected, style="Accent.TButton")
+install_button.pack(side="left", padx=5)
 create_tooltip(install_button, "Начать установку выбранных программ")
 
+def cancel_install():
+    """Отмена: очередь останавливается, текущий установщик завершается вместе с дочерними процессами"""
+    cancel_button.config(state="disabled")
+    update_status("Отмена установки...")
+    # taskkill может занять время - не держим главный поток
+    threading.Thread(target=core.cancel_installs, daemon=True).start()
+
+cancel_button = ttk.Button(install_buttons, text="⛔ Отмена", command=cancel_install,
+                           style="Danger.TButton", state="disabled")
+cancel_button.pack(side="left", padx=5)
+create_tooltip(cancel_button, "Прервать установку")
+
+bulk_check = ttk.Checkbutton(install_buttons, text="⚡ Одним winget import", variable=bulk_var)
+bulk_check.pack(side="left", padx=5)
+create_tooltip(bulk_check, "Установить все выбранные программы одним вызовом winget import (без кэша установщиков)")
+
 def update_install_button():
-    """Обновление текста кнопки установки"""
+    """Обновление текста и состояния кнопки установки"""
+    global shown_button_state
     if installing:
-        install_button.config(text="Установка...", state="disabled")
+        state = ("Установка...", "disabled")
+    elif selected_ids:
+        state = (f"🚀 Установить {len(selected_ids)} программ", "normal")
     else:
-        install_button.config(text="Начать установку", state="normal")
-    root.after(1000, update_install_button)  # Проверяем каждую секунду
+        state = ("🚀 Начать установку", "normal")
+    if state == shown_button_state:
+        return
+    shown_button_state = state
+    install_button.config(text=state[0], state=state[1])
+    cancel_button.config(state="normal" if installing else "disabled")
 
-# Запускаем обновление кнопки
-update_install_button()
+update_selected_count()
 
 # Frame for progress and status
 progress_frame = ttk.Frame(tab_soft, style="Card.TFrame", padding=15)
@@ -1181,6 +945,37 @@ update_btn = ttk.Button(tab_sys, text="🔄 Проверить обновлен
 update_btn.pack(pady=5)
 create_tooltip(update_btn, "Проверить наличие обновлений списка программ")
 
+def show_recent_logs():
+    """Окно с последними записями лога (из буфера в памяти, без чтения файла)"""
+    window = tk.Toplevel(root)
+    window.title("Журнал")
+    window.geometry("700x400")
+
+    text = tk.Text(window, wrap="none", font=("Consolas", 9))
+    scrollbar = ttk.Scrollbar(window, orient="vertical", command=text.yview)
+    text.configure(yscrollcommand=scrollbar.set)
+    scrollbar.pack(side="right", fill="y")
+    text.pack(fill="both", expand=True)
+
+    last_line = [None]
+    def refresh_logs():
+        if not window.winfo_exists():
+            return
+        lines = core.get_recent_logs()
+        # Перерисовываем только при появлении новых записей (не больше LOG_BUFFER_SIZE строк)
+        if lines and lines[-1] is not last_line[0]:
+            text.delete("1.0", "end")
+            text.insert("end", "\n".join(lines) + "\n")
+            text.see("end")
+            last_line[0] = lines[-1]
+        window.after(1000, refresh_logs)
+
+    refresh_logs()
+
+logs_btn = ttk.Button(tab_sys, text="📋 Журнал", command=show_recent_logs, style="TButton")
+logs_btn.pack(pady=5)
+create_tooltip(logs_btn, f"Последние {core.LOG_BUFFER_SIZE} записей лога")
+
 # Настройки интерфейса
 ttk.Label(tab_sys, text="🎨 Интерфейс", style="Header.TLabel").pack(pady=15)
 
@@ -1205,42 +1000,60 @@ create_tooltip(theme_button, "Переключить между светлой 
 
 # ===================== START =====================
 
-def load_initial_packages():
-    """Load packages from GitHub on startup (asynchronous)"""
-    global PACKAGES
+def log_time_to_interactive():
+    """Метрика запуска: время до первого интерактивного списка"""
+    elapsed_ms = (time.perf_counter() - STARTUP_STARTED) * 1000
+    log(f"Время до интерактивного списка: {elapsed_ms:.0f} мс ({len(core.PACKAGES)} программ)")
 
-    def load_thread():
-        global PACKAGES
-        try:
-            # Try to load from GitHub first (fast timeout)
-            github_packages = load_packages_from_github()
-            if github_packages:
-                PACKAGES = github_packages
-                log("Загружены пакеты с GitHub")
-                # Update UI on main thread
-                root.after(100, refresh_software_list)
-                return
+def apply_remote_packages(packages):
+    """Применяет обновлённый каталог точечно: перерисовываются только изменённые строки"""
+    merged, diff = core.merge_catalog(core.PACKAGES, packages)
+    core.PACKAGES = merged
 
-            # Fallback to local file
-            local_packages = load_packages_from_file()
-            if local_packages:
-                PACKAGES = local_packages
-                log("Загружены пакеты из локального файла")
-                # Update UI on main thread
-                root.after(100, refresh_software_list)
-                return
+    # Выбор сохраняется для всех пакетов, которые остались в каталоге
+    selected_ids.difference_update(pkg.id for pkg in diff["removed"])
+    update_selected_count()
 
-            log("Используются встроенные пакеты")
-            # Update UI on main thread
-            root.after(100, refresh_software_list)
+    log(f"Загружены пакеты с GitHub: добавлено {len(diff['added'])}, "
+        f"удалено {len(diff['removed'])}, изменено {len(diff['changed'])}")
+    refresh_software_list(keep_scroll=True, rebind=False)
+    return diff
+
+def load_initial_packages():
+    """Сразу показывает локальный каталог, затем сверяет его с GitHub в фоне"""
+    # Локальный файл читается быстро - показываем его без ожидания сети
+    local_packages = core.load_packages_from_file()
+    if local_packages:
+        core.PACKAGES = local_packages
+        log("Загружены пакеты из локального файла")
+    else:
+        log("Используются встроенные пакеты")
+    refresh_software_list()
+    root.after_idle(log_time_to_interactive)
+    root.after_idle(offer_resume)
 
+    def installed_index_thread():
+        try:
+            # Индекс установленных программ нужен карточкам - строим его один раз
+            core.refresh_installed_index()
+            ui_call(lambda: refresh_software_list(keep_scroll=True))
+        except Exception as e:
+            log(f"Ошибка получения списка установленных программ: {e}")
+
+    def revalidate_thread(groups):
+        try:
+            # Каталог с GitHub возвращается, только если он отличается от показанного.
+            # Из шардированного каталога загружается только выбранная категория
+            github_packages = core.load_remote_packages(groups)
+            if github_packages:
+                ui_call(apply_remote_packages, github_packages)
         except Exception as e:
             log(f"Ошибка загрузки пакетов: {e}")
-            # Update UI on main thread
-            root.after(100, refresh_software_list)
 
-    # Start loading in background thread
-    threading.Thread(target=load_thread, daemon=True).start()
+    # winget list и сверка каталога независимы - медленный winget не задерживает обновление.
+    # Фильтр Tk читается здесь, в потоке Tk
+    threading.Thread(target=installed_index_thread, daemon=True).start()
+    threading.Thread(target=revalidate_thread, args=(selected_filter_groups(),), daemon=True).start()
 
 # Инициализация темы
 apply_light_theme()
@@ -1248,8 +1061,10 @@ apply_light_theme()
 if not shutil.which("winget"):
     messagebox.showerror("❌ Ошибка", "winget не найден!\nУстановите winget для работы программы.")
 else:
-    # Start loading packages in background
+    # Local catalog now, GitHub revalidation in background
     load_initial_packages()
 
     # Show main window immediately (no delay)
     root.mainloop()
+    # Незавершённые фоновые загрузки не должны задерживать выход
+    core.shutdown_prefetch()
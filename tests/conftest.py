@@ -0,0 +1,17 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, "tests", "fixtures")
+
+sys.path.insert(0, ROOT)
+
+
+def read_fixture(*parts):
+    with open(os.path.join(FIXTURES, *parts), encoding="utf-8", newline="") as f:
+        return f.read()
+
+
+def read_fixture_bytes(*parts):
+    with open(os.path.join(FIXTURES, *parts), "rb") as f:
+        return f.read()
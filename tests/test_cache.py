@@ -0,0 +1,54 @@
+"""SQLite-кэш метаданных: чтение без транзакций записи"""
+
+import pytest
+
+import installer_core as core
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(core, "CACHE_FILE", str(tmp_path / "cache.db"))
+    monkeypatch.setattr(core, "cache_conn", None)
+    monkeypatch.setattr(core, "pending_touches", {})
+    yield
+    if core.cache_conn is not None:
+        core.cache_conn.close()
+
+
+def last_used(pkg_id, kind):
+    return core.get_cache_connection().execute(
+        "SELECT last_used FROM metadata WHERE pkg_id = ? AND kind = ?", (pkg_id.lower(), kind)
+    ).fetchone()[0]
+
+
+def test_hit_does_not_write(cache, monkeypatch):
+    core.cache_set("Git.Git", "exists", {"exists": True}, 3600)
+    conn = core.get_cache_connection()
+    changes = conn.total_changes
+    for _ in range(10):
+        assert core.cache_get("Git.Git", "exists") == {"exists": True}
+    assert conn.total_changes == changes
+    assert not conn.in_transaction
+
+
+def test_stale_touch_is_flushed_with_next_write(cache, monkeypatch):
+    core.cache_set("Git.Git", "exists", {"exists": True}, 10 ** 6)
+    written = last_used("Git.Git", "exists")
+
+    now = written + core.CACHE_TOUCH_INTERVAL + 1
+    monkeypatch.setattr(core.time, "time", lambda: now)
+    assert core.cache_get("Git.Git", "exists") is not None
+    assert last_used("Git.Git", "exists") == written
+
+    core.cache_set("Google.Chrome", "exists", {"exists": True}, 10 ** 6)
+    assert last_used("Git.Git", "exists") == now
+
+
+def test_flush_at_exit(cache, monkeypatch):
+    core.cache_set("Git.Git", "exists", {"exists": True}, 10 ** 6)
+    now = last_used("Git.Git", "exists") + core.CACHE_TOUCH_INTERVAL + 1
+    monkeypatch.setattr(core.time, "time", lambda: now)
+    core.cache_get("Git.Git", "exists")
+    core.flush_cache_touches()
+    assert last_used("Git.Git", "exists") == now
+    assert core.pending_touches == {}
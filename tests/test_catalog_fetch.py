@@ -0,0 +1,111 @@
+"""Условная загрузка packages.json с локального http.server"""
+
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import installer_core as core
+
+CATALOG = json.dumps([
+    {"name": "Git", "id": "Git.Git", "group": "Разработка"},
+    {"name": "Steam", "id": "Valve.Steam", "group": "Игры"},
+], ensure_ascii=False).encode("utf-8")
+ETAG = '"catalog-v1"'
+LAST_MODIFIED = "Sat, 17 Oct 2026 10:00:00 GMT"
+
+
+class CatalogHandler(BaseHTTPRequestHandler):
+    requests = []
+
+    def do_GET(self):
+        self.requests.append(dict(self.headers, path=self.path))
+        if self.path.endswith("/old/packages.json"):
+            # Переименованный репозиторий: GitHub отвечает переадресацией
+            self.send_response(301)
+            self.send_header("Location", "/packages.json")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.send_header("ETag", ETAG)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(CATALOG)))
+        self.send_header("ETag", ETAG)
+        self.send_header("Last-Modified", LAST_MODIFIED)
+        self.end_headers()
+        self.wfile.write(CATALOG)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def catalog_server(tmp_path, monkeypatch):
+    CatalogHandler.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CatalogHandler)
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    monkeypatch.setattr(core, "CATALOG_URLS", [f"http://127.0.0.1:{server.server_address[1]}/"])
+    monkeypatch.setattr(core, "preferred_mirror", 0)
+    monkeypatch.setattr(core, "http_pool", {})
+    monkeypatch.setattr(core, "http_proxies", {})
+    monkeypatch.setattr(core, "LOCAL_PACKAGES_FILE", str(tmp_path / "packages.json"))
+    monkeypatch.setattr(core, "PACKAGES_VALIDATORS_FILE", str(tmp_path / "packages.meta.json"))
+    CatalogHandler.port = server.server_address[1]
+    yield CatalogHandler.requests
+    server.shutdown()
+    server.server_close()
+
+
+def test_second_fetch_is_conditional_and_keeps_file(catalog_server):
+    packages = core.load_packages_from_github()
+    assert [pkg.id for pkg in packages] == ["Git.Git", "Valve.Steam"]
+    with open(core.LOCAL_PACKAGES_FILE, "rb") as f:
+        assert f.read() == CATALOG
+    assert core.load_packages_validators() == {"etag": ETAG, "last_modified": LAST_MODIFIED}
+    written_at = os.stat(core.LOCAL_PACKAGES_FILE).st_mtime_ns
+
+    assert core.load_packages_from_github() is None
+    first, second = catalog_server
+    assert "If-None-Match" not in first
+    assert "Cache-Control" not in second and "Pragma" not in second
+    assert second["If-None-Match"] == ETAG
+    assert second["If-Modified-Since"] == LAST_MODIFIED
+    assert os.stat(core.LOCAL_PACKAGES_FILE).st_mtime_ns == written_at
+
+
+def test_catalog_written_from_shards_drops_validators(catalog_server):
+    core.load_packages_from_github()
+    packages = core.validate_packages_list([{"name": "Git", "id": "Git.Git", "group": "Разработка"}])
+    assert core.save_packages_to_file(packages)
+    assert core.load_packages_validators() == {}
+
+    # Без валидаторов следующий запрос безусловный и заменяет файл ответом сервера
+    core.load_packages_from_github()
+    assert "If-None-Match" not in catalog_server[-1]
+    with open(core.LOCAL_PACKAGES_FILE, "rb") as f:
+        assert f.read() == CATALOG
+
+
+def test_redirect_is_followed(catalog_server, monkeypatch):
+    monkeypatch.setattr(core, "CATALOG_URLS", [f"http://127.0.0.1:{CatalogHandler.port}/old/"])
+    status, _, body = core.mirror_get("packages.json")
+    assert status == 200 and body == CATALOG
+    assert [request["path"] for request in catalog_server] == ["/old/packages.json", "/packages.json"]
+
+
+def test_system_proxy_is_used(catalog_server, monkeypatch):
+    # Сервер выступает прокси: получает запрос с абсолютным адресом каталога
+    monkeypatch.delenv("no_proxy", raising=False)
+    monkeypatch.delenv("NO_PROXY", raising=False)
+    monkeypatch.setattr(core, "http_proxies", {"http": f"http://127.0.0.1:{CatalogHandler.port}"})
+    monkeypatch.setattr(core, "CATALOG_URLS", ["http://catalog.invalid/"])
+    status, _, body = core.mirror_get("packages.json")
+    assert status == 200 and body == CATALOG
+    assert catalog_server[-1]["path"] == "http://catalog.invalid/packages.json"
@@ -0,0 +1,129 @@
+"""План изменения DNS: скрипт netsh и операции реестра без обращения к системе"""
+
+import pytest
+
+import installer_core as core
+
+KEY1 = f"{core.DOH_SERVERS_KEY}\\{core.DNS1}"
+KEY2 = f"{core.DOH_SERVERS_KEY}\\{core.DNS2}"
+
+
+def test_static_servers_script():
+    lines, ops = core.build_dns_plan(12, ("1.1.1.1", "8.8.8.8", "9.9.9.9"), {})
+    assert lines == [
+        "interface ipv4 set dnsservers name=12 source=static address=1.1.1.1 register=primary validate=no",
+        "interface ipv4 add dnsservers name=12 address=8.8.8.8 index=2 validate=no",
+        "interface ipv4 add dnsservers name=12 address=9.9.9.9 index=3 validate=no",
+    ]
+    assert ops == []
+    assert all(line.isascii() for line in lines)
+
+
+def test_dhcp_script():
+    assert core.build_dns_plan(7, (), {}) == (["interface ipv4 set dnsservers name=7 source=dhcp"], [])
+
+
+@pytest.fixture
+def dns_call(monkeypatch):
+    """Аргументы change_dns, с которыми set_dns / rollback_dns меняют DNS"""
+    calls = []
+    monkeypatch.setattr(core, "is_admin", lambda: True)
+    monkeypatch.setattr(core, "change_dns", lambda servers, doh: calls.append((servers, doh)) or (True, None))
+
+    def run(func, windows_11):
+        monkeypatch.setattr(core, "is_windows_11", lambda: windows_11)
+        assert func()[0]
+        return calls.pop()
+    return run
+
+
+def test_doh_ops_on_windows_11(dns_call):
+    servers, doh = dns_call(core.set_dns, True)
+    assert core.build_dns_plan(3, servers, doh)[1] == [
+        ("set_value", KEY1, "Template", core.DOH_TEMPLATE),
+        ("set_value", KEY1, "AutoUpgrade", core.DOH_AUTO_UPGRADE),
+        ("set_value", KEY2, "Template", core.DOH_TEMPLATE),
+        ("set_value", KEY2, "AutoUpgrade", core.DOH_AUTO_UPGRADE),
+    ]
+    servers, doh = dns_call(core.rollback_dns, True)
+    assert core.build_dns_plan(3, servers, doh) == (
+        ["interface ipv4 set dnsservers name=3 source=dhcp"],
+        [("delete_key", KEY1), ("delete_key", KEY2)],
+    )
+
+
+def test_no_doh_ops_before_windows_11(dns_call):
+    for func in (core.set_dns, core.rollback_dns):
+        servers, doh = dns_call(func, False)
+        assert doh == {}
+        assert core.build_dns_plan(3, servers, doh)[1] == []
+
+
+def test_rollback_plan_from_snapshot():
+    doh = {core.DNS1: {"Template": core.DOH_TEMPLATE, "AutoUpgrade": core.DOH_AUTO_UPGRADE},
+           core.DNS2: {"Template": core.DOH_TEMPLATE, "AutoUpgrade": core.DOH_AUTO_UPGRADE}}
+    # Было: статический DNS, ключ DNS1 с шаблоном без AutoUpgrade, ключа DNS2 не было
+    previous_servers = ("192.168.1.1",)
+    previous_doh = {core.DNS1: {"Template": "https://old.example/dns-query", "AutoUpgrade": None},
+                    core.DNS2: None}
+
+    restore = core.doh_restore_target(previous_doh, doh)
+    assert restore == {core.DNS1: {"Template": "https://old.example/dns-query", "AutoUpgrade": None},
+                       core.DNS2: None}
+    assert core.build_dns_plan(5, previous_servers, restore) == (
+        ["interface ipv4 set dnsservers name=5 source=static address=192.168.1.1 register=primary validate=no"],
+        [("set_value", KEY1, "Template", "https://old.example/dns-query"),
+         ("delete_value", KEY1, "AutoUpgrade"),
+         ("delete_key", KEY2)],
+    )
+
+
+def test_rollback_of_key_deletion_restores_all_values():
+    previous_doh = {core.DNS1: {"Template": core.DOH_TEMPLATE, "AutoUpgrade": 2}}
+    restore = core.doh_restore_target(previous_doh, {core.DNS1: None})
+    assert core.build_dns_plan(5, (), restore)[1] == [
+        ("set_value", KEY1, "Template", core.DOH_TEMPLATE),
+        ("set_value", KEY1, "AutoUpgrade", 2),
+    ]
+
+
+@pytest.mark.parametrize("interface, servers, doh", [
+    (0, ("1.1.1.1",), {}),
+    (-3, ("1.1.1.1",), {}),
+    (True, ("1.1.1.1",), {}),
+    ("Ethernet", ("1.1.1.1",), {}),
+    (3, ("2606:4700:4700::1111",), {}),
+    (3, ("1.1.1.1", "not-an-ip"), {}),
+    (3, (), {"dns.example": None}),
+    (3, (), {"1.1.1.1": {"Template": "http://insecure.example/dns-query"}}),
+    (3, (), {"1.1.1.1": {"Template": 42}}),
+    (3, (), {"1.1.1.1": {"AutoUpgrade": "2"}}),
+    (3, (), {"1.1.1.1": {"AutoUpgrade": True}}),
+    (3, (), {"1.1.1.1": {"Unknown": 1}}),
+])
+def test_invalid_plan(interface, servers, doh):
+    with pytest.raises(ValueError):
+        core.build_dns_plan(interface, servers, doh)
+
+
+def test_failed_apply_rolls_back(monkeypatch):
+    adapter = core.NetAdapter("Ethernet", "Intel", 12, "Up", False, ("192.168.1.23",), ("192.168.1.1",),
+                              ("192.168.1.1",), "{4F9B2C1A-6E0D-4B57-9A3C-2D1E8F7B6A50}")
+    state = {"servers": ("192.168.1.1",)}
+    scripts = []
+    monkeypatch.setattr(core, "get_active_adapter", lambda: adapter)
+    monkeypatch.setattr(core, "read_dns_state", lambda adapter, addresses: (state["servers"], {}))
+    monkeypatch.setattr(core, "run_netsh_script", scripts.append)
+
+    def apply_registry_ops(ops):
+        if ops:
+            raise OSError("нет доступа")
+    monkeypatch.setattr(core, "apply_registry_ops", apply_registry_ops)
+
+    # netsh "применил" не те серверы - откат к прежнему статическому DNS
+    success, error = core.change_dns(("1.1.1.1",), {})
+    assert not success and "восстановлены" in error
+    assert scripts == [
+        ["interface ipv4 set dnsservers name=12 source=static address=1.1.1.1 register=primary validate=no"],
+        ["interface ipv4 set dnsservers name=12 source=static address=192.168.1.1 register=primary validate=no"],
+    ]
@@ -0,0 +1,18 @@
+"""Команды тихой установки из кэша установщиков"""
+
+import installer_core as core
+
+
+def test_known_types_install_silently():
+    assert core.installer_command("a.msi", "msi") == ["msiexec", "/i", "a.msi", "/qn", "/norestart"]
+    assert core.installer_command("a.exe", "Inno")[1:] == core.SILENT_SWITCHES["inno"]
+    assert core.installer_command("a.exe", "nullsoft") == ["a.exe", "/S"]
+
+
+def test_manifest_switches_take_precedence():
+    assert core.installer_command("a.exe", "exe", "--silent --no-reboot") == ["a.exe", "--silent", "--no-reboot"]
+
+
+def test_unknown_exe_falls_back_to_winget():
+    assert core.installer_command("a.exe", "exe") is None
+    assert core.installer_command("a.exe", None) is None
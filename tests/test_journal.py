@@ -0,0 +1,84 @@
+"""Журнал установки: продолжение после сбоя или перезагрузки"""
+
+import pytest
+
+import installer_core as core
+
+PLAN = [
+    {"name": "Git", "id": "Git.Git", "group": "Разработка"},
+    {"name": "VALORANT (EU)", "id": "RiotGames.Valorant.EU", "group": "Игры", "reboot": True, "special": "valorant"},
+    {"name": "Steam", "id": "Valve.Steam", "group": "Игры"},
+    {"name": "Missing", "id": "Vendor.Missing", "group": "Игры"},
+]
+
+
+@pytest.fixture
+def journal(tmp_path, monkeypatch):
+    monkeypatch.setattr(core, "JOURNAL_FILE", str(tmp_path / "install_journal.jsonl"))
+    monkeypatch.setattr(core, "needs_reboot", False)
+    monkeypatch.setattr(core, "valorant_installed", False)
+    core.journal_begin([core.make_package(data) for data in PLAN])
+    return core.JOURNAL_FILE
+
+
+def tear_last_line(path, text='{"time": 1, "event": "succ'):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(text)
+
+
+def remaining_ids(state):
+    return [pkg.id for pkg in state["remaining"]]
+
+
+def test_torn_last_line_is_ignored(journal):
+    core.journal_write("started", "Git.Git")
+    core.journal_write("succeeded", "Git.Git", status=core.STATUS_INSTALLED, message="ok")
+    core.journal_write("failed", "Valve.Steam", status=core.STATUS_FAILED, message="код 1")
+    core.journal_write("succeeded", "Vendor.Missing", status=core.STATUS_NOT_FOUND, message="нет")
+    core.journal_write("started", "RiotGames.Valorant.EU")
+    tear_last_line(journal)
+
+    state = core.load_unfinished_journal()
+    assert [pkg.id for pkg in state["packages"]] == [data["id"] for data in PLAN]
+    # Неудачные и начатые пакеты ставятся заново, подтверждённые - нет
+    assert remaining_ids(state) == ["RiotGames.Valorant.EU", "Valve.Steam"]
+    assert set(state["results"]) == {"Git.Git", "Vendor.Missing"}
+    assert not state["needs_reboot"] and not state["valorant_installed"]
+
+
+def test_flags_restored_from_plan_and_results(journal, monkeypatch):
+    core.journal_write("succeeded", "RiotGames.Valorant.EU", status=core.STATUS_INSTALLED, message="ok")
+    state = core.load_unfinished_journal()
+    assert state["needs_reboot"] and state["valorant_installed"]
+
+    # Флаги, накопленные до продолжения, записываются в новый план
+    monkeypatch.setattr(core, "needs_reboot", True)
+    core.journal_begin(state["remaining"])
+    state = core.load_unfinished_journal()
+    assert state["needs_reboot"] and not state["valorant_installed"]
+    assert remaining_ids(state) == ["Git.Git", "Valve.Steam", "Vendor.Missing"]
+
+
+def test_finished_journal_is_not_resumed(journal):
+    core.journal_write("succeeded", "Git.Git", status=core.STATUS_INSTALLED, message="ok")
+    core.journal_finish()
+    assert core.load_unfinished_journal() is None
+
+
+def test_finish_after_torn_line_is_not_lost(journal):
+    tear_last_line(journal)
+    core.journal_finish()
+    assert core.load_unfinished_journal() is None
+
+
+def test_all_confirmed_leaves_nothing_remaining(journal):
+    for data in PLAN:
+        core.journal_write("succeeded", data["id"], status=core.STATUS_ALREADY_INSTALLED, message="")
+    assert core.load_unfinished_journal()["remaining"] == []
+
+
+def test_missing_or_empty_journal(tmp_path, monkeypatch):
+    monkeypatch.setattr(core, "JOURNAL_FILE", str(tmp_path / "install_journal.jsonl"))
+    assert core.load_unfinished_journal() is None
+    tear_last_line(core.JOURNAL_FILE, '{"event": "plann')
+    assert core.load_unfinished_journal() is None
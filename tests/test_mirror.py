@@ -0,0 +1,73 @@
+"""Зеркало в локальной сети: ответы на keep-alive соединении"""
+
+import hashlib
+import http.client
+import json
+import os
+import shutil
+import threading
+
+import pytest
+
+import installer_core as core
+import installer_mirror
+
+
+@pytest.fixture
+def mirror(tmp_path, monkeypatch):
+    monkeypatch.setattr(core, "PREFETCH_DIR", str(tmp_path / "prefetch"))
+    server = installer_mirror.create_mirror_server(core.PACKAGES, "127.0.0.1", 0)
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    shutil.rmtree(server.mirror_dir, ignore_errors=True)
+
+
+def test_head_404_keeps_connection_usable(mirror):
+    conn = http.client.HTTPConnection("127.0.0.1", mirror.server_address[1], timeout=5)
+    conn.request("HEAD", "/sha256/" + "0" * 64)
+    response = conn.getresponse()
+    assert response.status == 404
+    assert response.read() == b""
+
+    # Следующий ответ на том же соединении не должен начинаться с тела ошибки
+    conn.request("GET", "/packages.json")
+    response = conn.getresponse()
+    assert response.status == 200
+    assert response.read().startswith(b"[")
+    conn.close()
+
+
+def add_cache_entry(pkg_id, version, content):
+    target = os.path.join(core.PREFETCH_DIR, pkg_id, version)
+    os.makedirs(target)
+    with open(os.path.join(target, "setup.exe"), "wb") as f:
+        f.write(content)
+    sha256 = hashlib.sha256(content).hexdigest()
+    with open(os.path.join(target, "entry.json"), "w", encoding="utf-8") as f:
+        json.dump({"id": pkg_id, "version": version, "installer": "setup.exe",
+                   "sha256": sha256, "size": len(content), "last_used": 0}, f)
+    return sha256
+
+
+def test_installers_index_rescanned_only_when_cache_changes(mirror, monkeypatch):
+    scans = []
+    original = installer_mirror.installers_index
+    monkeypatch.setattr(installer_mirror, "installers_index", lambda: scans.append(1) or original())
+
+    sha256 = add_cache_entry("Git.Git", "2.0", b"installer")
+    assert installer_mirror.installer_path(sha256).endswith("setup.exe")
+    assert len(scans) == 1
+
+    # Попадания и неизменный кэш не перечитывают entry.json
+    for _ in range(5):
+        installer_mirror.installer_path(sha256)
+        installer_mirror.refresh_installers_index()
+    assert len(scans) == 1
+
+    other = add_cache_entry("Git.Git", "2.1", b"newer installer")
+    index, _ = installer_mirror.refresh_installers_index()
+    assert len(scans) == 2
+    assert {entry["sha256"] for entry in index["installers"]} == {sha256, other}
@@ -0,0 +1,54 @@
+"""Разбор вывода Get-NetAdapter (фикстуры вместо запуска PowerShell)"""
+
+import pytest
+
+import installer_core as core
+from conftest import read_fixture
+
+
+def test_single_adapter_object():
+    adapters = core.parse_net_adapters(read_fixture("net_adapters", "single.json"))
+    assert adapters == [core.NetAdapter(
+        name="Ethernet",
+        description="Intel(R) Ethernet Connection (7) I219-V",
+        index=12,
+        status="Up",
+        virtual=False,
+        ipv4=("192.168.1.23",),
+        gateways=("192.168.1.1",),
+        dns_servers=("192.168.1.1",),
+        guid="{4F9B2C1A-6E0D-4B57-9A3C-2D1E8F7B6A50}",
+    )]
+    assert core.select_active_adapter(adapters) is adapters[0]
+
+
+def test_multiple_adapters():
+    adapters = core.parse_net_adapters(read_fixture("net_adapters", "multiple.json"))
+    assert [adapter.name for adapter in adapters] == [
+        "Wi-Fi", "vEthernet (Default Switch)", "Ethernet 2", "Ethernet", "Bluetooth Network Connection"]
+    bluetooth = adapters[-1]
+    assert bluetooth.ipv4 == () and bluetooth.dns_servers == () and bluetooth.guid == ""
+
+    # Отключённые, APIPA и виртуальные без шлюза проигрывают физическому адаптеру со шлюзом
+    active = core.select_active_adapter(adapters)
+    assert active.name == "Ethernet"
+    assert active.dns_servers == ("1.1.1.1", "8.8.8.8")
+
+
+def test_virtual_adapter_used_when_no_other_is_connected():
+    adapters = core.parse_net_adapters(read_fixture("net_adapters", "multiple.json"))
+    remaining = [adapter for adapter in adapters if adapter.name != "Ethernet"]
+    assert core.select_active_adapter(remaining).name == "vEthernet (Default Switch)"
+
+
+@pytest.mark.parametrize("text", [read_fixture("net_adapters", "empty.txt"), "", "[]"])
+def test_empty_output(text):
+    assert core.parse_net_adapters(text) == []
+    assert core.select_active_adapter([]) is None
+
+
+def test_bom_and_invalid_json():
+    text = "\ufeff" + read_fixture("net_adapters", "single.json")
+    assert core.parse_net_adapters(text)[0].name == "Ethernet"
+    with pytest.raises(ValueError):
+        core.parse_net_adapters("Get-NetAdapter : not recognized")
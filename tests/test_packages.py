@@ -0,0 +1,52 @@
+"""Загрузка каталога: Package и проверка записей"""
+
+import installer_core as core
+
+
+def test_make_package_without_extra():
+    pkg = core.make_package({"name": "Git", "id": "Git.Git", "group": "Разработка", "reboot": 1})
+    assert isinstance(pkg, core.Package)
+    assert pkg == core.Package("Git", "Git.Git", "Разработка", True, None,
+                               core.PROGRAM_ICONS["Git"], core.CATEGORY_COLORS["Разработка"], None)
+    assert pkg.extra is None
+
+
+def test_make_package_keeps_extra_fields_in_order():
+    data = {"name": "Cursor", "id": "Anysphere.Cursor", "group": "Разработка",
+            "timeout": 600, "special": "x", "depends_on": ["Git.Git"]}
+    pkg = core.make_package(data)
+    assert pkg.special == "x"
+    assert list(pkg.extra) == ["timeout", "depends_on"]
+    assert core.package_to_dict(pkg) == data
+
+
+def test_validate_packages_list_skips_invalid_and_duplicates():
+    packages = core.validate_packages_list([
+        {"name": "Git", "id": "Git.Git", "group": "Разработка"},
+        {"name": "Git again", "id": "git.git", "group": "Разработка"},
+        {"name": "No dot", "id": "NoDot", "group": "Разработка"},
+        {"name": "No group", "id": "A.B"},
+    ])
+    assert [pkg.id for pkg in packages] == ["Git.Git"]
+
+
+def package(pkg_id, *depends_on):
+    data = {"name": pkg_id, "id": pkg_id, "group": "Разработка"}
+    if depends_on:
+        data["depends_on"] = list(depends_on)
+    return core.make_package(data)
+
+
+def test_dependency_cycles_none_without_dependencies():
+    assert core.find_dependency_cycles([package("A.A"), package("B.B")]) == set()
+
+
+def test_dependency_cycles_found_through_plain_packages():
+    packages = [
+        package("Base.Base"),
+        package("A.A", "Base.Base", "B.B"),
+        package("B.B", "A.A"),
+        package("C.C", "B.B"),
+        package("D.D", "Base.Base", "Missing.Missing"),
+    ]
+    assert core.find_dependency_cycles(packages) == {"a.a", "b.b", "c.c"}
@@ -0,0 +1,89 @@
+"""Кэш установщиков на поддельном winget (benchmarks/bench_install.py)"""
+
+import json
+import os
+import shutil
+
+import pytest
+
+import installer_core as core
+from benchmarks.bench_install import write_fake_winget
+
+pytestmark = pytest.mark.skipif(os.name == "nt" or not shutil.which("bash"),
+                                reason="поддельный winget - bash-скрипт")
+
+
+@pytest.fixture
+def winget(tmp_path, monkeypatch):
+    write_fake_winget(str(tmp_path))
+    calls = tmp_path / "calls.log"
+    installed = tmp_path / "installed.txt"
+    installed.write_text("")
+    monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("FAKE_WINGET_LOG", str(calls))
+    monkeypatch.setenv("FAKE_WINGET_INSTALLED_FILE", str(installed))
+    monkeypatch.setattr(core, "CACHE_FILE", str(tmp_path / "cache.db"))
+    monkeypatch.setattr(core, "cache_conn", None)
+    monkeypatch.setattr(core, "pending_touches", {})
+    monkeypatch.setattr(core, "installed_index", {})
+    monkeypatch.setattr(core, "installed_truncated", [])
+    monkeypatch.setattr(core, "installed_index_loaded", True)
+    monkeypatch.setattr(core, "JOURNAL_FILE", str(tmp_path / "journal.jsonl"))
+    monkeypatch.setattr(core, "PREFETCH_DIR", str(tmp_path / "installers"))
+    # Без зеркал в локальной сети
+    monkeypatch.setattr(core, "fetch_installer_from_mirror", lambda pkg_id, version=None: False)
+    core.cancel_event.clear()
+
+    def read_calls():
+        return calls.read_text().split() if calls.exists() else []
+    yield read_calls
+    if core.cache_conn is not None:
+        core.cache_conn.close()
+
+
+def package(pkg_id):
+    return core.make_package({"name": pkg_id, "id": pkg_id, "group": "Игры"})
+
+
+def cache_dirs():
+    return sorted(os.listdir(core.PREFETCH_DIR))
+
+
+def test_hash_verified_hit_installs_from_cache(winget):
+    entry = core.download_installer("Vendor.App")
+    assert entry["installer_type"] == "nullsoft"
+    downloaded_at = entry["last_used"]
+
+    status, _ = core.install_package(package("Vendor.App"))
+    assert status == core.STATUS_INSTALLED
+    # Установщик из кэша запущен с ключами nullsoft, winget install не вызывался
+    assert winget() == ["download", "cached"]
+
+    entry_dir = os.path.join(core.PREFETCH_DIR, "Vendor.App", "1.0.0")
+    assert sorted(os.listdir(entry_dir)) == ["Vendor.App_1.0.0_nullsoft.exe",
+                                             "Vendor.App_1.0.0_nullsoft.yaml", "entry.json"]
+    with open(os.path.join(entry_dir, "entry.json"), encoding="utf-8") as f:
+        assert json.load(f)["last_used"] > downloaded_at
+
+
+def test_hash_mismatch_removes_entry_and_uses_winget(winget):
+    entry = core.download_installer("Vendor.App")
+    with open(os.path.join(core.PREFETCH_DIR, "Vendor.App", "1.0.0", entry["installer"]), "ab") as f:
+        f.write(b"tampered")
+
+    status, _ = core.install_package(package("Vendor.App"))
+    assert status == core.STATUS_INSTALLED
+    assert winget()[-1] == "install" and "cached" not in winget()
+    assert cache_dirs() == []
+
+
+def test_lru_eviction_at_size_cap(winget, monkeypatch):
+    size = core.download_installer("Vendor.A")["size"]
+    core.download_installer("Vendor.B")
+    monkeypatch.setattr(core, "PREFETCH_MAX_BYTES", size * 2)
+
+    # A использован позже B - вытесняется B
+    assert core.get_cached_installer("Vendor.A") is not None
+    core.download_installer("Vendor.C")
+    assert cache_dirs() == ["Vendor.A", "Vendor.C"]
+    assert core.get_cached_installer("Vendor.B") is None
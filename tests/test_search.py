@@ -0,0 +1,58 @@
+"""Поиск по каталогу: префиксы, подстроки, транслитерация и категории"""
+
+import pytest
+
+import installer_core as core
+
+
+@pytest.fixture
+def catalog(monkeypatch):
+    packages = core.validate_packages_list([
+        {"name": "Git", "id": "Git.Git", "group": "Разработка"},
+        {"name": "GitHub Desktop", "id": "GitHub.GitHubDesktop", "group": "Разработка"},
+        {"name": "GitKraken", "id": "Axosoft.GitKraken", "group": "Разработка"},
+        {"name": "Steam", "id": "Valve.Steam", "group": "Игры"},
+        {"name": "Steam Link", "id": "Valve.SteamLink", "group": "Игры"},
+        {"name": "Steamworks Tool", "id": "Valve.SteamworksTool", "group": "Игры"},
+        {"name": "Telegram", "id": "Telegram.TelegramDesktop", "group": "Базовый софт"},
+        {"name": "Google Chrome", "id": "Google.Chrome", "group": "Базовый софт"},
+    ])
+    monkeypatch.setattr(core, "PACKAGES", packages)
+    return packages
+
+
+def names(packages):
+    return [pkg.name for pkg in packages]
+
+
+def test_prefix_query_finds_all_words_starting_with_it(catalog):
+    assert names(core.search_packages("git")) == ["Git", "GitHub Desktop", "GitKraken"]
+    assert names(core.search_packages("steam")) == ["Steam", "Steam Link", "Steamworks Tool"]
+
+
+def test_mid_word_query(catalog):
+    assert names(core.search_packages("hub")) == ["GitHub Desktop"]
+    assert names(core.search_packages("kraken")) == ["GitKraken"]
+    assert names(core.search_packages("works")) == ["Steamworks Tool"]
+
+
+def test_transliterated_query(catalog):
+    assert names(core.search_packages("телеграм")) == ["Telegram"]
+    assert names(core.search_packages("хром")) == ["Google Chrome"]
+
+
+def test_group_bucket(catalog):
+    assert names(core.search_packages("", "Игры")) == ["Steam", "Steam Link", "Steamworks Tool"]
+    assert names(core.search_packages("link", "Игры")) == ["Steam Link"]
+    assert core.search_packages("git", "Игры") == []
+    assert names(core.group_packages("Базовый софт")) == ["Telegram", "Google Chrome"]
+
+
+def test_multi_word_substring_in_large_catalog(monkeypatch):
+    packages = core.validate_packages_list([
+        {"name": f"App {i}", "id": f"Vendor.App{i}", "group": "Разработка"} for i in range(10000)
+    ])
+    monkeypatch.setattr(core, "PACKAGES", packages)
+    found = names(core.search_packages("app 12"))
+    assert found[:2] == ["App 12", "App 120"]
+    assert len(found) == 111  # 12, 120-129, 1200-1299
@@ -0,0 +1,71 @@
+"""Адаптивные таймауты winget по истории длительностей"""
+
+import pytest
+
+import installer_core as core
+
+PKG = "Vendor.Big"
+
+
+@pytest.fixture
+def history(tmp_path, monkeypatch):
+    monkeypatch.setattr(core, "CACHE_FILE", str(tmp_path / "cache.db"))
+    monkeypatch.setattr(core, "cache_conn", None)
+    monkeypatch.setattr(core, "PACKAGES", core.validate_packages_list([
+        {"name": "Big", "id": PKG, "group": "Игры"},
+        {"name": "Hinted", "id": "Vendor.Hinted", "group": "Игры", "timeout": 900},
+        {"name": "Huge hint", "id": "Vendor.HugeHint", "group": "Игры", "timeout": 99999},
+        {"name": "Sized", "id": "Vendor.Sized", "group": "Игры", "expected_size": 1000},
+    ]))
+    yield
+    if core.cache_conn is not None:
+        core.cache_conn.close()
+
+
+def record(duration, returncode=0, timeout=False, phase="winget install", pkg_id=PKG, **extra):
+    core.record_duration({"phase": phase, "pkg_id": pkg_id, "duration": duration,
+                          "returncode": returncode, "timeout": timeout, **extra})
+
+
+def test_default_below_min_samples(history):
+    for _ in range(core.TIMEOUT_MIN_SAMPLES - 1):
+        record(10)
+    assert core.get_timeout("winget install", PKG) == core.TIMEOUT_LIMITS["winget install"][1]
+
+
+def test_catalog_hints(history):
+    floor, default, ceiling = core.TIMEOUT_LIMITS["winget install"]
+    assert core.get_timeout("winget install", "Vendor.Hinted") == 900
+    assert core.get_timeout("winget install", "Vendor.HugeHint") == ceiling
+    assert core.get_timeout("winget install", "Vendor.Sized") == min(floor + 1000 / core.TIMEOUT_MIN_SPEED_MB, ceiling)
+
+
+def test_clamped_to_floor_and_ceiling(history):
+    floor, _, ceiling = core.TIMEOUT_LIMITS["winget install"]
+    for _ in range(5):
+        record(1)
+        record(2000, pkg_id="Vendor.Slow")
+    assert core.get_timeout("winget install", PKG) == floor
+    assert core.get_timeout("winget install", "Vendor.Slow") == ceiling
+
+
+def test_timed_out_sample_raises_timeout(history):
+    for _ in range(5):
+        record(100)
+    assert core.get_timeout("winget install", PKG) == 100 * core.TIMEOUT_FACTOR
+    record(300, returncode=None, timeout=True)
+    assert core.get_timeout("winget install", PKG) == 300 * core.TIMEOUT_FACTOR
+
+
+def test_failures_and_cancelled_runs_not_recorded(history):
+    for _ in range(5):
+        record(400)
+    # Быстрые ошибки, отмена и промахи winget list --id не занижают таймаут
+    for _ in range(10):
+        record(1.5, returncode=0x8A150014)
+        record(2, returncode=1, cancelled=True)
+        record(0.5, returncode=1, phase="winget list --id")
+    record(600, returncode=3010)
+    assert core.get_duration_history(PKG, "winget install") == [400] * 5 + [600]
+    assert core.get_duration_history(PKG, "winget list --id") == []
+    assert core.get_timeout("winget install", PKG) == 600 * core.TIMEOUT_FACTOR
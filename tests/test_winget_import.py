@@ -0,0 +1,105 @@
+"""winget import: файл импорта и итоги пакетов по выводу (tests/fixtures/winget_import)"""
+
+import os
+import shutil
+import stat
+
+import pytest
+
+import installer_core as core
+from conftest import FIXTURES, read_fixture
+
+FAKE_WINGET = """#!/usr/bin/env bash
+if [ "$1" = "import" ]; then
+    cat "$FAKE_IMPORT_OUTPUT"
+    exit "${FAKE_IMPORT_EXIT:-0}"
+fi
+exit 0
+"""
+
+
+def package(pkg_id, **fields):
+    return core.make_package({"name": pkg_id.split(".")[-1], "id": pkg_id, "group": "Разработка", **fields})
+
+
+@pytest.mark.parametrize("line, expected", [
+    ("Found Git [Git.Git] Version 2.43.0", ("found", "Git.Git")),
+    ("Найдено Git [Git.Git] Версия 2.43.0", ("found", "Git.Git")),
+    ("Package is already installed: Valve.Steam", ("already_installed", "Valve.Steam")),
+    ("Пакет уже установлен: Valve.Steam", ("already_installed", "Valve.Steam")),
+    ("Package not found for import: Vendor.Missing", ("not_found", "Vendor.Missing")),
+    ("Пакет не найден для импорта: Vendor.Missing", ("not_found", "Vendor.Missing")),
+    ("Successfully installed", ("installed", None)),
+    ("Установлено успешно", ("installed", None)),
+    ("Installer failed with exit code: 1603", ("failed", 1603)),
+    ("Сбой установщика с кодом выхода: -1978335215", ("failed", -1978335215)),
+    ("Found an existing package already installed. Trying to upgrade the installed package...", None),
+    ("Downloading https://example.com/setup.exe", None),
+    ("", None),
+])
+def test_import_line(line, expected):
+    assert core.parse_winget_import_line(line) == expected
+
+
+def test_manifest_order():
+    packages = [
+        package("Vendor.Barrier", barrier=True),
+        package("Vendor.Reboot", reboot=True),
+        package("Vendor.Plugin", depends_on=["Vendor.Reboot"]),
+        package("Vendor.App", depends_on=["Vendor.Base"]),
+        package("Vendor.Base"),
+    ]
+    manifest = core.build_import_manifest(packages)
+    source, = manifest["Sources"]
+    assert source["SourceDetails"] == core.WINGET_SOURCE_DETAILS
+    # Зависимости раньше зависящих, пакеты с перезагрузкой и зависящие от них - после обычных,
+    # барьер - последним
+    assert [entry["PackageIdentifier"] for entry in source["Packages"]] == [
+        "Vendor.Base", "Vendor.App", "Vendor.Reboot", "Vendor.Plugin", "Vendor.Barrier",
+    ]
+
+
+@pytest.fixture
+def fake_import(tmp_path, monkeypatch):
+    if os.name == "nt" or not shutil.which("bash"):
+        pytest.skip("поддельный winget - bash-скрипт")
+    winget = tmp_path / "winget"
+    winget.write_text(FAKE_WINGET)
+    winget.chmod(winget.stat().st_mode | stat.S_IXUSR)
+    monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("FAKE_IMPORT_EXIT", "1")
+    monkeypatch.setattr(core, "CACHE_FILE", str(tmp_path / "cache.db"))
+    monkeypatch.setattr(core, "cache_conn", None)
+    monkeypatch.setattr(core, "JOURNAL_FILE", str(tmp_path / "journal.jsonl"))
+    monkeypatch.setattr(core, "TRACE_FILE", "")
+    monkeypatch.setattr(core, "needs_reboot", False)
+    monkeypatch.setattr(core, "valorant_installed", False)
+
+    def run(fixture):
+        monkeypatch.setenv("FAKE_IMPORT_OUTPUT", os.path.join(FIXTURES, "winget_import", fixture))
+        packages = [package(pkg_id) for pkg_id in (
+            "Git.Git", "Valve.Steam", "Vendor.Missing", "Unity.UnityHub",
+            "Telegram.TelegramDesktop", "Vendor.Silent")]
+        results = core.install_packages_bulk(packages)
+        return {pkg_id: status for pkg_id, (status, _) in results.items()}, results
+    yield run
+    if core.cache_conn is not None:
+        core.cache_conn.close()
+
+
+@pytest.mark.parametrize("fixture", ["en_mixed.txt", "ru_mixed.txt"])
+def test_bulk_results_from_output(fake_import, fixture):
+    assert "\r" in read_fixture("winget_import", fixture)
+    statuses, results = fake_import(fixture)
+    assert statuses == {
+        "Git.Git": core.STATUS_INSTALLED,
+        "Valve.Steam": core.STATUS_ALREADY_INSTALLED,
+        "Vendor.Missing": core.STATUS_NOT_FOUND,
+        "Unity.UnityHub": core.STATUS_FAILED,
+        # Начат, но итога нет; и вовсе не упомянут в выводе
+        "Telegram.TelegramDesktop": core.STATUS_FAILED,
+        "Vendor.Silent": core.STATUS_FAILED,
+    }
+    assert "1603" in results["Unity.UnityHub"][1]
+    assert "нет итога" in results["Vendor.Silent"][1]
+    assert core.load_unfinished_journal() is None
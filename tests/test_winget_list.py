@@ -0,0 +1,101 @@
+"""Разбор `winget list` на записанном выводе (tests/fixtures/winget_list)"""
+
+import pytest
+
+import installer_core as core
+from conftest import read_fixture
+
+
+@pytest.fixture
+def installed(monkeypatch):
+    """Подставляет индекс из фикстуры, как после refresh_installed_index"""
+    def load(name):
+        index = core.parse_winget_list(read_fixture("winget_list", name))
+        truncated = [(core.truncated_id_prefix(key), key) for key in index if core.truncated_id_prefix(key)]
+        monkeypatch.setattr(core, "installed_index", index)
+        monkeypatch.setattr(core, "installed_truncated", truncated)
+        monkeypatch.setattr(core, "installed_index_loaded", True)
+        return index
+    return load
+
+
+def test_english_table():
+    index = core.parse_winget_list(read_fixture("winget_list", "en_truncated.txt"))
+    assert index["git.git"] == "2.43.0"
+    assert index["google.chrome"] == "122.0.6261.112"
+    # Обрезанное имя не мешает прочитать ID
+    assert index["microsoft.vcredist.2015+.x64"] == "14.38.33135.0"
+    assert index["{f132af7f-7bca-4ede-8a7c-958108fe7dbc}"] == "6.0.9235.1"
+    # ID с пробелами (записи ARP) пропускаются
+    assert not any(" " in key for key in index)
+
+
+def test_localized_header():
+    index = core.parse_winget_list(read_fixture("winget_list", "ru_localized.txt"))
+    assert index == {
+        "git.git": "2.43.0",
+        "yandex.browser": "24.1.5.709",
+        "discord.discord": "1.0.9032",
+        "microsoft.mrt": "5.121",
+    }
+
+
+def test_without_available_column():
+    index = core.parse_winget_list(read_fixture("winget_list", "no_available.txt"))
+    assert index["notepad++.notepad++"] == "8.6.4"
+    assert index["valve.steam"] == "2.10.91.91"
+    assert index["python.python.3.12"] == "3.12.2"
+    # Строка без версии и источника
+    assert index["arp\\machine\\x64\\legacyapp"] == ""
+
+
+def test_wide_columns_with_double_width_names():
+    index = core.parse_winget_list(read_fixture("winget_list", "wide_columns.txt"))
+    assert index == {
+        "tencent.wechat": "3.9.9.43",
+        "netease.cloudmusic": "2.10.12",
+        "7zip.7zip": "23.01",
+        "telegram.telegramdesktop": "4.15.2",
+    }
+
+
+def test_no_table():
+    assert core.parse_winget_list("No installed package found matching input criteria.\r\n") == {}
+    assert core.parse_winget_list("") == {}
+
+
+def test_truncated_id_is_kept_with_mark():
+    index = core.parse_winget_list(read_fixture("winget_list", "en_truncated.txt"))
+    assert index["microsoft.visualstudio.2022.buildtool…"] == "17.9.2"
+    assert core.truncated_id_prefix("Microsoft.VisualStudio.2022.BuildTool…") == "microsoft.visualstudio.2022.buildtool"
+    assert core.truncated_id_prefix("Contoso.App...") == "contoso.app"
+    assert core.truncated_id_prefix("Git.Git") is None
+
+
+def test_truncated_id_falls_back_to_winget_list_id(installed, monkeypatch):
+    installed("en_truncated.txt")
+    checked = []
+
+    def fake_run(args, phase, pkg_id=None, **kwargs):
+        checked.append(pkg_id)
+        return core.subprocess.CompletedProcess(args, 0)
+
+    monkeypatch.setattr(core.trace, "traced_run", fake_run)
+    monkeypatch.setattr(core, "cache_get", lambda pkg_id, kind: None)
+    monkeypatch.setattr(core, "cache_set", lambda *args: None)
+
+    # Полный ID найден в индексе - без процессов
+    assert core.is_installed("Git.Git")
+    # Не совпадает ни с одной записью - не установлен, тоже без процессов
+    assert not core.is_installed("Mozilla.Firefox")
+    assert checked == []
+    # Совпадает с началом обрезанного ID - проверка отдельным `winget list --id`
+    assert core.is_installed("Microsoft.VisualStudio.2022.BuildTools")
+    assert checked == ["Microsoft.VisualStudio.2022.BuildTools"]
+
+
+def test_installed_version_with_truncated_id(installed):
+    installed("en_truncated.txt")
+    assert core.installed_version("GIT.GIT") == "2.43.0"
+    assert core.installed_version("Microsoft.VisualStudio.2022.BuildTools") == "17.9.2"
+    assert core.installed_version("Mozilla.Firefox") is None
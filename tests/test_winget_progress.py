@@ -0,0 +1,90 @@
+"""Прогресс winget install на записанном выводе (tests/fixtures/winget_install)"""
+
+import io
+import sys
+
+import pytest
+
+import installer_core as core
+from conftest import read_fixture_bytes
+
+
+class ChunkedStream:
+    """Поток, отдающий вывод маленькими кусками, как pipe"""
+
+    def __init__(self, data, size):
+        self.data = data
+        self.size = size
+
+    def read1(self, n):
+        chunk, self.data = self.data[:self.size], self.data[self.size:]
+        return chunk
+
+
+def progress_events(data):
+    events = []
+    for line in core.iter_process_lines(io.BytesIO(data)):
+        progress = core.parse_winget_progress(line)
+        if progress is not None and (not events or events[-1] != progress):
+            events.append(progress)
+    return events
+
+
+def test_carriage_returns_split_progress_redraws():
+    lines = list(core.iter_process_lines(io.BytesIO(read_fixture_bytes("winget_install", "en_git.txt"))))
+    assert lines[0] == "Found Git [Git.Git] Version 2.43.0"
+    # Каждая перерисовка прогресс-бара - отдельная строка
+    assert [line.split("  ")[-1] for line in lines if line.endswith("MB")] == [
+        "0 B / 58.6 MB", "11.7 MB / 58.6 MB", "58.6 MB / 58.6 MB",
+    ]
+    assert "   | " in lines
+    assert lines[-1] == "Successfully installed"
+
+
+@pytest.mark.parametrize("size", [1, 7, 4096])
+def test_chunk_boundaries_do_not_change_lines(size):
+    data = read_fixture_bytes("winget_install", "ru_telegram.txt")
+    assert list(core.iter_process_lines(ChunkedStream(data, size))) == \
+        list(core.iter_process_lines(io.BytesIO(data)))
+
+
+def test_english_download_by_size():
+    assert progress_events(read_fixture_bytes("winget_install", "en_git.txt")) == [
+        ("download", None), ("download", 0), ("download", 19), ("download", 100),
+        ("verify", None), ("install", None), ("done", 100),
+    ]
+
+
+def test_russian_download_by_percent():
+    assert progress_events(read_fixture_bytes("winget_install", "ru_telegram.txt")) == [
+        ("download", None), ("download", 45), ("download", 100),
+        ("verify", None), ("install", None), ("done", 100),
+    ]
+
+
+@pytest.mark.parametrize("line, expected", [
+    ("  ██████  12 MB / 50 MB", ("download", 24)),
+    ("  ██████  1,5 GB / 3 GB", ("download", 50)),
+    ("  ██████  512 KB / 1.0 MB", ("download", 50)),
+    ("  ██████  12,5 МБ / 50 МБ", ("download", 25)),
+    ("  ██████  45%", ("download", 45)),
+    ("  ██████  250 %", ("download", 100)),
+    ("Found Git [Git.Git] Version 2.43.0", None),
+    ("   ", None),
+])
+def test_progress_line(line, expected):
+    assert core.parse_winget_progress(line) == expected
+
+
+def test_output_tail_is_capped(tmp_path, monkeypatch):
+    monkeypatch.setattr(core, "CACHE_FILE", str(tmp_path / "cache.db"))
+    monkeypatch.setattr(core, "cache_conn", None)
+    script = "import sys\nfor i in range(500): print(f'line {i}')\nsys.stdout.write('x' * 5000)\n"
+    result = core.stream_process([sys.executable, "-c", script], "test run", "Test.Test", None, 30)
+    lines = result.stdout.split("\n")
+    assert result.returncode == 0
+    assert len(lines) == core.WINGET_OUTPUT_TAIL_LINES
+    assert lines[0] == "line 301"
+    assert lines[-1] == "x" * core.WINGET_OUTPUT_MAX_LINE
+    if core.cache_conn is not None:
+        core.cache_conn.close()